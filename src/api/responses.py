@@ -0,0 +1,181 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+from flask import Response, request
+from src.storage.repository import SetupRepository
+
+try:
+    import orjson
+except ImportError:  # Encodeur rapide optionnel
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def dumps(payload):
+    """
+    Sérialise une réponse en JSON (orjson si disponible)
+
+    Returns:
+        bytes: Document JSON encodé en UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def make_etag(*parts):
+    """
+    Calcule un ETag à partir des éléments qui identifient la version d'une ressource
+    (ID, date de mise à jour, nombre de lignes, paramètres de la requête...)
+    """
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+def encode_cursor(position):
+    """
+    Encode une position de pagination (generation_time, id) en curseur opaque
+
+    Returns:
+        str: Curseur (None si pas de page suivante)
+    """
+    if position is None:
+        return None
+    generation_time, setup_id = position
+    raw = json.dumps([generation_time.isoformat(), setup_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur opaque
+
+    Returns:
+        tuple: (generation_time, id), None si aucun curseur
+
+    Raises:
+        ValueError: Curseur invalide
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        generation_time, setup_id = json.loads(raw)
+        return datetime.fromisoformat(generation_time), int(setup_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise ValueError(f"Curseur invalide: {cursor}") from e
+
+
+def json_response(payload, status=200, etag=None):
+    """Construit une réponse JSON, éventuellement accompagnée de son ETag"""
+    response = Response(dumps(payload), status=status, mimetype="application/json")
+    if etag is not None:
+        response.set_etag(etag)
+        # Le client peut garder la réponse mais doit la revalider à chaque requête
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def conditional_json(etag, build):
+    """
+    Répond 304 si le client possède déjà cette version (If-None-Match),
+    sinon construit et sérialise la réponse
+
+    Args:
+        etag (str): ETag de la version courante de la ressource
+        build (callable): Fonction renvoyant le contenu de la réponse (appelée seulement si nécessaire)
+
+    Returns:
+        Response: Réponse 304 ou 200
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    return json_response(build(), etag=etag)
+
+
+def serialize_setup(setup):
+    """Convertit un setup en dictionnaire prêt à sérialiser (sans validation pydantic)"""
+    return {
+        "id": setup.id,
+        "car_id": setup.car_id,
+        "track_id": setup.track_id,
+        "setup_parameters": setup.setup_parameters,
+        "generation_time": setup.generation_time,
+        "status": setup.status,
+        "source": setup.source,
+        "score": setup.score
+    }
+
+
+def serialize_telemetry(result):
+    """Convertit un résultat de télémétrie en dictionnaire prêt à sérialiser"""
+    return {
+        "id": result.id,
+        "lap_time": result.lap_time,
+        "telemetry_data": result.telemetry_data,
+        "submission_time": result.submission_time,
+        "weather_conditions": result.weather_conditions,
+        "driver_notes": result.driver_notes
+    }
+
+
+def setup_listing(car_id, track_id, args, name):
+    """
+    Réponse paginée de la liste des setups d'une voiture et d'une piste
+
+    Par défaut, la pagination se fait par curseur (paramètre cursor, renvoyé dans
+    next_cursor) ; le paramètre page conserve la pagination historique par décalage.
+    Le total provient du compteur maintenu en base (aucun COUNT).
+
+    Args:
+        car_id (str): ID de la voiture
+        track_id (str): ID du circuit
+        args (dict): Paramètres de la requête (cursor, page, page_size)
+        name (str): Nom de la ressource (préfixe de l'ETag)
+
+    Returns:
+        Response: Réponse 200 ou 304
+
+    Raises:
+        ValueError: Curseur ou paramètres invalides
+    """
+    page_size = int(args.get('page_size', 10))
+    page = args.get('page')
+    cursor = None if page is not None else decode_cursor(args.get('cursor'))
+
+    # Version de la liste : aucun setup n'est chargé si le client est à jour
+    version = SetupRepository.get_setups_version(car_id, track_id)
+    if version is None:
+        return json_response({"error": "Erreur lors de la récupération des setups"}, status=500)
+    total, revision = version
+    etag = make_etag(name, car_id, track_id, page, args.get('cursor'), page_size, total, revision)
+
+    def build():
+        if page is not None:
+            setups = SetupRepository.get_setups_page(car_id, track_id, int(page), page_size)
+            return {
+                "setups": [serialize_setup(setup) for setup in setups],
+                "total": total,
+                "page": int(page),
+                "page_size": page_size
+            }
+
+        setups, next_position = SetupRepository.get_setups_after(car_id, track_id, cursor, page_size)
+        return {
+            "setups": [serialize_setup(setup) for setup in setups],
+            "total": total,
+            "page_size": page_size,
+            "next_cursor": encode_cursor(next_position)
+        }
+
+    return conditional_json(etag, build)
@@ -1,83 +1,556 @@
 from flask import Blueprint, request, jsonify
 import json
-from src.api.schemas import TelemetryData, OptimizationParameters, SetupResponse, OptimizationStatus
-from src.storage.repository import SetupRepository, TelemetryRepository, OptimizationRepository
+from src.api.schemas import (
+    TelemetryData, TelemetryBatch, LapReport, OptimizationParameters, RescoreRequest, OptimizationStatus
+)
+from src.api.responses import conditional_json, json_response, make_etag, serialize_setup, setup_listing
+from src.storage.repository import SetupRepository, TelemetryRepository, OptimizationRepository, IngestRepository
+from src.storage.database import router, suspend_unit_of_work
+from src.storage.archive import load_setup, rehydrate_session
 from src.core.optimizer import SetupOptimizer
-from src.core.scoring import SetupScorer
+from src.core.session_registry import registry
+from src.core.scoring import get_scorer, rescore_setups
+from src.core.lap_aggregator import LapAggregator
+from src.core.pipeline import worker
+from src.core.ingest import IngestBuffer
+from src.core.leases import lease_sweeper
 from src.core.setup_generator import SetupGenerator
 from src.config.constants import SETUP_STATUS, SETUP_SOURCE
+from src.config.settings import (
+    ASYNC_SCORING, INGEST_BUFFER, INGEST_DIR, INGEST_FLUSH_INTERVAL_MS, INGEST_FLUSH_MAX_RECORDS
+)
 
 # Création du Blueprint
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
-# Optimiseur global pour l'application
-optimizer = None
-scorer = SetupScorer()
+# Recalcul des scores suivi en base (consultable depuis tous les workers, repris au démarrage)
+worker.task("rescore_setups")(rescore_setups)
+
+# Attente maximale (secondes) autorisée lors du suivi d'une tâche
+MAX_JOB_WAIT = 30
+
+# Taille maximale d'une ligne NDJSON (un échantillon) sur le flux de télémétrie
+MAX_STREAM_LINE_BYTES = 64 * 1024
+
+def _session_id_arg(data=None):
+    """Lit l'ID de session depuis la requête (query string ou corps JSON)"""
+    session_id = request.args.get('session_id')
+    if session_id is None and data:
+        session_id = data.get('session_id')
+    return int(session_id) if session_id is not None else None
+
+def _rig_id_arg(data=None):
+    """Identifiant du poste de test (rig_id, en-tête X-Rig-Id, sinon adresse du client)"""
+    rig_id = request.args.get('rig_id') or request.headers.get('X-Rig-Id')
+    if rig_id is None and data:
+        rig_id = data.get('rig_id')
+    return str(rig_id or request.remote_addr)
+
+def _get_optimizer_for_setup(setup_id):
+    """Renvoie l'optimiseur de la session à laquelle appartient un setup"""
+    session_ids = SetupRepository.get_session_ids([setup_id])
+    return registry.get(session_ids.get(setup_id))
+
+def _fallback_scorer(setup_id, car_tracks=None):
+    """Renvoie le scoreur de la voiture et du circuit d'un setup sans session active"""
+    if car_tracks is None:
+        car_tracks = SetupRepository.get_car_tracks([setup_id])
+    car_id, track_id = car_tracks.get(setup_id, (None, None))
+    return get_scorer(car_id, track_id)
+
+def _score_telemetry(setup_id, telemetry_data):
+    """
+    Calcule le score d'un tour, le transmet à l'optimiseur et génère le setup suivant
+    
+    Un setup déjà élagué par /setup/<id>/lap n'est pas noté : le tour reste enregistré,
+    mais le statut, le score et le trial Optuna (clos) ne changent pas, et aucun setup
+    suivant n'est généré (il l'a été lors de l'élagage).
+    
+    Args:
+        setup_id (int): ID du setup testé
+        telemetry_data (dict): Données de télémétrie du tour
+        
+    Returns:
+        dict: Score et ID du setup suivant ("prune": true et aucun score si le setup est élagué)
+    """
+    setup = SetupRepository.get_setup_by_id(setup_id)
+    if setup is not None and setup.status == SETUP_STATUS["DISCARDED"]:
+        return {
+            "score": None,
+            "next_setup_id": None,
+            "prune": True
+        }
+    
+    # Les écritures de la requête sont validées avant de passer la main à l'optimiseur
+    with suspend_unit_of_work():
+        # L'optimiseur est celui de la session du setup (plusieurs sessions peuvent être actives)
+        active_optimizer = _get_optimizer_for_setup(setup_id)
+        
+        # Calcule le score et met à jour le setup
+        if active_optimizer is not None:
+            score = active_optimizer.update_trial_score(
+                setup_id=setup_id,
+                telemetry_data=telemetry_data
+            )
+        else:
+            # Utilise le scoreur de la voiture et du circuit si l'optimiseur n'est pas initialisé
+            score = _fallback_scorer(setup_id).calculate_score(telemetry_data)
+            SetupRepository.update_setup_status(
+                setup_id=setup_id,
+                status=SETUP_STATUS["TESTED"],
+                score=score
+            )
+        
+        # Génère un nouveau setup si nécessaire
+        next_setup_id = _next_setup_id(active_optimizer) if active_optimizer is not None else None
+    
+    return {
+        "score": score,
+        "next_setup_id": next_setup_id
+    }
+
+@worker.task("score_lap")
+def _score_lap(telemetry_id):
+    """
+    Note un tour enregistré (tâche du worker, reprise au démarrage si le processus s'arrête avant)
+    
+    Args:
+        telemetry_id (int): ID du tour
+        
+    Returns:
+        dict: Score et ID du setup suivant
+    """
+    telemetry = TelemetryRepository.get_telemetry_by_id(telemetry_id)
+    if telemetry is None:
+        raise ValueError(f"Tour {telemetry_id} introuvable")
+    return _score_telemetry(telemetry.setup_id, telemetry.telemetry_data)
+
+def _next_setup_id(active_optimizer):
+    """Prépare le setup suivant d'une session après un setup terminé (ou élagué)"""
+    if active_optimizer.lookahead > 0:
+        # La file d'avance est complétée en arrière-plan : le prochain setup existe déjà
+        _schedule_refill(active_optimizer)
+        pending_setup = SetupRepository.get_pending_setup(active_optimizer.session_id)
+        return pending_setup.id if pending_setup else None
+    return active_optimizer.generate_next_setup()
+
+def _schedule_refill(active_optimizer):
+    """Demande au worker de compléter la file des setups en attente de la session"""
+    if active_optimizer is not None and active_optimizer.lookahead > 0:
+        worker.submit(active_optimizer.refill_lookahead)
+
+def _process_telemetry(telemetry, run_async=False):
+    """
+    Enregistre un tour puis le note, immédiatement ou via le worker d'optimisation
+    
+    Avec le tampon d'écriture différée (INGEST_BUFFER), le tour est seulement ajouté
+    au journal local : il sera enregistré, noté et transmis à l'optimiseur avec son lot.
+    
+    Args:
+        telemetry (TelemetryData): Données de télémétrie validées
+        run_async (bool): Délègue le score, le tell et le ask au worker
+        
+    Returns:
+        dict: Résultat du traitement (ou ID de tâche en mode asynchrone,
+              ou séquence dans le journal), None si l'enregistrement a échoué
+    """
+    if INGEST_BUFFER:
+        return {
+            "queued": True,
+            "sequence": ingest_buffer.append(telemetry.dict())
+        }
+    
+    # Enregistre les données de télémétrie
+    telemetry_id = TelemetryRepository.save_telemetry(
+        setup_id=telemetry.setup_id,
+        lap_time=telemetry.lap_time,
+        telemetry_data=telemetry.telemetry_data,
+        weather_conditions=telemetry.weather_conditions,
+        driver_notes=telemetry.driver_notes
+    )
+    
+    if telemetry_id is None:
+        return None
+    
+    if run_async:
+        # Le tour est validé avant d'être confié au worker, qui le relit en base
+        with suspend_unit_of_work():
+            job = worker.submit(_score_lap, telemetry_id)
+        return {
+            "telemetry_id": telemetry_id,
+            "job_id": job.id
+        }
+    
+    return {
+        "telemetry_id": telemetry_id,
+        **_score_telemetry(telemetry.setup_id, telemetry.telemetry_data)
+    }
+
+def _async_requested():
+    """Indique si la requête doit être traitée de manière asynchrone (?async=true)"""
+    value = request.args.get('async')
+    if value is None:
+        return ASYNC_SCORING
+    return value.lower() == "true"
+
+def _process_telemetry_batch(telemetry_records, ingest_checkpoint=None):
+    """
+    Note un lot de tours, l'enregistre en une seule transaction puis transmet
+    les scores à l'optimiseur de chaque session en une passe
+    
+    Args:
+        telemetry_records (list): Tours validés (TelemetryData)
+        ingest_checkpoint (tuple): (flux, séquence) du journal d'ingestion validé avec le lot
+        
+    Returns:
+        tuple: (enregistrements notés, IDs des télémétries, IDs des setups suivants),
+               None si l'enregistrement a échoué
+    """
+    # Optimiseur de chaque session concernée par le lot
+    session_ids = SetupRepository.get_session_ids({telemetry.setup_id for telemetry in telemetry_records})
+    optimizers = {session_id: registry.get(session_id) for session_id in set(session_ids.values())}
+    
+    # Voiture et circuit des setups sans optimiseur actif (scoreur de repli)
+    orphan_ids = {setup_id for setup_id, session_id in session_ids.items() if optimizers.get(session_id) is None}
+    orphan_ids |= {telemetry.setup_id for telemetry in telemetry_records if telemetry.setup_id not in session_ids}
+    car_tracks = SetupRepository.get_car_tracks(orphan_ids) if orphan_ids else {}
+    
+    # Calcule les scores dans l'ordre de réception des tours
+    records = []
+    for telemetry in telemetry_records:
+        active_optimizer = optimizers.get(session_ids.get(telemetry.setup_id))
+        if active_optimizer is not None:
+            active_scorer = active_optimizer.scorer
+        else:
+            active_scorer = _fallback_scorer(telemetry.setup_id, car_tracks)
+        record = telemetry.dict()
+        record["score"] = active_scorer.calculate_score(telemetry.telemetry_data)
+        records.append(record)
+    
+    # Enregistre les tours et met à jour les setups en une seule transaction
+    telemetry_ids = TelemetryRepository.save_telemetry_batch(records, ingest_checkpoint)
+    
+    if telemetry_ids is None:
+        return None
+    
+    # Transmet les scores à chaque optimiseur en une passe et génère les setups suivants
+    next_setup_ids = []
+    with suspend_unit_of_work():
+        for session_id, active_optimizer in optimizers.items():
+            if active_optimizer is None:
+                continue
+            told = active_optimizer.tell_scores({
+                record["setup_id"]: record["score"]
+                for record in records
+                if session_ids.get(record["setup_id"]) == session_id
+            })
+            if active_optimizer.lookahead > 0:
+                _schedule_refill(active_optimizer)
+            else:
+                for _ in told:
+                    next_setup_id = active_optimizer.generate_next_setup()
+                    if next_setup_id is not None:
+                        next_setup_ids.append(next_setup_id)
+    
+    return records, telemetry_ids, next_setup_ids
+
+def _write_ingested(stream, records, sequence):
+    """Écrit en base un lot de tours du journal d'ingestion (tampon d'écriture différée)"""
+    if router.sharded:
+        # Un lot sur plusieurs bases est validé base par base : au nouvel essai d'un lot
+        # en échec, les tours déjà validés dans une autre base ne sont pas réécrits
+        committed = IngestRepository.get_committed(stream)
+        if committed is None:
+            return False
+        first_sequence = sequence - len(records) + 1
+        records = [record for offset, record in enumerate(records) if not committed(first_sequence + offset, record)]
+        if not records:
+            return True
+    return _process_telemetry_batch(
+        [TelemetryData(**record) for record in records],
+        ingest_checkpoint=(stream, sequence)
+    ) is not None
+
+# Tampon d'écriture différée de la télémétrie (INGEST_BUFFER)
+ingest_buffer = IngestBuffer(INGEST_DIR, _write_ingested, INGEST_FLUSH_INTERVAL_MS, INGEST_FLUSH_MAX_RECORDS)
 
 @api_bp.route('/telemetry', methods=['POST'])
 def receive_telemetry():
     """
     Endpoint pour recevoir les données de télémétrie
     
-    POST /api/v1/telemetry
+    En mode asynchrone (ASYNC_SCORING ou ?async=true), le tour est enregistré
+    et la réponse 202 contient l'ID de la tâche de notation à suivre via /jobs.
+    Avec INGEST_BUFFER, la réponse 202 est envoyée dès que le tour est sur disque
+    dans le journal d'ingestion.
+    
+    POST /api/v1/telemetry[?async=true]
     """
     try:
         data = request.json
         telemetry = TelemetryData(**data)
         
-        # Enregistre les données de télémétrie
+        run_async = _async_requested()
+        result = _process_telemetry(telemetry, run_async=run_async)
+        
+        if result is None:
+            return jsonify({"error": "Erreur lors de l'enregistrement de la télémétrie"}), 500
+        
+        if run_async or INGEST_BUFFER:
+            # Le tour est enregistré (ou journalisé), le score sera calculé plus tard
+            return jsonify({"success": True, **result}), 202
+        
+        return jsonify({"success": True, **result})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@api_bp.route('/setup/<int:setup_id>/lap', methods=['POST'])
+def report_setup_lap(setup_id):
+    """
+    Endpoint pour signaler un tour intermédiaire du relais d'un setup
+    
+    Le tour est enregistré comme un envoi unitaire, puis son score est transmis à
+    l'optimiseur comme étape du trial. Si le pruner de la session juge le setup
+    mauvais, la réponse contient "prune": true : le relais s'arrête et le poste passe
+    au setup suivant (next_setup_id). Le dernier tour d'un relais complet est envoyé
+    à /telemetry, qui clôt le trial. Toujours synchrone : le plugin attend la décision.
+    
+    POST /api/v1/setup/<id>/lap {"lap_number": 1, "lap_time": ..., "telemetry_data": {...}}
+    """
+    try:
+        lap = LapReport(**request.json)
+        
         telemetry_id = TelemetryRepository.save_telemetry(
-            setup_id=telemetry.setup_id,
-            lap_time=telemetry.lap_time,
-            telemetry_data=telemetry.telemetry_data,
-            weather_conditions=telemetry.weather_conditions,
-            driver_notes=telemetry.driver_notes
+            setup_id=setup_id,
+            lap_time=lap.lap_time,
+            telemetry_data=lap.telemetry_data,
+            weather_conditions=lap.weather_conditions,
+            driver_notes=lap.driver_notes
         )
         
         if telemetry_id is None:
             return jsonify({"error": "Erreur lors de l'enregistrement de la télémétrie"}), 500
         
-        # Calcule le score et met à jour le setup
-        global optimizer
-        if optimizer is not None:
-            score = optimizer.update_trial_score(
-                setup_id=telemetry.setup_id,
-                telemetry_data=telemetry.telemetry_data
-            )
-        else:
-            # Utilise le scoreur si l'optimiseur n'est pas initialisé
-            score = scorer.calculate_score(telemetry.telemetry_data)
-            SetupRepository.update_setup_status(
-                setup_id=telemetry.setup_id,
-                status=SETUP_STATUS["TESTED"],
-                score=score
+        response = {"success": True, "telemetry_id": telemetry_id, "score": None, "prune": False}
+        
+        # Sans session active, pas d'élagage : le relais continue
+        with suspend_unit_of_work():
+            active_optimizer = _get_optimizer_for_setup(setup_id)
+            if active_optimizer is not None:
+                score, pruned = active_optimizer.report_lap(setup_id, lap.lap_number, lap.telemetry_data)
+                response.update({"score": score, "prune": pruned})
+                if pruned:
+                    response["next_setup_id"] = _next_setup_id(active_optimizer)
+        
+        return jsonify(response)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@api_bp.route('/telemetry/stream', methods=['POST'])
+def receive_telemetry_stream():
+    """
+    Endpoint pour recevoir un flux d'échantillons bruts (NDJSON, un objet par ligne)
+    
+    Chaque ligne est un échantillon (ex: {"tire_temp_fl": 84.2, "tire_wear_fl": 3.1,
+    "yaw_rate": 0.02}). Une ligne contenant "lap_time" clôture le tour : le résumé
+    agrégé est alors enregistré et noté comme un envoi unitaire. Le corps est lu
+    ligne à ligne, sans jamais être chargé entièrement en mémoire.
+    
+    POST /api/v1/telemetry/stream?setup_id=X[&async=true]
+    """
+    try:
+        setup_id = request.args.get('setup_id')
+        
+        if setup_id is None:
+            return jsonify({"error": "ID de setup requis"}), 400
+        
+        setup_id = int(setup_id)
+        run_async = _async_requested()
+        aggregator = LapAggregator()
+        laps = []
+        samples = 0
+        rejected = 0
+        
+        for line in iter(lambda: request.stream.readline(MAX_STREAM_LINE_BYTES), b""):
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                sample = json.loads(line)
+            except ValueError:
+                rejected += 1
+                continue
+            
+            if not isinstance(sample, dict):
+                rejected += 1
+                continue
+            
+            if "lap_time" not in sample:
+                aggregator.add_sample(sample)
+                samples += 1
+                continue
+            
+            # Fin de tour : émet le résumé agrégé puis repart de zéro
+            telemetry = TelemetryData(
+                setup_id=setup_id,
+                lap_time=sample["lap_time"],
+                telemetry_data=aggregator.summary(sample["lap_time"]),
+                weather_conditions=sample.get("weather_conditions"),
+                driver_notes=sample.get("driver_notes")
             )
+            aggregator.reset()
+            
+            result = _process_telemetry(telemetry, run_async=run_async)
+            if result is None:
+                return jsonify({
+                    "error": "Erreur lors de l'enregistrement de la télémétrie",
+                    "laps": laps
+                }), 500
+            laps.append(result)
         
-        # Génère un nouveau setup si nécessaire
-        next_setup_id = None
-        if optimizer is not None:
-            next_setup_id = optimizer.generate_next_setup()
+        return jsonify({
+            "success": True,
+            "setup_id": setup_id,
+            "samples": samples,
+            "rejected": rejected,
+            "pending_samples": aggregator.sample_count,
+            "laps": laps
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@api_bp.route('/telemetry/batch', methods=['POST'])
+def receive_telemetry_batch():
+    """
+    Endpoint pour recevoir un lot de données de télémétrie (arriéré de tours)
+    
+    Les tours sont enregistrés et les setups mis à jour dans une seule
+    transaction, puis les scores sont transmis à l'optimiseur en une passe.
+    
+    POST /api/v1/telemetry/batch
+    """
+    try:
+        data = request.json
+        batch = TelemetryBatch(**data)
+        
+        result = _process_telemetry_batch(batch.records)
+        
+        if result is None:
+            return jsonify({"error": "Erreur lors de l'enregistrement du lot de télémétrie"}), 500
+        
+        records, telemetry_ids, next_setup_ids = result
         
         return jsonify({
             "success": True,
-            "telemetry_id": telemetry_id,
-            "score": score,
-            "next_setup_id": next_setup_id
+            "results": [
+                {
+                    "setup_id": record["setup_id"],
+                    "telemetry_id": telemetry_id,
+                    "score": record["score"]
+                }
+                for record, telemetry_id in zip(records, telemetry_ids)
+            ],
+            "next_setup_ids": next_setup_ids
         })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Endpoint pour suivre une tâche du worker d'optimisation
+    
+    Le paramètre wait (secondes) permet d'attendre la fin de la tâche.
+    
+    GET /api/v1/jobs/<job_id>?wait=5
+    """
+    try:
+        wait = min(float(request.args.get('wait', 0)), MAX_JOB_WAIT)
+        
+        if wait > 0:
+            # Chaque relecture de la tâche voit les écritures des autres workers
+            with suspend_unit_of_work():
+                job = worker.wait(job_id, timeout=wait)
+        else:
+            job = worker.get_job(job_id)
+        
+        if job is None:
+            return jsonify({"error": "Tâche non trouvée"}), 404
+        
+        return jsonify(job.to_dict())
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@api_bp.route('/scoring/rescore', methods=['POST'])
+def rescore():
+    """
+    Endpoint pour recalculer les scores de tous les setups d'une voiture et d'un circuit
+    
+    À utiliser après une modification des poids par défaut ou des plages idéales du scoreur.
+    Le recalcul est exécuté par le worker (suivi via /jobs/<job_id>), sauf avec ?async=false.
+    
+    POST /api/v1/scoring/rescore
+    """
+    try:
+        data = request.json
+        params = RescoreRequest(**data)
+        
+        if request.args.get('async', 'true').lower() != "true":
+            result = rescore_setups(params.car_id, params.track_id)
+            if result is None:
+                return jsonify({"error": "Erreur lors de la mise à jour des scores"}), 500
+            return jsonify({"success": True, **result})
+        
+        with suspend_unit_of_work():
+            job = worker.submit(rescore_setups, params.car_id, params.track_id)
+        return jsonify({"success": True, "job_id": job.id}), 202
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 @api_bp.route('/setup/next', methods=['GET'])
 def get_next_setup():
     """
-    Endpoint pour récupérer le prochain setup à tester
+    Endpoint pour récupérer (et réserver) le prochain setup à tester
+    
+    Le setup est choisi dans la session indiquée (session_id, ou session active
+    de car_id/track_id) ; sans critère, parmi toutes les sessions. Il est réservé
+    pour le poste de test (rig_id ou en-tête X-Rig-Id) jusqu'à lease_expires_at :
+    plusieurs postes reçoivent des setups différents. Une réservation expirée remet
+    le setup en file.
     
-    GET /api/v1/setup/next
+    GET /api/v1/setup/next[?session_id=X | ?car_id=X&track_id=Y][&rig_id=Z]
     """
     try:
-        # Récupère le prochain setup en attente
-        setup = SetupRepository.get_pending_setup()
+        lease_sweeper.ensure_started()
+        rig_id = _rig_id_arg()
+        session_id = _session_id_arg()
+        car_id = request.args.get('car_id')
+        track_id = request.args.get('track_id')
+        
+        if session_id is None and (car_id or track_id):
+            active_session = OptimizationRepository.get_active_session(car_id=car_id, track_id=track_id)
+            if active_session is None:
+                return jsonify({"error": "Aucune optimisation active"}), 404
+            session_id = active_session.id
+        
+        # Réserve le prochain setup en attente pour ce poste
+        setup = SetupRepository.claim_setup(rig_id, session_id)
+        
+        if setup is None and session_id is not None:
+            # Tous les setups en attente sont réservés par d'autres postes : nouveau setup
+            active_optimizer = registry.get(session_id)
+            if active_optimizer is not None:
+                with suspend_unit_of_work():
+                    generated = active_optimizer.generate_next_setup() is not None
+                if generated:
+                    setup = SetupRepository.claim_setup(rig_id, session_id)
         
         if setup is None:
             return jsonify({"error": "Aucun setup en attente"}), 404
@@ -94,7 +567,9 @@ def get_next_setup():
             "generation_time": setup.generation_time.isoformat(),
             "status": setup.status,
             "source": setup.source,
-            "file_path": file_path
+            "file_path": file_path,
+            "claimed_by": setup.claimed_by,
+            "lease_expires_at": setup.lease_expires_at.isoformat()
         }
         
         return jsonify(response)
@@ -102,11 +577,32 @@ def get_next_setup():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@api_bp.route('/setup/<int:setup_id>/lease', methods=['POST'])
+def renew_setup_lease(setup_id):
+    """
+    Endpoint pour prolonger la réservation d'un setup (relais plus long que prévu)
+    
+    POST /api/v1/setup/<id>/lease {"rig_id": "..."}
+    """
+    try:
+        rig_id = _rig_id_arg(request.get_json(silent=True))
+        expires = SetupRepository.renew_lease(setup_id, rig_id)
+        
+        if expires is None:
+            return jsonify({"error": "Setup non réservé par ce poste"}), 409
+        
+        return jsonify({"id": setup_id, "claimed_by": rig_id, "lease_expires_at": expires.isoformat()})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @api_bp.route('/setup/current', methods=['GET'])
 def get_current_setup():
     """
     Endpoint pour récupérer le setup actuellement testé
     
+    Répond 304 si l'ETag envoyé (If-None-Match) correspond à la version du setup.
+    
     GET /api/v1/setup/current
     """
     try:
@@ -116,24 +612,14 @@ def get_current_setup():
             return jsonify({"error": "ID de setup requis"}), 400
         
         # Récupère le setup
-        setup = SetupRepository.get_setup_by_id(int(setup_id))
+        setup = load_setup(int(setup_id))
         
         if setup is None:
             return jsonify({"error": "Setup non trouvé"}), 404
         
-        # Prépare la réponse
-        response = {
-            "id": setup.id,
-            "car_id": setup.car_id,
-            "track_id": setup.track_id,
-            "setup_parameters": setup.setup_parameters,
-            "generation_time": setup.generation_time.isoformat(),
-            "status": setup.status,
-            "source": setup.source,
-            "score": setup.score
-        }
-        
-        return jsonify(response)
+        # Réponse 304 si le client possède déjà cette version du setup
+        etag = make_etag("setup", setup.id, setup.updated_at or setup.generation_time)
+        return conditional_json(etag, lambda: serialize_setup(setup))
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -149,28 +635,36 @@ def start_optimization():
         data = request.json
         params = OptimizationParameters(**data)
         
-        # Vérifie s'il y a déjà une optimisation active
-        active_session = OptimizationRepository.get_active_session()
+        # Vérifie s'il y a déjà une optimisation active pour cette voiture et ce circuit
+        active_session = OptimizationRepository.get_active_session(
+            car_id=params.car_id,
+            track_id=params.track_id
+        )
         if active_session:
             return jsonify({
-                "error": "Une session d'optimisation est déjà active",
+                "error": "Une session d'optimisation est déjà active pour cette voiture et ce circuit",
                 "session_id": active_session.id
             }), 400
         
-        # Initialise l'optimiseur global
-        global optimizer
-        optimizer = SetupOptimizer(
+        # Initialise l'optimiseur
+        new_optimizer = SetupOptimizer(
             car_id=params.car_id,
             track_id=params.track_id,
             optimization_params=params.params
         )
         
         # Démarre l'optimisation
-        session_id = optimizer.start_optimization()
+        with suspend_unit_of_work():
+            session_id = new_optimizer.start_optimization()
         
         if session_id is None:
             return jsonify({"error": "Erreur lors du démarrage de l'optimisation"}), 500
         
+        registry.register(new_optimizer)
+        
+        # Pré-génère la file d'avance si elle dépasse les setups initiaux
+        _schedule_refill(new_optimizer)
+        
         return jsonify({
             "success": True,
             "session_id": session_id,
@@ -183,26 +677,34 @@ def start_optimization():
 @api_bp.route('/optimization/stop', methods=['POST'])
 def stop_optimization():
     """
-    Endpoint pour arrêter l'optimisation en cours
+    Endpoint pour arrêter une optimisation en cours
     
-    POST /api/v1/optimization/stop
+    POST /api/v1/optimization/stop  {"session_id": X} ou {"car_id": X, "track_id": Y}
     """
     try:
-        global optimizer
-        if optimizer is None:
+        data = request.get_json(silent=True) or {}
+        active_optimizer = registry.resolve(
+            session_id=_session_id_arg(data),
+            car_id=data.get('car_id', request.args.get('car_id')),
+            track_id=data.get('track_id', request.args.get('track_id'))
+        )
+        if active_optimizer is None:
             return jsonify({"error": "Aucune optimisation active"}), 400
         
         # Arrête l'optimisation
-        success = optimizer.stop_optimization()
+        session_id = active_optimizer.session_id
+        with suspend_unit_of_work():
+            success = active_optimizer.stop_optimization()
         
         if not success:
             return jsonify({"error": "Erreur lors de l'arrêt de l'optimisation"}), 500
         
-        # Réinitialise l'optimiseur global
-        optimizer = None
+        # Retire l'optimiseur du registre
+        registry.discard(session_id)
         
         return jsonify({
             "success": True,
+            "session_id": session_id,
             "message": "Optimisation arrêtée"
         })
     
@@ -214,52 +716,44 @@ def get_optimization_status():
     """
     Endpoint pour récupérer le statut de l'optimisation
     
-    GET /api/v1/optimization/status
+    GET /api/v1/optimization/status[?session_id=X | ?car_id=X&track_id=Y]
     """
     try:
-        # Récupère la session active
-        active_session = OptimizationRepository.get_active_session()
+        # Statut de la session demandée, ou de la session active la plus récente
+        # (statistiques maintenues à chaque écriture : aucun COUNT ni tri)
+        session_status = OptimizationRepository.get_session_status(
+            session_id=_session_id_arg(),
+            car_id=request.args.get('car_id'),
+            track_id=request.args.get('track_id')
+        )
         
         status = OptimizationStatus()
-        
-        if active_session:
-            # Compte le nombre de setups testés et en attente
-            db = SetupRepository.get_session()
-            from src.models.setup import SetupConfiguration
-            
-            trials_completed = db.query(SetupConfiguration).filter(
-                SetupConfiguration.optimization_session_id == active_session.id,
-                SetupConfiguration.status == SETUP_STATUS["TESTED"]
-            ).count()
-            
-            trials_pending = db.query(SetupConfiguration).filter(
-                SetupConfiguration.optimization_session_id == active_session.id,
-                SetupConfiguration.status == SETUP_STATUS["PENDING"]
-            ).count()
-            
-            db.close()
-            
-            # Récupère les meilleurs setups
-            best_setups = SetupRepository.get_best_setups(
-                car_id=active_session.car_id,
-                track_id=active_session.track_id,
-                limit=5
-            )
-            
-            best_score = best_setups[0].score if best_setups else None
-            
-            # Construit la réponse
-            status.session_id = active_session.id
-            status.car_id = active_session.car_id
-            status.track_id = active_session.track_id
-            status.start_time = active_session.start_time
-            status.trials_completed = trials_completed
-            status.trials_pending = trials_pending
-            status.best_score = best_score
-            status.best_setup_id = active_session.best_setup_id
-            status.is_active = True
-        
-        return jsonify(status.dict())
+        if session_status:
+            status.session_id = session_status["session_id"]
+            status.car_id = session_status["car_id"]
+            status.track_id = session_status["track_id"]
+            status.start_time = session_status["start_time"]
+            status.trials_completed = session_status["trials_completed"]
+            status.trials_pending = session_status["trials_pending"]
+            status.best_score = session_status["best_score"]
+            status.best_setup_id = session_status["best_setup_id"]
+            status.is_active = session_status["is_active"]
+        
+        return json_response(status.dict())
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/optimization/sessions', methods=['GET'])
+def get_active_sessions():
+    """
+    Endpoint pour lister les sessions d'optimisation actives
+    
+    GET /api/v1/optimization/sessions
+    """
+    try:
+        sessions = OptimizationRepository.get_active_sessions()
+        return jsonify({"sessions": [session.to_dict() for session in sessions]})
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -269,53 +763,27 @@ def get_history():
     """
     Endpoint pour récupérer l'historique des setups
     
-    GET /api/v1/history?car_id=X&track_id=Y&page=1&page_size=10
+    Pagination par curseur : next_cursor est à renvoyer dans cursor pour la page suivante
+    (page=N reste accepté pour la pagination par décalage).
+    
+    Avec session_id, les setups d'une session archivée sont d'abord réintégrés en base.
+    
+    GET /api/v1/history?car_id=X&track_id=Y&page_size=10[&cursor=...][&session_id=Z]
     """
     try:
         car_id = request.args.get('car_id')
         track_id = request.args.get('track_id')
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 10))
         
         if not car_id or not track_id:
             return jsonify({"error": "car_id et track_id sont requis"}), 400
         
-        # Récupère les setups depuis la base de données
-        db = SetupRepository.get_session()
-        from src.models.setup import SetupConfiguration
-        
-        query = db.query(SetupConfiguration).filter(
-            SetupConfiguration.car_id == car_id,
-            SetupConfiguration.track_id == track_id
-        ).order_by(SetupConfiguration.generation_time.desc())
-        
-        # Pagination
-        total = query.count()
-        setups = query.offset((page - 1) * page_size).limit(page_size).all()
-        
-        db.close()
-        
-        # Construit la réponse
-        setup_list = [
-            SetupResponse(
-                id=setup.id,
-                car_id=setup.car_id,
-                track_id=setup.track_id,
-                setup_parameters=setup.setup_parameters,
-                generation_time=setup.generation_time,
-                status=setup.status,
-                source=setup.source,
-                score=setup.score
-            ).dict()
-            for setup in setups
-        ]
+        session_id = request.args.get('session_id')
+        if session_id is not None:
+            rehydrate_session(int(session_id))
         
-        return jsonify({
-            "setups": setup_list,
-            "total": total,
-            "page": page,
-            "page_size": page_size
-        })
+        return setup_listing(car_id, track_id, request.args, "history")
     
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
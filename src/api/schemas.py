@@ -10,12 +10,29 @@ class TelemetryData(BaseModel):
     weather_conditions: Optional[Dict[str, Any]] = None
     driver_notes: Optional[str] = None
 
+class TelemetryBatch(BaseModel):
+    """Schéma pour un lot de données de télémétrie (vidage d'un arriéré de tours)"""
+    records: List[TelemetryData] = Field(..., min_length=1, max_length=1000)
+
+class LapReport(BaseModel):
+    """Schéma pour un tour intermédiaire du relais d'un setup (élagage des mauvais setups)"""
+    lap_number: int = Field(..., ge=1)
+    lap_time: float
+    telemetry_data: Dict[str, Union[float, int, str, Dict]]
+    weather_conditions: Optional[Dict[str, Any]] = None
+    driver_notes: Optional[str] = None
+
 class OptimizationParameters(BaseModel):
     """Schéma pour les paramètres d'optimisation"""
     car_id: str
     track_id: str
     params: Optional[Dict[str, Any]] = None
 
+class RescoreRequest(BaseModel):
+    """Schéma pour le recalcul des scores d'une voiture et d'un circuit"""
+    car_id: str
+    track_id: str
+
 class SetupResponse(BaseModel):
     """Schéma pour la réponse contenant un setup"""
     id: int
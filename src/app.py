@@ -1,10 +1,13 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 import logging
 from datetime import datetime
-from src.api.routes import api_bp
+from src.api.routes import api_bp, ingest_buffer
 from src.web.routes import web_bp
-from src.storage.database import init_db
+from src.storage.database import init_db, begin_unit_of_work, end_unit_of_work
+from src.storage.repository import IngestRepository
+from src.core.scoring import rebuild_metric_statistics
+from src.core.pipeline import worker
 from src.config.settings import API_HOST, API_PORT, DEBUG_MODE
 
 def create_app():
@@ -24,6 +27,30 @@ def create_app():
     # Initialise la base de données
     with app.app_context():
         init_db()
+        # Reconstruit les statistiques de normalisation si la table est vide (une passe)
+        rebuild_metric_statistics()
+        # Rejoue les tours journalisés mais pas encore écrits en base (arrêt brutal)
+        ingest_buffer.replay(IngestRepository.get_committed, IngestRepository.clear_checkpoint)
+        # Reprend les tâches des workers arrêtés avant de les terminer (tours non notés, recalculs)
+        worker.resume()
+    
+    # Unité de travail : une seule transaction par requête, validée avant l'envoi de la réponse
+    @app.before_request
+    def open_unit_of_work():
+        begin_unit_of_work()
+    
+    @app.after_request
+    def commit_unit_of_work(response):
+        # Les réponses 5xx annulent les écritures de la requête
+        if not end_unit_of_work(commit=response.status_code < 500) and response.status_code < 500:
+            response = jsonify({"error": "Erreur lors de l'enregistrement des modifications"})
+            response.status_code = 500
+        return response
+    
+    @app.teardown_request
+    def close_unit_of_work(error=None):
+        # Requête interrompue par une exception : annule ce qui n'a pas été validé
+        end_unit_of_work(commit=False)
     
     # Ajoute la date actuelle au contexte des templates
     @app.context_processor
@@ -54,3 +54,11 @@ SETUP_SOURCE = {
     "OPTIMIZED": "optimized", # Généré par l'optimiseur
     "MANUAL": "manual"        # Créé manuellement par l'utilisateur
 }
+
+# Statuts des tâches du worker d'optimisation
+JOB_STATUS = {
+    "QUEUED": "queued",       # En attente dans la file
+    "RUNNING": "running",     # En cours d'exécution
+    "DONE": "done",           # Terminée avec succès
+    "FAILED": "failed"        # Terminée en erreur
+}
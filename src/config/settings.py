@@ -10,9 +10,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
 SETUPS_DIR = DATA_DIR / "setups"
 HISTORY_DIR = DATA_DIR / "history"
+TELEMETRY_DIR = DATA_DIR / "telemetry"
+INGEST_DIR = DATA_DIR / "ingest"
+SHARDS_DIR = DATA_DIR / "shards"
+JOBS_DIR = DATA_DIR / "jobs"
 
 # Création des répertoires s'ils n'existent pas
-for dir_path in [DATA_DIR, SETUPS_DIR, HISTORY_DIR]:
+for dir_path in [DATA_DIR, SETUPS_DIR, HISTORY_DIR, TELEMETRY_DIR, INGEST_DIR, SHARDS_DIR, JOBS_DIR]:
     dir_path.mkdir(exist_ok=True)
 
 # Configuration de l'API
@@ -23,6 +27,73 @@ DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
 # Configuration de la base de données
 DB_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR}/data/optimization.db")
 
+# Pool de connexions
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))      # Attente d'une connexion libre (secondes)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))    # Renouvellement des connexions (secondes)
+
+# Réglages SQLite (WAL et synchronous=NORMAL sont toujours activés)
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 30000))      # Attente du verrou d'écriture (ms)
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))        # Lecture en mémoire mappée (octets)
+
+# Répartition des données : "none" (une seule base) ou "car" (une base SQLite par voiture dans SHARDS_DIR,
+# les listes transverses étant servies par un catalogue)
+DB_SHARDING = os.getenv("DB_SHARDING", "none").lower()
+CATALOG_DB_URL = os.getenv("CATALOG_DATABASE_URL", f"sqlite:///{BASE_DIR}/data/catalog.db")
+
+# Stockage des études Optuna (partagé entre les workers, par défaut la base des setups de la voiture)
+OPTUNA_STORAGE_URL = os.getenv("OPTUNA_STORAGE_URL")
+
 # Configuration de l'optimisation
 DEFAULT_OPTIMIZATION_ITERATIONS = int(os.getenv("DEFAULT_OPTIMIZATION_ITERATIONS", 50))
 OPTIMIZATION_TIMEOUT = int(os.getenv("OPTIMIZATION_TIMEOUT", 3600))  # 1 heure
+
+# Traitement asynchrone de la télémétrie (score, tell et ask hors du thread de requête)
+ASYNC_SCORING = os.getenv("ASYNC_SCORING", "False").lower() == "true"
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", 7))     # Conservation des tâches terminées (jours)
+
+# Nombre de setups en attente maintenus d'avance par session (0 = un nouveau setup par tour reçu)
+SETUP_LOOKAHEAD = int(os.getenv("SETUP_LOOKAHEAD", 0))
+
+# Amorçage des nouvelles sessions avec les setups déjà testés sur la même voiture/piste
+WARM_START = os.getenv("WARM_START", "False").lower() == "true"
+WARM_START_TOP_K = int(os.getenv("WARM_START_TOP_K", 3))                # Meilleurs setups historiques re-testés
+WARM_START_MAX_TRIALS = int(os.getenv("WARM_START_MAX_TRIALS", 1000))   # Setups historiques chargés au plus
+
+# A priori tiré des circuits similaires (même voiture) pour les circuits peu ou pas encore roulés
+TRANSFER_PRIOR = os.getenv("TRANSFER_PRIOR", "False").lower() == "true"
+TRANSFER_MAX_TRACKS = int(os.getenv("TRANSFER_MAX_TRACKS", 3))                  # Circuits similaires retenus
+TRANSFER_MIN_SIMILARITY = float(os.getenv("TRANSFER_MIN_SIMILARITY", 0.3))      # Similarité minimale (0-1)
+TRANSFER_MAX_TRIALS = int(os.getenv("TRANSFER_MAX_TRIALS", 200))                # Setups repris d'un circuit identique
+# Table optionnelle des caractéristiques des circuits ({"spa": {"length_km": 7.0, ...}})
+TRACK_FEATURES_FILE = os.getenv("TRACK_FEATURES_FILE", str(DATA_DIR / "track_features.json"))
+
+# Présélection des setups par un modèle de substitution (processus gaussien sur les setups notés)
+SURROGATE_SCREENING = os.getenv("SURROGATE_SCREENING", "False").lower() == "true"
+SURROGATE_CANDIDATES = int(os.getenv("SURROGATE_CANDIDATES", 10000))    # Candidats évalués par setup proposé
+SURROGATE_MIN_TRIALS = int(os.getenv("SURROGATE_MIN_TRIALS", 10))       # Setups notés avant la présélection
+SURROGATE_MAX_POINTS = int(os.getenv("SURROGATE_MAX_POINTS", 500))      # Points conservés par le modèle
+
+# Réservation des setups par les postes de test (plusieurs rigs sur une même session)
+SETUP_LEASE_SECONDS = int(os.getenv("SETUP_LEASE_SECONDS", 900))        # Durée d'une réservation (un relais)
+LEASE_SWEEP_INTERVAL = int(os.getenv("LEASE_SWEEP_INTERVAL", 30))       # Remise en file des réservations expirées (s)
+
+# Cache des optimiseurs actifs (plusieurs sessions voiture/piste en parallèle)
+OPTIMIZER_CACHE_SIZE = int(os.getenv("OPTIMIZER_CACHE_SIZE", 8))                # Nombre maximal d'études en mémoire
+OPTIMIZER_CACHE_MAX_TRIALS = int(os.getenv("OPTIMIZER_CACHE_MAX_TRIALS", 20000))  # Plafond mémoire (trials chargés)
+OPTIMIZER_IDLE_TIMEOUT = int(os.getenv("OPTIMIZER_IDLE_TIMEOUT", 1800))          # Éviction après inactivité (secondes)
+
+# Cache en mémoire du statut des sessions (secondes, 0 = désactivé)
+SESSION_STATUS_CACHE_TTL = float(os.getenv("SESSION_STATUS_CACHE_TTL", 2))
+
+# Archive colonnaire de la télémétrie (TELEMETRY_DIR), écrite avec la base
+COLUMNAR_TELEMETRY = os.getenv("COLUMNAR_TELEMETRY", "True").lower() == "true"
+
+# Archivage des sessions fermées depuis plus de N jours (HISTORY_DIR)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 30))
+
+# Tampon d'écriture différée de la télémétrie (journal local dans INGEST_DIR, écriture en base par lots)
+INGEST_BUFFER = os.getenv("INGEST_BUFFER", "False").lower() == "true"
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", 50))    # Délai maximal avant écriture d'un lot
+INGEST_FLUSH_MAX_RECORDS = int(os.getenv("INGEST_FLUSH_MAX_RECORDS", 500))   # Taille de lot déclenchant l'écriture
@@ -0,0 +1,476 @@
+import argparse
+import atexit
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import optuna
+from src.config.constants import CAR_SETUP_PARAMETERS
+from src.core.surrogate import ParameterSpace
+
+# Les modules qui lisent les réglages (src.config.settings) ne sont importés qu'après
+# init_process, dans les processus du pool : l'import de ce module ne modifie rien.
+
+logger = logging.getLogger(__name__)
+
+# Temps au tour optimal des objectifs synthétiques (secondes)
+BASE_LAP_TIME = 90.0
+
+# Écart moyen au temps optimal d'un setup tiré au hasard (part du temps au tour)
+RANDOM_SETUP_GAP = 0.03
+
+# Pénalité maximale d'une position défavorable d'un réglage discret (barre antiroulis, aileron)
+DISCRETE_PENALTY = 0.005
+
+# Démarrages simulés : étude vierge, amorcée par le même circuit ou par un circuit similaire
+STARTS = ("cold", "warm", "transfer")
+
+# Déplacement de l'optimum du circuit similaire (espace normalisé) et caractéristiques des deux circuits
+TRANSFER_SHIFT = 0.05
+TARGET_TRACK_FEATURES = {"length_km": 5.0, "corners": 12}
+SOURCE_TRACK_FEATURES = {"length_km": 5.3, "corners": 13}
+
+# Table des caractéristiques de circuits de la base jetable (transfert entre circuits)
+TRACK_FEATURES_NAME = "track_features.json"
+
+# Base jetable du processus (créée par init_process)
+_benchmark_dir = None
+
+# Dégradations tolérées par rapport à la référence avant de signaler une régression
+MAX_REACHED_DROP = 0.1      # Part des graines atteignant la cible
+MAX_LAPS_INCREASE = 0.2     # Médiane des tours nécessaires
+MAX_TIME_FACTOR = 2.0       # Coût de ask + tell par trial
+
+
+def init_process():
+    """
+    Prépare un processus du banc d'essai : base SQLite jetable, supprimée à sa sortie
+
+    Initialiseur du pool (appelé aussi par run_configuration) : les variables d'environnement
+    doivent être en place avant l'import des modules de l'application, qui lisent les
+    réglages une fois pour toutes.
+
+    Raises:
+        RuntimeError: Réglages de l'application déjà chargés dans ce processus
+    """
+    global _benchmark_dir
+    if _benchmark_dir is not None:
+        return
+    if "src.config.settings" in sys.modules:
+        raise RuntimeError("Réglages de l'application déjà chargés : le banc d'essai doit tourner "
+                           "dans un processus dédié (python -m src.core.benchmark)")
+
+    _benchmark_dir = Path(tempfile.mkdtemp(prefix="iracing-setup-benchmark-"))
+    atexit.register(shutil.rmtree, _benchmark_dir, ignore_errors=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_benchmark_dir}/optimization.db"
+    os.environ["DB_SHARDING"] = "none"
+    os.environ["COLUMNAR_TELEMETRY"] = "False"
+    os.environ["INGEST_BUFFER"] = "False"
+    os.environ["TRACK_FEATURES_FILE"] = str(_benchmark_dir / TRACK_FEATURES_NAME)
+
+    from src.storage.database import init_db
+    init_db()
+
+
+class SyntheticObjective:
+    """
+    Temps au tour synthétique sur l'espace des paramètres d'une voiture, d'optimum connu
+
+    Le temps est une forme quadratique à axes tournés (interactions entre réglages),
+    plus une pénalité propre à chaque position des réglages entiers (barres antiroulis,
+    ailerons) et un bruit gaussien par tour. L'optimum est un point de la grille des pas,
+    où les deux termes s'annulent.
+    """
+
+    def __init__(self, car_id, seed, noise=0.15, shift=0.0):
+        """
+        Args:
+            car_id (str): Voiture dont l'espace des paramètres est utilisé
+            seed (int): Graine de l'objectif (optimum, interactions, pénalités)
+            noise (float): Écart-type du bruit par tour (secondes)
+            shift (float): Déplacement aléatoire de l'optimum (circuit similaire au circuit de la graine)
+        """
+        from src.core.optimizer import parameter_distributions
+
+        rng = np.random.default_rng(seed)
+        self.space = ParameterSpace(parameter_distributions(CAR_SETUP_PARAMETERS[car_id]))
+        self.noise = noise
+        dimension = len(self.space.names)
+
+        # Optimum sur la grille et forme quadratique avec interactions (base orthonormée aléatoire)
+        optimum = rng.random((1, dimension))
+        if shift:
+            optimum += np.random.default_rng([seed, 1]).normal(scale=shift, size=optimum.shape)
+        self.optimum_values, optimum = self.space.snap(optimum)
+        self.optimum = optimum[0]
+        rotation, _ = np.linalg.qr(rng.normal(size=(dimension, dimension)))
+        self.curvature = rotation @ np.diag(rng.uniform(0.2, 1.0, size=dimension)) @ rotation.T
+
+        # Pénalité par position des réglages entiers, nulle à la position optimale
+        self.penalties = {}
+        for index in np.flatnonzero(self.space.integer):
+            levels = int(round((self.space.high[index] - self.space.low[index]) / self.space.step[index])) + 1
+            penalty = rng.uniform(0.0, DISCRETE_PENALTY * BASE_LAP_TIME, size=levels)
+            penalty[self._level(index, self.optimum_values[0, index])] = 0.0
+            self.penalties[index] = penalty
+
+        # Échelle telle qu'un setup aléatoire perde RANDOM_SETUP_GAP en moyenne
+        _, sample = self.space.snap(rng.random((4096, dimension)))
+        self.scale = 1.0
+        self.scale = RANDOM_SETUP_GAP * BASE_LAP_TIME / self._quadratic(sample).mean()
+
+    def _level(self, index, value):
+        return int(round((value - self.space.low[index]) / self.space.step[index]))
+
+    def _quadratic(self, points):
+        delta = points - self.optimum
+        return self.scale * np.einsum("ij,jk,ik->i", delta, self.curvature, delta)
+
+    def lap_time(self, params):
+        """Temps au tour sans bruit d'un setup (secondes)"""
+        point = self.space.to_unit([params])
+        seconds = BASE_LAP_TIME + float(self._quadratic(point)[0])
+        for index, penalty in self.penalties.items():
+            seconds += penalty[self._level(index, params[self.space.names[index]])]
+        return seconds
+
+    def sample_lap(self, params, rng):
+        """Temps d'un tour roulé avec ce setup (bruit compris)"""
+        return self.lap_time(params) + rng.normal(scale=self.noise)
+
+
+class LapTimeScorer:
+    """Scoreur du banc d'essai : opposé du temps au tour (sans statistiques des métriques)"""
+
+    def calculate_score(self, telemetry_data):
+        return -telemetry_data["lap_time"]
+
+
+def write_track_features(features):
+    """
+    Remplace la table des caractéristiques de circuits du processus
+
+    Seuls les circuits de l'exécution en cours y figurent : le transfert ne puise pas
+    dans les sessions des exécutions précédentes du processus.
+    """
+    with open(_benchmark_dir / TRACK_FEATURES_NAME, "w", encoding="utf-8") as f:
+        json.dump(features, f)
+
+
+def simulate_session(optimizer, objective, n_trials, laps_per_setup, rng):
+    """
+    Roule les setups proposés par une session, comme les postes de test avec l'API
+
+    Chaque tour est transmis par report_lap (POST /setup/<id>/lap) ; un relais complet
+    est noté par update_trial_score avec son temps moyen (POST /telemetry), puis le
+    setup suivant est préparé (file d'avance ou nouveau setup).
+
+    Args:
+        optimizer (SetupOptimizer): Optimiseur démarré
+        objective (SyntheticObjective): Circuit simulé
+        n_trials (int): Nombre de setups roulés
+        laps_per_setup (int): Longueur d'un relais complet
+        rng (np.random.Generator): Générateur du bruit des tours
+
+    Returns:
+        tuple: (liste (tours roulés, écart au temps optimal, élagué) par setup,
+                durée des ask, durée des tell en secondes)
+    """
+    from src.storage.repository import SetupRepository
+
+    runs = []
+    laps = 0
+    ask_time = tell_time = 0.0
+    for _ in range(n_trials):
+        setup = SetupRepository.get_pending_setup(optimizer.session_id)
+        if setup is None:
+            start = time.perf_counter()
+            setup_id = optimizer.generate_next_setup()
+            ask_time += time.perf_counter() - start
+            setup = SetupRepository.get_setup_by_id(setup_id)
+
+        params = setup.setup_parameters
+        lap_times = []
+        pruned = False
+        start = time.perf_counter()
+        for lap_number in range(1, laps_per_setup + 1):
+            lap_times.append(objective.sample_lap(params, rng))
+            laps += 1
+            _, pruned = optimizer.report_lap(setup.id, lap_number, {"lap_time": lap_times[-1]})
+            if pruned:
+                break
+        if not pruned:
+            optimizer.update_trial_score(setup.id, {"lap_time": float(np.mean(lap_times))})
+        tell_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if optimizer.lookahead > 0:
+            optimizer.refill_lookahead()
+        else:
+            optimizer.generate_next_setup()
+        ask_time += time.perf_counter() - start
+
+        runs.append((laps, objective.lap_time(params) / BASE_LAP_TIME - 1.0, pruned))
+    return runs, ask_time, tell_time
+
+
+def start_session(car_id, track_id, params, seed):
+    """Démarre une session sur un stockage Optuna en mémoire, notée par LapTimeScorer"""
+    from src.core.optimizer import SetupOptimizer
+
+    optimizer = SetupOptimizer(car_id, track_id, {**params, "seed": seed},
+                               storage=optuna.storages.InMemoryStorage())
+    optimizer.scorer = LapTimeScorer()
+    optimizer.start_optimization()
+    return optimizer
+
+
+def run_configuration(config, seed, car_id="mx5", n_trials=60, laps_per_setup=3, target=0.005, noise=0.15,
+                      history_trials=30, candidates=None):
+    """
+    Déroule une session simulée de SetupOptimizer pour une configuration et une graine
+
+    L'étude est tenue en mémoire ; les setups passent par la base jetable du processus
+    (init_process).
+    Les démarrages "warm" et "transfer" sont précédés d'une session de history_trials
+    setups sur le même circuit ou sur un circuit similaire (optimum déplacé).
+
+    Args:
+        config (dict): {"sampler", "pruner", "surrogate", "lookahead", "start"}
+        seed (int): Graine de l'objectif et du sampler
+        car_id (str): Voiture simulée
+        n_trials (int): Nombre de setups roulés
+        laps_per_setup (int): Longueur d'un relais complet
+        target (float): Écart relatif au temps optimal visé (0.005 = 0.5 %)
+        noise (float): Bruit par tour (secondes)
+        history_trials (int): Setups roulés par la session d'amorçage
+        candidates (int): Candidats évalués par le modèle de substitution (None = SURROGATE_CANDIDATES)
+
+    Returns:
+        dict: Tours roulés avant d'atteindre la cible (None si jamais atteinte), écart final
+              du meilleur setup et coût moyen de ask/tell par trial (ms)
+    """
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    warnings.filterwarnings("ignore", category=optuna.exceptions.ExperimentalWarning)
+    init_process()
+    result = {"config": config_name(config), "seed": seed, "error": None}
+    try:
+        objective = SyntheticObjective(car_id, seed, noise=noise)
+        rng = np.random.default_rng(seed + 1)
+        params = {
+            "sampler": config["sampler"],
+            "pruner": config["pruner"],
+            "surrogate": bool(config.get("surrogate")),
+            "lookahead": config.get("lookahead", 0),
+            "warm_start": config.get("start") == "warm",
+            "transfer": config.get("start") == "transfer",
+        }
+        if candidates is not None:
+            params["surrogate_candidates"] = candidates
+
+        # Circuit propre à l'exécution : les sessions partagent la base du processus
+        track_id = f"benchmark_{uuid.uuid4().hex[:12]}"
+        if config.get("start") in ("warm", "transfer"):
+            history_track_id = track_id if config["start"] == "warm" else f"{track_id}_similar"
+            history_objective = objective if config["start"] == "warm" else \
+                SyntheticObjective(car_id, seed, noise=noise, shift=TRANSFER_SHIFT)
+            write_track_features({track_id: TARGET_TRACK_FEATURES, history_track_id: SOURCE_TRACK_FEATURES})
+            history = start_session(car_id, history_track_id, {**params, "warm_start": False, "transfer": False},
+                                    seed + 2)
+            simulate_session(history, history_objective, history_trials, laps_per_setup, rng)
+            history.stop_optimization()
+
+        start = time.perf_counter()
+        optimizer = start_session(car_id, track_id, params, seed)
+        start_time = time.perf_counter() - start
+        runs, ask_time, tell_time = simulate_session(optimizer, objective, n_trials, laps_per_setup, rng)
+        optimizer.stop_optimization()
+
+        # Un setup élagué n'est pas retenu par l'équipe, même s'il était bon
+        gaps = [(laps, gap) for laps, gap, pruned in runs if not pruned]
+        result.update({
+            "laps_to_target": next((laps for laps, gap in gaps if gap <= target), None),
+            "laps": runs[-1][0] if runs else 0,
+            "final_gap": min((gap for _, gap in gaps), default=math.inf),
+            "ask_ms": 1000 * (start_time + ask_time) / n_trials,
+            "tell_ms": 1000 * tell_time / n_trials,
+        })
+    except Exception as e:
+        # Ex: module cmaes absent pour le sampler CMA-ES
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+    return result
+
+
+def config_name(config):
+    """Nom lisible d'une configuration (ex: "tpe+median+surrogate+lookahead2+warm")"""
+    parts = [config["sampler"], config["pruner"]]
+    if config.get("surrogate"):
+        parts.append("surrogate")
+    if config.get("lookahead"):
+        parts.append(f"lookahead{config['lookahead']}")
+    if config.get("start", "cold") != "cold":
+        parts.append(config["start"])
+    return "+".join(parts)
+
+
+def summarize(results):
+    """
+    Agrège les résultats par configuration
+
+    Returns:
+        dict: Par configuration, part des graines atteignant la cible, médiane des tours
+              nécessaires (None si la moitié des graines n'y arrive pas), écart final moyen
+              et coût moyen de ask/tell
+    """
+    summary = {}
+    for name in sorted({result["config"] for result in results}):
+        runs = [result for result in results if result["config"] == name]
+        errors = [result["error"] for result in runs if result["error"]]
+        ok = [result for result in runs if not result["error"]]
+        if not ok:
+            summary[name] = {"runs": len(runs), "error": errors[0]}
+            continue
+        laps = np.array([result["laps_to_target"] if result["laps_to_target"] is not None else np.inf
+                         for result in ok])
+        median = float(np.median(laps))
+        summary[name] = {
+            "runs": len(ok),
+            "reached": float(np.isfinite(laps).mean()),
+            "median_laps": median if math.isfinite(median) else None,
+            "final_gap_pct": 100 * float(np.mean([result["final_gap"] for result in ok])),
+            "ask_ms": float(np.mean([result["ask_ms"] for result in ok])),
+            "tell_ms": float(np.mean([result["tell_ms"] for result in ok])),
+        }
+    return summary
+
+
+def compare(summary, baseline):
+    """
+    Compare un résumé à une référence enregistrée
+
+    Returns:
+        list: Régressions détectées (messages)
+    """
+    problems = []
+    for name, reference in baseline.items():
+        current = summary.get(name)
+        if current is None or "error" in reference:
+            continue
+        if "error" in current:
+            problems.append(f"{name}: {current['error']}")
+            continue
+        if current["reached"] < reference["reached"] - MAX_REACHED_DROP:
+            problems.append(f"{name}: cible atteinte pour {current['reached']:.0%} des graines "
+                            f"(référence {reference['reached']:.0%})")
+        if reference["median_laps"] is not None and (
+                current["median_laps"] is None
+                or current["median_laps"] > reference["median_laps"] * (1 + MAX_LAPS_INCREASE)):
+            problems.append(f"{name}: médiane de {current['median_laps']} tours "
+                            f"(référence {reference['median_laps']})")
+        cost, reference_cost = current["ask_ms"] + current["tell_ms"], reference["ask_ms"] + reference["tell_ms"]
+        if cost > reference_cost * MAX_TIME_FACTOR + 1.0:
+            problems.append(f"{name}: ask/tell {cost:.1f} ms par trial (référence {reference_cost:.1f} ms)")
+    return problems
+
+
+def run_benchmark(configs, seeds, workers=None, **options):
+    """
+    Exécute chaque configuration pour chaque graine dans un pool de processus
+
+    Les processus sont démarrés par "spawn", sans les modules de l'application déjà
+    chargés : init_process leur donne à chacun sa propre base jetable.
+
+    Returns:
+        list: Résultats de run_configuration
+    """
+    tasks = list(itertools.product(configs, seeds))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_process) as pool:
+        futures = [pool.submit(run_configuration, config, seed, **options) for config, seed in tasks]
+        return [future.result() for future in futures]
+
+
+def main(argv=None):
+    """Banc d'essai des samplers : python -m src.core.benchmark [options]"""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.core.benchmark",
+        description="Compare les samplers et pruners sur des objectifs synthétiques"
+    )
+    parser.add_argument("--car", default="mx5", choices=sorted(CAR_SETUP_PARAMETERS))
+    parser.add_argument("--samplers", default="tpe,cmaes,random", help="Samplers comparés (séparés par des virgules)")
+    parser.add_argument("--pruners", default="none,median,hyperband", help="Pruners comparés")
+    parser.add_argument("--surrogate", action="store_true", help="Ajoute chaque configuration avec présélection")
+    parser.add_argument("--candidates", type=int, default=None,
+                        help="Candidats évalués par le modèle de substitution (défaut : SURROGATE_CANDIDATES)")
+    parser.add_argument("--lookahead", default="0", help="Tailles de file d'avance comparées (ex: 0,2)")
+    parser.add_argument("--starts", default="cold", help=f"Démarrages comparés ({','.join(STARTS)})")
+    parser.add_argument("--history", type=int, default=30, help="Setups de la session d'amorçage (warm, transfer)")
+    parser.add_argument("--seeds", type=int, default=20, help="Nombre de graines par configuration")
+    parser.add_argument("--trials", type=int, default=60, help="Setups proposés par étude")
+    parser.add_argument("--laps", type=int, default=3, help="Tours par relais complet")
+    parser.add_argument("--target", type=float, default=0.5, help="Écart visé au temps optimal (%%)")
+    parser.add_argument("--noise", type=float, default=0.15, help="Bruit par tour (secondes)")
+    parser.add_argument("--workers", type=int, default=None, help="Processus (défaut : nombre de cœurs)")
+    parser.add_argument("--output", help="Enregistre le résumé (JSON), ex: référence pour --baseline")
+    parser.add_argument("--baseline", help="Résumé de référence : code de sortie 1 en cas de régression")
+    args = parser.parse_args(argv)
+
+    starts = args.starts.split(",")
+    unknown = [start for start in starts if start not in STARTS]
+    if unknown:
+        parser.error(f"démarrage inconnu: {', '.join(unknown)}")
+    configs = [
+        {"sampler": sampler, "pruner": pruner, "surrogate": surrogate, "lookahead": lookahead, "start": start}
+        for sampler in args.samplers.split(",")
+        for pruner in args.pruners.split(",")
+        for surrogate in ([False, True] if args.surrogate else [False])
+        for lookahead in [int(size) for size in args.lookahead.split(",")]
+        for start in starts
+    ]
+    started = time.perf_counter()
+    results = run_benchmark(
+        configs, range(args.seeds), workers=args.workers, car_id=args.car, n_trials=args.trials,
+        laps_per_setup=args.laps, target=args.target / 100, noise=args.noise,
+        history_trials=args.history, candidates=args.candidates
+    )
+    summary = summarize(results)
+
+    print(f"{len(results)} études simulées en {time.perf_counter() - started:.1f} s "
+          f"({args.car}, {args.trials} setups, cible {args.target} %)")
+    print(f"{'configuration':<40}{'cible':>7}{'tours':>8}{'écart %':>9}{'ask ms':>9}{'tell ms':>9}")
+    for name, row in summary.items():
+        if "error" in row:
+            print(f"{name:<40}  {row['error']}")
+            continue
+        median = "-" if row["median_laps"] is None else f"{row['median_laps']:.0f}"
+        print(f"{name:<40}{row['reached']:>7.0%}{median:>8}{row['final_gap_pct']:>9.2f}"
+              f"{row['ask_ms']:>9.2f}{row['tell_ms']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(summary, json.load(f))
+        for problem in problems:
+            print(f"[RÉGRESSION] {problem}")
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
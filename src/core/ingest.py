@@ -0,0 +1,274 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Verrou inter-processus indisponible (Windows) : pas de reprise des autres workers
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+
+
+def _lock_file(log_file, blocking=True):
+    """Verrou exclusif d'un segment (tenu par son propriétaire tant qu'il est ouvert)"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(log_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def read_segment(log_file):
+    """
+    Lit les enregistrements d'un segment du journal
+
+    Une dernière ligne tronquée (arrêt brutal pendant l'écriture) est ignorée :
+    elle n'a jamais été acquittée.
+
+    Returns:
+        list: Tuples (séquence, enregistrement)
+    """
+    entries = []
+    for line in log_file:
+        try:
+            entry = json.loads(line)
+            entries.append((entry["seq"], entry["record"]))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ligne illisible ignorée dans le journal d'ingestion {log_file.name}")
+    return entries
+
+
+class IngestBuffer:
+    """
+    Tampon d'écriture différée de la télémétrie
+
+    Chaque tour est ajouté à un journal local (un fichier en ajout seul, synchronisé sur
+    disque avant l'acquittement) puis écrit en base par lots : toutes les X ms ou dès
+    N tours en attente, en une seule transaction. Les fsync concurrents sont regroupés.
+
+    Le journal est découpé en segments : un segment est supprimé une fois son lot validé
+    en base. La séquence du dernier tour validé est enregistrée dans la même transaction
+    (handler), ce qui permet de rejouer sans doublon les segments d'un processus arrêté
+    brutalement.
+    """
+
+    def __init__(self, directory, handler, flush_interval_ms=50, max_records=500):
+        """
+        Args:
+            directory (Path): Répertoire du journal
+            handler (callable): handler(stream, records, sequence) -> bool, écrit un lot en base
+                                et enregistre la séquence du flux dans la même transaction
+            flush_interval_ms (int): Délai maximal avant écriture d'un lot (ms)
+            max_records (int): Nombre de tours déclenchant l'écriture immédiate d'un lot
+        """
+        self.directory = directory
+        self.handler = handler
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_records = max_records
+        self.stream = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._segment = None
+        self._segment_index = 0
+        self._sequence = 0
+        self._synced = 0
+        self._pending = []
+        # Segments fermés en attente d'écriture en base : (fichier, enregistrements)
+        self._sealed = []
+
+    def _segment_path(self, stream, index):
+        return self.directory / f"{stream}_{index:08d}{SEGMENT_SUFFIX}"
+
+    def _open_segment(self):
+        self._segment_index += 1
+        self._segment = open(self._segment_path(self.stream, self._segment_index), "a", encoding="utf-8")
+        _lock_file(self._segment)
+
+    def _ensure_started(self):
+        # Démarrage paresseux : le flux et le thread appartiennent au processus qui écrit
+        # (important avec gunicorn, qui forke après l'import des modules)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.stream is None:
+            self.stream = uuid.uuid4().hex
+            self._open_segment()
+            atexit.register(self.flush)
+        self._thread = threading.Thread(target=self._run, name="ingest-buffer", daemon=True)
+        self._thread.start()
+
+    def append(self, record):
+        """
+        Ajoute un tour au journal et attend qu'il soit sur disque
+
+        Args:
+            record (dict): Tour à enregistrer (sérialisable en JSON)
+
+        Returns:
+            int: Séquence du tour dans le flux de ce processus
+        """
+        with self._lock:
+            self._ensure_started()
+            self._sequence += 1
+            sequence = self._sequence
+            self._segment.write(json.dumps({"seq": sequence, "record": record}, separators=(",", ":")) + "\n")
+            self._segment.flush()
+            self._pending.append(record)
+            if len(self._pending) >= self.max_records:
+                self._wakeup.set()
+
+        self._sync(sequence)
+        return sequence
+
+    def _sync(self, sequence):
+        """fsync groupé : un seul appel couvre tous les tours écrits avant lui"""
+        with self._sync_lock:
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                target = self._sequence
+                segment = self._segment
+            os.fsync(segment.fileno())
+            self._synced = target
+
+    def _seal(self):
+        """Ferme le segment courant (et ses tours en attente) puis en ouvre un nouveau"""
+        with self._sync_lock, self._lock:
+            if not self._pending:
+                return
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._synced = self._sequence
+            self._sealed.append((self._segment, self._pending, self._sequence))
+            self._pending = []
+            self._open_segment()
+
+    def flush(self):
+        """
+        Écrit en base les tours en attente (appelé par le thread du tampon et à l'arrêt)
+
+        Returns:
+            bool: True si tous les lots ont été validés
+        """
+        with self._flush_lock:
+            if self.stream is None:
+                return True
+            self._seal()
+            while self._sealed:
+                segment, records, sequence = self._sealed[0]
+                if not self._write_batches(self.stream, records, sequence):
+                    # Nouvel essai au prochain cycle, dans le même ordre
+                    return False
+                self._sealed.pop(0)
+                segment.close()
+                os.remove(segment.name)
+            return True
+
+    def _write_batches(self, stream, records, last_sequence):
+        """Écrit des tours par lots de max_records (le dernier lot porte la séquence du segment)"""
+        first_sequence = last_sequence - len(records) + 1
+        for start in range(0, len(records), self.max_records):
+            chunk = records[start:start + self.max_records]
+            try:
+                if not self.handler(stream, chunk, first_sequence + start + len(chunk) - 1):
+                    return False
+            except Exception as e:
+                logger.error(f"Erreur lors de l'écriture d'un lot du journal d'ingestion: {str(e)}")
+                return False
+        return True
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def pending_count(self):
+        """Nombre de tours acquittés mais pas encore écrits en base"""
+        with self._lock:
+            return len(self._pending) + sum(len(records) for _, records, _ in self._sealed)
+
+    def replay(self, get_committed, clear_checkpoint):
+        """
+        Rejoue les segments laissés par des processus arrêtés (à appeler au démarrage)
+
+        Un segment encore verrouillé appartient à un processus vivant et n'est pas touché.
+
+        Args:
+            get_committed (callable): get_committed(stream) -> committed(séquence, tour), indique
+                                      si un tour est déjà validé en base (None si erreur)
+            clear_checkpoint (callable): clear_checkpoint(stream), une fois le flux entièrement rejoué
+
+        Returns:
+            int: Nombre de tours rejoués
+        """
+        if not self.directory.exists():
+            return 0
+
+        streams = {}
+        for path in sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}")):
+            stream = path.name.rsplit("_", 1)[0]
+            if stream != self.stream:
+                streams.setdefault(stream, []).append(path)
+
+        replayed = 0
+        for stream, paths in streams.items():
+            segments = []
+            try:
+                for path in paths:
+                    segment = open(path, "r", encoding="utf-8")
+                    segments.append(segment)
+                    if not _lock_file(segment, blocking=False):
+                        raise BlockingIOError(path)
+            except BlockingIOError:
+                # Flux d'un processus en cours d'exécution
+                for segment in segments:
+                    segment.close()
+                continue
+            except OSError as e:
+                logger.error(f"Erreur lors de l'ouverture du journal d'ingestion {stream}: {str(e)}")
+                for segment in segments:
+                    segment.close()
+                continue
+
+            committed = get_committed(stream)
+            if committed is None:
+                for segment in segments:
+                    segment.close()
+                continue
+
+            entries = [entry for segment in segments for entry in read_segment(segment)]
+            entries = [(sequence, record) for sequence, record in entries if not committed(sequence, record)]
+            complete = True
+            for start in range(0, len(entries), self.max_records):
+                chunk = entries[start:start + self.max_records]
+                try:
+                    written = self.handler(stream, [record for _, record in chunk], chunk[-1][0])
+                except Exception as e:
+                    logger.error(f"Erreur lors de la reprise du journal d'ingestion {stream}: {str(e)}")
+                    written = False
+                if not written:
+                    complete = False
+                    break
+                replayed += len(chunk)
+
+            for segment in segments:
+                segment.close()
+                if complete:
+                    os.remove(segment.name)
+            if complete:
+                clear_checkpoint(stream)
+                logger.info(f"Journal d'ingestion {stream} rejoué: {len(entries)} tours")
+
+        return replayed
@@ -0,0 +1,130 @@
+from src.config.constants import PERFORMANCE_METRICS
+
+# Positions des pneus
+TIRE_POSITIONS = ["fl", "fr", "rl", "rr"]
+
+# Canal brut utilisé pour mesurer la stabilité (variance du taux de lacet)
+STABILITY_CHANNEL = "yaw_rate"
+
+# Métriques subjectives/moyennées directement lorsqu'elles sont présentes dans les échantillons
+AVERAGED_METRICS = [
+    "car_stability",
+    "corner_entry_stability",
+    "corner_exit_stability",
+    "traction",
+    "braking_stability",
+]
+
+
+class RunningStat:
+    """Statistiques d'un canal en mémoire constante (algorithme de Welford)"""
+
+    __slots__ = ("count", "mean", "_m2", "min", "max", "first", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.first = None
+        self.last = None
+
+    def add(self, value):
+        """Ajoute une valeur au canal"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if self.first is None:
+            self.first = value
+            self.min = value
+            self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.last = value
+
+    @property
+    def variance(self):
+        """Variance de population du canal"""
+        if self.count < 2:
+            return 0.0
+        return self._m2 / self.count
+
+
+class LapAggregator:
+    """
+    Agrège des échantillons bruts de télémétrie (60 Hz) en un résumé par tour
+
+    Chaque canal numérique est replié dans un RunningStat : la mémoire utilisée
+    dépend du nombre de canaux, jamais du nombre d'échantillons.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Réinitialise les agrégats pour un nouveau tour"""
+        self.channels = {}
+        self.sample_count = 0
+
+    def add_sample(self, sample):
+        """
+        Ajoute un échantillon brut
+
+        Args:
+            sample (dict): Valeurs instantanées indexées par nom de canal
+        """
+        for channel, value in sample.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            stat = self.channels.get(channel)
+            if stat is None:
+                stat = self.channels[channel] = RunningStat()
+            stat.add(float(value))
+        self.sample_count += 1
+
+    def summary(self, lap_time):
+        """
+        Construit le résumé du tour au format attendu par le scoreur
+
+        Args:
+            lap_time (float): Temps au tour (secondes)
+
+        Returns:
+            dict: Métriques du tour (PERFORMANCE_METRICS et métriques dérivées)
+        """
+        channels = dict(self.channels)
+        summary = {"lap_time": lap_time}
+
+        for position in TIRE_POSITIONS:
+            # Températures : moyenne et pic sur le tour
+            raw_temp = channels.pop(f"tire_temp_{position}", None)
+            avg_temp = channels.pop(f"tire_avg_temp_{position}", None)
+            temp = raw_temp if raw_temp is not None else avg_temp
+            if temp is not None:
+                summary[f"tire_avg_temp_{position}"] = temp.mean
+                summary[f"tire_peak_temp_{position}"] = temp.max
+
+            # Usure : delta entre le début et la fin du tour
+            wear = channels.pop(f"tire_wear_{position}", None)
+            if wear is not None:
+                summary[f"tire_wear_{position}"] = wear.last - wear.first
+
+        for metric in AVERAGED_METRICS:
+            stat = channels.pop(metric, None)
+            if stat is not None:
+                summary[metric] = stat.mean
+
+        stability = channels.pop(STABILITY_CHANNEL, None)
+        if stability is not None:
+            summary["stability_variance"] = stability.variance
+
+        # Les autres canaux sont conservés sous forme de moyenne pour analyse ultérieure
+        for channel, stat in channels.items():
+            if channel not in PERFORMANCE_METRICS:
+                summary[f"{channel}_avg"] = stat.mean
+
+        return summary
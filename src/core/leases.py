@@ -0,0 +1,57 @@
+import logging
+import threading
+import time
+from src.config.settings import LEASE_SWEEP_INTERVAL
+from src.storage.repository import SetupRepository
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseSweeper:
+    """
+    Remet périodiquement en file les setups dont la réservation a expiré
+
+    Un poste de test arrêté ou déconnecté ne bloque ainsi pas son setup : un autre
+    poste le reçoit au prochain GET /setup/next.
+    """
+
+    def __init__(self, interval=LEASE_SWEEP_INTERVAL):
+        """
+        Args:
+            interval (int): Intervalle entre deux passes (secondes)
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ensure_started(self):
+        # Démarrage paresseux : le thread est créé dans le processus qui réserve des setups
+        # (important avec gunicorn, qui forke après l'import des modules)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lease-sweeper", daemon=True)
+                self._thread.start()
+
+    def sweep(self):
+        """
+        Remet en file les réservations expirées
+
+        Returns:
+            int: Nombre de setups remis en file
+        """
+        released = SetupRepository.release_expired_leases() or 0
+        if released:
+            logger.info(f"{released} setup(s) remis en file après expiration de leur réservation")
+        return released
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Erreur lors de la remise en file des réservations: {str(e)}")
+
+
+# Balayeur partagé par l'application
+lease_sweeper = LeaseSweeper()
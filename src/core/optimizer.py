@@ -2,17 +2,87 @@ import optuna
 import numpy as np
 import json
 import logging
+import os
+import threading
 from datetime import datetime
 from src.config.constants import CAR_SETUP_PARAMETERS, SETUP_STATUS, SETUP_SOURCE
+from src.config.settings import (
+    SETUP_LOOKAHEAD, WARM_START, WARM_START_TOP_K, WARM_START_MAX_TRIALS,
+    TRANSFER_PRIOR, TRANSFER_MAX_TRACKS, TRANSFER_MIN_SIMILARITY, TRANSFER_MAX_TRIALS,
+    SURROGATE_SCREENING, SURROGATE_CANDIDATES, SURROGATE_MIN_TRIALS, SURROGATE_MAX_POINTS
+)
 from src.storage.repository import SetupRepository, OptimizationRepository
-from src.core.scoring import SetupScorer
+from src.storage.database import get_study_storage
+from src.core.scoring import get_scorer
+from src.core.transfer import similar_tracks
+from src.core.surrogate import GaussianProcessSurrogate, ParameterSpace, screen_candidates
 
 logger = logging.getLogger(__name__)
 
+
+def parameter_distributions(car_params):
+    """
+    Décrit l'espace des paramètres d'une voiture en distributions Optuna
+    
+    Args:
+        car_params (dict): Bornes et pas des paramètres (CAR_SETUP_PARAMETERS[car_id])
+        
+    Returns:
+        dict: Distributions indexées par nom de paramètre
+    """
+    distributions = {}
+    
+    # Pour chaque paramètre défini pour cette voiture
+    for param_name, param_config in car_params.items():
+        min_val = param_config["min"]
+        max_val = param_config["max"]
+        step = param_config.get("step", None)
+        
+        # Traite différemment selon le type de paramètre
+        if isinstance(min_val, int) and isinstance(max_val, int):
+            # Paramètre entier
+            distributions[param_name] = optuna.distributions.IntDistribution(min_val, max_val, step=step or 1)
+        else:
+            # Paramètre flottant
+            distributions[param_name] = optuna.distributions.FloatDistribution(min_val, max_val, step=step)
+            
+    return distributions
+
+
+def create_sampler(name, seed, constant_liar=False):
+    """
+    Crée un sampler Optuna à partir de son nom ("tpe", "cmaes" ou "random", TPE par défaut)
+    
+    Args:
+        name (str): Nom du sampler
+        seed (int): Graine aléatoire
+        constant_liar (bool): Les trials en attente sont supposés mauvais (TPE)
+        
+    Returns:
+        optuna.samplers.BaseSampler: Sampler configuré
+    """
+    if name == "cmaes":
+        return optuna.samplers.CmaEsSampler(seed=seed)
+    elif name == "random":
+        return optuna.samplers.RandomSampler(seed=seed)
+    else:
+        return optuna.samplers.TPESampler(seed=seed, constant_liar=constant_liar)
+
+
+def create_pruner(name):
+    """Crée un pruner Optuna à partir de son nom ("hyperband", "median", sinon aucun)"""
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner()
+    elif name == "median":
+        return optuna.pruners.MedianPruner()
+    else:
+        return None
+
+
 class SetupOptimizer:
     """Classe gérant l'optimisation des setups via Optuna"""
     
-    def __init__(self, car_id, track_id, optimization_params=None):
+    def __init__(self, car_id, track_id, optimization_params=None, storage=None):
         """
         Initialise l'optimiseur pour une voiture et une piste spécifiques
         
@@ -20,6 +90,7 @@ class SetupOptimizer:
             car_id (str): Identifiant de la voiture (ex: "mx5")
             track_id (str): Identifiant du circuit (ex: "spa")
             optimization_params (dict): Paramètres d'optimisation personnalisés
+            storage (optuna.storages.BaseStorage): Stockage de l'étude (défaut : stockage partagé de la voiture)
         """
         self.car_id = car_id
         self.track_id = track_id
@@ -34,10 +105,16 @@ class SetupOptimizer:
             "seed": 42,                   # Graine aléatoire
             "initial_setups": 5,          # Nombre de setups initiaux à tester
             "exploration_weight": 0.3,    # Poids pour l'exploration (vs exploitation)
+            "lookahead": SETUP_LOOKAHEAD, # Setups en attente maintenus d'avance (0 = un par tour reçu)
+            "warm_start": WARM_START,     # Amorce l'étude avec les setups déjà testés voiture/piste
+            "warm_start_top_k": WARM_START_TOP_K,  # Meilleurs setups historiques re-testés en premier
+            "transfer": TRANSFER_PRIOR,   # A priori tiré des circuits similaires pour la même voiture
+            "surrogate": SURROGATE_SCREENING,  # Présélection des setups par un modèle de substitution
+            "surrogate_candidates": SURROGATE_CANDIDATES,  # Candidats évalués par le modèle à chaque setup
         }
         
-        # Utilise les paramètres fournis ou les paramètres par défaut
-        self.params = optimization_params if optimization_params else self.default_params
+        # Complète les paramètres fournis avec les paramètres par défaut
+        self.params = {**self.default_params, **(optimization_params or {})}
         
         # Vérifie si les paramètres de la voiture existent
         if car_id not in CAR_SETUP_PARAMETERS:
@@ -45,9 +122,40 @@ class SetupOptimizer:
             
         self.car_params = CAR_SETUP_PARAMETERS[car_id]
         self.study = None
+        self.study_name = None
         self.session_id = None
-        self.scorer = SetupScorer()
+        # Stockage de l'étude (API publique des stockages Optuna pour les tours intermédiaires)
+        self.storage = storage
+        self._study_id = None
+        # Scoreur partagé par voiture/circuit (statistiques de normalisation persistées)
+        self.scorer = get_scorer(car_id, track_id)
+        
+        # Nombre de trials de l'étude (estimation de l'empreinte mémoire)
+        self.trial_count = 0
+        
+        # Index setup_id -> numéro de trial (persisté dans SetupConfiguration.trial_number)
+        self._trial_numbers = {}
+        
+        # A priori des circuits similaires en attente de la signature télémétrique du circuit
+        self._transfer_pending = False
+        
+        # Modèle de substitution (processus gaussien) et trials terminés qu'il a déjà intégrés
+        self._surrogate = GaussianProcessSurrogate(max_points=SURROGATE_MAX_POINTS)
+        self._surrogate_seen = set()
+        
+        # Trials déjà lus dans le stockage : numéros inférieurs à _trial_high_water,
+        # hors ceux encore ouverts (en file ou en cours de test) relus à chaque présélection
+        self._trial_high_water = 0
+        self._open_trials = set()
+        self._rng = np.random.default_rng(self.params["seed"])
+        
+        # Verrou protégeant l'étude : ask/tell peuvent venir du worker et des requêtes
+        self._lock = threading.RLock()
         
+    def _distributions(self):
+        """Distributions Optuna des paramètres de la voiture"""
+        return parameter_distributions(self.car_params)
+    
     def _create_parameter_space(self, trial):
         """
         Crée l'espace des paramètres pour Optuna
@@ -60,55 +168,225 @@ class SetupOptimizer:
         """
         setup_params = {}
         
-        # Pour chaque paramètre défini pour cette voiture
-        for param_name, param_config in self.car_params.items():
-            min_val = param_config["min"]
-            max_val = param_config["max"]
-            step = param_config.get("step", None)
-            
-            # Traite différemment selon le type de paramètre
-            if isinstance(min_val, int) and isinstance(max_val, int):
-                # Paramètre entier
-                setup_params[param_name] = trial.suggest_int(param_name, min_val, max_val, step)
+        for param_name, distribution in self._distributions().items():
+            if isinstance(distribution, optuna.distributions.IntDistribution):
+                setup_params[param_name] = trial.suggest_int(
+                    param_name, distribution.low, distribution.high, step=distribution.step)
             else:
-                # Paramètre flottant
-                setup_params[param_name] = trial.suggest_float(param_name, min_val, max_val, step=step)
+                setup_params[param_name] = trial.suggest_float(
+                    param_name, distribution.low, distribution.high, step=distribution.step)
                 
         return setup_params
     
-    def _objective(self, trial):
+    def _warm_start(self):
         """
-        Fonction objectif pour Optuna. Cette fonction est appelée pour chaque essai.
+        Amorce l'étude avec les setups déjà testés pour la même voiture et le même circuit
+        
+        Les setups historiques sont ajoutés en trials terminés avec leur score (le sampler
+        modélise l'espace dès le premier ask) et les meilleurs sont mis en file pour être
+        re-testés en premier, les conditions de piste ayant pu changer depuis.
         
-        Args:
-            trial: Instance de trial Optuna
-            
         Returns:
-            float: Score du setup (plus élevé = meilleur)
+            int: Nombre de trials historiques ajoutés
+        """
+        history = SetupRepository.get_scored_setups(self.car_id, self.track_id, limit=WARM_START_MAX_TRIALS)
+        if not history:
+            return 0
+        
+        distributions = self._distributions()
+        trials = []
+        best_params = []
+        for setup_id, setup_parameters, score in history:
+            trial = self._historical_trial(setup_parameters, score, distributions,
+                                           {"historical_setup_id": setup_id})
+            if trial is None:
+                continue
+            trials.append(trial)
+            if len(best_params) < self.params["warm_start_top_k"]:
+                best_params.append((setup_id, trial.params))
+        
+        with self._lock:
+            self.study.add_trials(trials)
+            for setup_id, params in best_params:
+                self.study.enqueue_trial(params, user_attrs={"revalidates_setup_id": setup_id})
+            self.trial_count += len(trials)
+        
+        logger.info(f"Étude {self.study_name} amorcée avec {len(trials)} setup(s) historique(s), "
+                    f"{len(best_params)} à re-tester")
+        return len(trials)
+    
+    def _historical_trial(self, setup_parameters, value, distributions, user_attrs):
+        """Trial terminé reprenant un setup déjà testé (None si hors de l'espace actuel)"""
+        params = {name: setup_parameters.get(name) for name in distributions}
+        try:
+            return optuna.trial.create_trial(
+                params=params,
+                distributions=distributions,
+                value=value,
+                user_attrs=user_attrs
+            )
+        except ValueError:
+            # Paramètre absent ou hors des bornes actuelles de la voiture
+            return None
+    
+    def _transfer_prior(self):
         """
-        # Génère les paramètres du setup
-        setup_params = self._create_parameter_space(trial)
+        Amorce l'étude avec les meilleurs setups de la voiture sur les circuits similaires
         
-        # Sauvegarde le setup dans la base de données
-        setup_id = SetupRepository.create_setup(
-            car_id=self.car_id,
-            track_id=self.track_id,
-            setup_parameters=setup_params,
-            status=SETUP_STATUS["PENDING"],
-            source=SETUP_SOURCE["OPTIMIZED"],
-            optimization_session_id=self.session_id
-        )
+        Chaque circuit retenu apporte ses meilleurs setups en proportion de sa similarité.
+        Leurs scores sont rapprochés de la moyenne des setups transférés d'autant plus que
+        la similarité est faible (valeur = moyenne + similarité * écart) : un circuit peu
+        similaire ne fournit ni les meilleurs ni les pires points du sampler, quels que
+        soient la direction de l'étude et le signe des scores. Le setup transféré au
+        meilleur score pondéré est testé en premier.
+        
+        Returns:
+            bool: False si le circuit n'est pas encore décrit (nouvel essai après les premiers tours)
+        """
+        tracks = similar_tracks(self.car_id, self.track_id,
+                                limit=TRANSFER_MAX_TRACKS, min_similarity=TRANSFER_MIN_SIMILARITY)
+        if tracks is None:
+            return False
         
-        if setup_id is None:
-            logger.error("Erreur lors de la création du setup")
-            return 0.0
+        history = []
+        for track_id, similarity in tracks:
+            limit = max(1, int(TRANSFER_MAX_TRIALS * similarity))
+            history.extend((track_id, similarity, setup_id, setup_parameters, score)
+                           for setup_id, setup_parameters, score in SetupRepository.get_scored_setups(
+                               self.car_id, track_id, limit=limit))
+        if not history:
+            return True
+        
+        mean = sum(score for *_, score in history) / len(history)
+        distributions = self._distributions()
+        trials = []
+        for track_id, similarity, setup_id, setup_parameters, score in history:
+            trial = self._historical_trial(setup_parameters, mean + similarity * (score - mean), distributions, {
+                "historical_setup_id": setup_id,
+                "transfer_track_id": track_id,
+                "similarity": similarity
+            })
+            if trial is None:
+                continue
+            trials.append(trial)
+        
+        if not trials:
+            return True
+        
+        if self.study.direction == optuna.study.StudyDirection.MINIMIZE:
+            best = min(trials, key=lambda trial: trial.value)
+        else:
+            best = max(trials, key=lambda trial: trial.value)
+        with self._lock:
+            self.study.add_trials(trials)
+            self.study.enqueue_trial(best.params, user_attrs={
+                "revalidates_setup_id": best.user_attrs["historical_setup_id"]
+            })
+            self.trial_count += len(trials)
+        
+        logger.info(f"Étude {self.study_name} amorcée avec {len(trials)} setup(s) de circuits similaires: "
+                    + ", ".join(f"{track_id} ({similarity:.2f})" for track_id, similarity in tracks))
+        return True
+    
+    def _set_transfer_pending(self, pending):
+        """Note dans l'étude si l'a priori attend encore la signature du circuit (partagé entre workers)"""
+        if pending != self._transfer_pending:
+            self.study.set_user_attr("transfer_pending", pending)
+        self._transfer_pending = pending
+    
+    def _storage_study_id(self):
+        """ID de l'étude dans son stockage (retrouvé par son nom)"""
+        if self._study_id is None:
+            self._study_id = self.storage.get_study_id_from_name(self.study.study_name)
+        return self._study_id
+    
+    def _poll_trials(self):
+        """
+        Lit les trials apparus depuis le dernier appel et ceux qui étaient encore ouverts
         
-        # Stocke l'ID du setup dans le trial pour référence future
-        trial.set_user_attr("setup_id", setup_id)
+        Le premier appel lit toute l'étude (amorçage, session rechargée) ; les suivants ne
+        relisent que les trials en file ou en cours et les nouveaux numéros, ajoutés par
+        ce worker ou par un autre.
         
-        # En mode asynchrone, on retourne une valeur fictive
-        # Le vrai score sera mis à jour plus tard via callback
-        return 0.0
+        Returns:
+            list: Trials lus (FrozenTrial), dans leur état actuel
+        """
+        if self._trial_high_water == 0:
+            trials = self.study.get_trials(deepcopy=False)
+            self._trial_high_water = len(trials)
+        else:
+            study_id = self._storage_study_id()
+            trials = [
+                self.storage.get_trial(self.storage.get_trial_id_from_study_id_trial_number(study_id, number))
+                for number in sorted(self._open_trials)
+            ]
+            while True:
+                try:
+                    trial_id = self.storage.get_trial_id_from_study_id_trial_number(study_id, self._trial_high_water)
+                except KeyError:
+                    break
+                trials.append(self.storage.get_trial(trial_id))
+                self._trial_high_water += 1
+        
+        self._open_trials = {trial.number for trial in trials if not trial.state.is_finished()}
+        return trials
+    
+    def _update_surrogate(self, trials):
+        """
+        Intègre au modèle de substitution les trials terminés qu'il ne connaît pas encore
+        
+        Seuls les nouveaux points sont ajoutés (mise à jour incrémentale), y compris les
+        trials ajoutés par l'amorçage ou par un autre worker.
+        
+        Args:
+            trials (list): Trials terminés (FrozenTrial) à intégrer
+        """
+        space = ParameterSpace(self._distributions())
+        new = [
+            trial for trial in trials
+            if trial.number not in self._surrogate_seen and trial.value is not None
+            and all(name in trial.params for name in space.names)
+        ]
+        if not new:
+            return
+        
+        # Le modèle maximise : les scores d'une étude en minimisation sont inversés
+        sign = 1.0 if self.params["direction"] == "maximize" else -1.0
+        self._surrogate.add(space.to_unit([trial.params for trial in new]),
+                            [sign * trial.value for trial in new])
+        self._surrogate_seen.update(trial.number for trial in new)
+    
+    def _screen_next_setup(self):
+        """
+        Met en file le candidat le plus prometteur selon le modèle de substitution
+        
+        Des milliers de candidats sont évalués par l'amélioration espérée ; seul le
+        meilleur est mis en file et sera renvoyé par le prochain ask. Les setups en
+        cours de test sont évités. Rien n'est fait tant que le modèle a trop peu de
+        points ou si des setups sont déjà en file (ex: re-validation de l'amorçage).
+        
+        Returns:
+            dict: Paramètres mis en file, None si le sampler choisit seul
+        """
+        trials = self._poll_trials()
+        states = optuna.trial.TrialState
+        self._update_surrogate([trial for trial in trials if trial.state == states.COMPLETE])
+        if any(trial.state == states.WAITING for trial in trials):
+            return None
+        
+        if len(self._surrogate) < SURROGATE_MIN_TRIALS:
+            return None
+        
+        space = ParameterSpace(self._distributions())
+        pending = space.to_unit([
+            trial.params for trial in trials
+            if trial.state == states.RUNNING and all(name in trial.params for name in space.names)
+        ])
+        params, improvement = screen_candidates(
+            self._surrogate, space, self.params["surrogate_candidates"], self._rng, pending=pending
+        )
+        self.study.enqueue_trial(params, user_attrs={"expected_improvement": improvement})
+        return params
     
     def update_trial_score(self, setup_id, telemetry_data):
         """
@@ -121,35 +399,186 @@ class SetupOptimizer:
         Returns:
             float: Score calculé
         """
-        if self.study is None:
-            logger.error("Aucune étude d'optimisation active")
-            return None
+        with self._lock:
+            if self.study is None:
+                logger.error("Aucune étude d'optimisation active")
+                return None
+            
+            # Calcule le score
+            score = self.scorer.calculate_score(telemetry_data)
+            
+            # Met à jour le statut et le score du setup
+            SetupRepository.update_setup_status(
+                setup_id=setup_id,
+                status=SETUP_STATUS["TESTED"],
+                score=score
+            )
+            
+            # Transmet le score à Optuna
+            self.tell_scores({setup_id: score})
             
-        # Calcule le score
-        score = self.scorer.calculate_score(telemetry_data)
+            return score
+    
+    def tell_scores(self, scores):
+        """
+        Transmet à Optuna les scores de plusieurs setups en une seule passe
         
-        # Met à jour le statut et le score du setup
-        SetupRepository.update_setup_status(
-            setup_id=setup_id,
-            status=SETUP_STATUS["TESTED"],
-            score=score
-        )
+        Args:
+            scores (dict): Scores indexés par ID de setup
+            
+        Returns:
+            list: IDs des setups dont le trial a été mis à jour
+        """
+        with self._lock:
+            if self.study is None:
+                logger.error("Aucune étude d'optimisation active")
+                return []
+            
+            # Retrouve les trials via l'index (sans parcourir study.trials)
+            self._index_trials(scores)
+            
+            # Met à jour le score des trials encore ouverts
+            told = []
+            told_trials = []
+            for setup_id, score in scores.items():
+                trial_number = self._trial_numbers.get(setup_id)
+                if trial_number is None:
+                    continue
+                try:
+                    told_trials.append(self.study.tell(trial_number, score))
+                except ValueError as e:
+                    # Trial déjà terminé (tour supplémentaire pour le même setup)
+                    logger.debug(f"Trial {trial_number} non mis à jour: {str(e)}")
+                    continue
+                told.append(setup_id)
+            
+            # Mise à jour incrémentale du modèle de substitution avec les seuls trials notés
+            if told and self.params["surrogate"]:
+                self._update_surrogate(told_trials)
+            
+            # Circuit sans signature au démarrage : l'a priori est calculé après ses premiers tours
+            if told and self._transfer_pending:
+                self._set_transfer_pending(not self._transfer_prior())
+            
+            # Vérifie si l'un de ces setups est le meilleur jusqu'à présent
+            if told:
+                best_trial = self.study.best_trial
+                best_setup_id = best_trial.user_attrs.get("setup_id") if best_trial else None
+                if best_setup_id in told:
+                    OptimizationRepository.update_best_setup(
+                        session_id=self.session_id,
+                        best_setup_id=best_setup_id
+                    )
+            
+            return told
+    
+    def _index_trials(self, setup_ids):
+        """Complète l'index setup_id -> numéro de trial depuis la base"""
+        missing = [setup_id for setup_id in setup_ids if setup_id not in self._trial_numbers]
+        if missing:
+            self._trial_numbers.update(SetupRepository.get_trial_numbers(missing))
+    
+    def report_lap(self, setup_id, lap_number, telemetry_data):
+        """
+        Transmet à Optuna le score d'un tour intermédiaire du relais d'un setup
         
-        # Cherche le trial correspondant et met à jour son score
-        for trial in self.study.trials:
-            if trial.user_attrs.get("setup_id") == setup_id:
-                self.study.tell(trial.number, score)
-                break
-        
-        # Vérifie si c'est le meilleur setup jusqu'à présent
-        best_trial = self.study.best_trial
-        if best_trial and best_trial.user_attrs.get("setup_id") == setup_id:
-            OptimizationRepository.update_best_setup(
-                session_id=self.session_id,
-                best_setup_id=setup_id
-            )
+        Le score est enregistré comme étape (lap_number) du trial ; le pruner configuré
+        le compare aux autres trials au même tour. Si le trial est élagué, il est clos
+        (état PRUNED) et le setup est écarté : le relais peut s'arrêter là.
         
-        return score
+        Args:
+            setup_id (int): ID du setup en cours de test
+            lap_number (int): Numéro du tour dans le relais (1 = premier tour)
+            telemetry_data (dict): Données de télémétrie du tour
+            
+        Returns:
+            tuple: (score du tour, True si le setup est élagué), score None si aucune étude
+        """
+        with self._lock:
+            if self.study is None:
+                logger.error("Aucune étude d'optimisation active")
+                return None, False
+            
+            score = self.scorer.calculate_score(telemetry_data)
+            
+            self._index_trials([setup_id])
+            trial_number = self._trial_numbers.get(setup_id)
+            if trial_number is None:
+                return score, False
+            
+            # Le trial a pu être ouvert par un autre worker : il est retrouvé par le
+            # stockage à partir du nom de l'étude et de son numéro
+            trial_id = self.storage.get_trial_id_from_study_id_trial_number(self._storage_study_id(), trial_number)
+            try:
+                self.storage.set_trial_intermediate_value(trial_id, lap_number, float(score))
+            except optuna.exceptions.UpdateFinishedTrialError:
+                # Trial déjà terminé (relais clos ou setup déjà élagué)
+                return score, False
+            
+            if not self.study.pruner.prune(self.study, self.storage.get_trial(trial_id)):
+                return score, False
+            
+            self.study.tell(trial_number, state=optuna.trial.TrialState.PRUNED)
+            SetupRepository.update_setup_status(setup_id=setup_id, status=SETUP_STATUS["DISCARDED"])
+            logger.info(f"Setup {setup_id} élagué au tour {lap_number} (score {score:.3f})")
+            return score, True
+    
+    def _create_sampler(self, seed):
+        """
+        Configure le sampler Optuna
+        
+        Args:
+            seed (int): Graine aléatoire du sampler
+            
+        Returns:
+            optuna.samplers.BaseSampler: Sampler configuré
+        """
+        # Avec une file d'avance, le TPE utilise un "constant liar" : les trials en
+        # attente sont supposés mauvais, ce qui évite de proposer plusieurs fois le même point
+        return create_sampler(self.params["sampler"], seed, constant_liar=self.lookahead > 0)
+    
+    def _create_pruner(self):
+        """Configure le pruner Optuna"""
+        return create_pruner(self.params["pruner"])
+    
+    @classmethod
+    def load(cls, session):
+        """
+        Recharge l'optimiseur d'une session existante depuis le stockage partagé
+        
+        Permet à n'importe quel worker (gunicorn) de servir ask/tell pour une
+        session démarrée par un autre processus ou avant un redémarrage.
+        
+        Args:
+            session (OptimizationSession): Session d'optimisation active
+            
+        Returns:
+            SetupOptimizer: Optimiseur rattaché à l'étude de la session
+        """
+        optimizer = cls(
+            car_id=session.car_id,
+            track_id=session.track_id,
+            optimization_params=session.optimization_parameters
+        )
+        optimizer.session_id = session.id
+        optimizer.study_name = session.study_name
+        
+        # Graine propre au processus : deux workers ne doivent pas proposer la même séquence
+        seed = optimizer.params["seed"]
+        if seed is not None:
+            seed = (seed + os.getpid()) % (2 ** 32)
+        
+        optimizer.storage = get_study_storage(session.car_id)
+        optimizer.study = optuna.load_study(
+            study_name=session.study_name,
+            storage=optimizer.storage,
+            sampler=optimizer._create_sampler(seed),
+            pruner=optimizer._create_pruner()
+        )
+        optimizer.trial_count = len(optimizer.study.get_trials(deepcopy=False))
+        optimizer._transfer_pending = optimizer.study.user_attrs.get("transfer_pending", False)
+        optimizer._rng = np.random.default_rng(seed)
+        return optimizer
     
     def start_optimization(self):
         """
@@ -159,49 +588,40 @@ class SetupOptimizer:
             int: ID de la session créée
         """
         # Crée la session d'optimisation
+        self.study_name = f"{self.car_id}_{self.track_id}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
         self.session_id = OptimizationRepository.create_session(
             car_id=self.car_id,
             track_id=self.track_id,
-            optimization_parameters=self.params
+            optimization_parameters=self.params,
+            study_name=self.study_name
         )
         
         if self.session_id is None:
             logger.error("Erreur lors de la création de la session d'optimisation")
             return None
         
-        # Configure le sampler Optuna
-        if self.params["sampler"] == "tpe":
-            sampler = optuna.samplers.TPESampler(seed=self.params["seed"])
-        elif self.params["sampler"] == "cmaes":
-            sampler = optuna.samplers.CmaEsSampler(seed=self.params["seed"])
-        elif self.params["sampler"] == "random":
-            sampler = optuna.samplers.RandomSampler(seed=self.params["seed"])
-        else:
-            sampler = optuna.samplers.TPESampler(seed=self.params["seed"])
-        
-        # Configure le pruner Optuna
-        if self.params["pruner"] == "hyperband":
-            pruner = optuna.pruners.HyperbandPruner()
-        elif self.params["pruner"] == "median":
-            pruner = optuna.pruners.MedianPruner()
-        else:
-            pruner = None
-        
-        # Crée l'étude Optuna
+        # Crée l'étude Optuna dans le stockage partagé, accessible à tous les workers
+        if self.storage is None:
+            self.storage = get_study_storage(self.car_id)
         self.study = optuna.create_study(
-            sampler=sampler,
-            pruner=pruner,
+            storage=self.storage,
+            sampler=self._create_sampler(self.params["seed"]),
+            pruner=self._create_pruner(),
             direction=self.params["direction"],
-            study_name=f"{self.car_id}_{self.track_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            study_name=self.study_name
         )
         
-        # Lance les premiers trials
-        self.study.optimize(
-            self._objective,
-            n_trials=self.params["initial_setups"],
-            timeout=self.params["timeout"],
-            n_jobs=1  # Asynchrone, donc limité à 1 job
-        )
+        # Les setups des circuits similaires sont ajoutés avant ceux du circuit : TPE
+        # pondère moins les trials les plus anciens
+        if self.params["transfer"]:
+            self._set_transfer_pending(not self._transfer_prior())
+        if self.params["warm_start"]:
+            self._warm_start()
+        
+        # Lance les premiers trials en mode ask/tell : ils restent ouverts
+        # jusqu'à la réception de la télémétrie correspondante
+        for _ in range(self.params["initial_setups"]):
+            self.generate_next_setup()
         
         return self.session_id
     
@@ -212,34 +632,67 @@ class SetupOptimizer:
         Returns:
             int: ID du setup généré
         """
-        if self.study is None or self.session_id is None:
-            logger.error("Aucune optimisation active")
-            return None
-        
-        # Lance un nouveau trial
-        trial = self.study.ask()
-        
-        # Génère les paramètres du setup
-        setup_params = self._create_parameter_space(trial)
-        
-        # Sauvegarde le setup
-        setup_id = SetupRepository.create_setup(
-            car_id=self.car_id,
-            track_id=self.track_id,
-            setup_parameters=setup_params,
-            status=SETUP_STATUS["PENDING"],
-            source=SETUP_SOURCE["OPTIMIZED"],
-            optimization_session_id=self.session_id
-        )
-        
-        if setup_id is None:
-            logger.error("Erreur lors de la création du setup")
-            return None
-        
-        # Stocke l'ID du setup dans le trial
-        trial.set_user_attr("setup_id", setup_id)
+        with self._lock:
+            if self.study is None or self.session_id is None:
+                logger.error("Aucune optimisation active")
+                return None
+            
+            # Lance un nouveau trial (présélectionné par le modèle de substitution si activé)
+            if self.params["surrogate"]:
+                self._screen_next_setup()
+            trial = self.study.ask()
+            self.trial_count += 1
+            
+            # Génère les paramètres du setup
+            setup_params = self._create_parameter_space(trial)
+            
+            # Sauvegarde le setup
+            setup_id = SetupRepository.create_setup(
+                car_id=self.car_id,
+                track_id=self.track_id,
+                setup_parameters=setup_params,
+                status=SETUP_STATUS["PENDING"],
+                source=SETUP_SOURCE["OPTIMIZED"],
+                optimization_session_id=self.session_id,
+                trial_number=trial.number
+            )
+            
+            if setup_id is None:
+                logger.error("Erreur lors de la création du setup")
+                return None
+            
+            # Stocke l'ID du setup dans le trial et indexe le trial
+            trial.set_user_attr("setup_id", setup_id)
+            self._trial_numbers[setup_id] = trial.number
+            
+            return setup_id
+    
+    @property
+    def lookahead(self):
+        """Nombre de setups en attente à maintenir d'avance pour la session"""
+        return int(self.params.get("lookahead") or 0)
+    
+    def refill_lookahead(self):
+        """
+        Complète la file des setups en attente jusqu'à la taille de lookahead
         
-        return setup_id
+        Returns:
+            list: IDs des setups générés
+        """
+        with self._lock:
+            if self.study is None or self.session_id is None:
+                return []
+            
+            pending = SetupRepository.count_pending_setups(self.session_id)
+            
+            generated = []
+            for _ in range(max(0, self.lookahead - pending)):
+                setup_id = self.generate_next_setup()
+                if setup_id is None:
+                    break
+                generated.append(setup_id)
+            
+            return generated
     
     def stop_optimization(self):
         """
@@ -248,15 +701,16 @@ class SetupOptimizer:
         Returns:
             bool: True si succès, False sinon
         """
-        if self.session_id is None:
-            logger.error("Aucune optimisation active")
-            return False
-        
-        # Ferme la session
-        success = OptimizationRepository.close_session(self.session_id)
-        
-        if success:
-            self.session_id = None
-            self.study = None
+        with self._lock:
+            if self.session_id is None:
+                logger.error("Aucune optimisation active")
+                return False
+            
+            # Ferme la session
+            success = OptimizationRepository.close_session(self.session_id)
+            
+            if success:
+                self.session_id = None
+                self.study = None
             
-        return success
+            return success
@@ -0,0 +1,248 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from src.config.constants import JOB_STATUS
+from src.config.settings import JOBS_DIR, JOB_RETENTION_DAYS
+from src.storage.repository import JobRepository
+
+try:
+    import fcntl
+except ImportError:  # Verrou indisponible (Windows) : les processus précédents sont réputés arrêtés
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de relecture d'une tâche exécutée par un autre worker (secondes)
+JOB_POLL_INTERVAL = 0.2
+
+UNFINISHED_STATUSES = (JOB_STATUS["QUEUED"], JOB_STATUS["RUNNING"])
+
+
+def _lock_file(lock_file, blocking=True):
+    """Verrou exclusif du fichier d'un processus (tenu tant qu'il est en vie)"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class OptimizationJob:
+    """Tâche exécutée par le worker d'optimisation (score, tell, ask...)"""
+
+    def __init__(self, func, args, kwargs, task=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.task = task  # Nom de la tâche suivie en base (None = tâche interne, non suivie)
+        self.status = JOB_STATUS["QUEUED"]
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.done = threading.Event()
+
+
+class OptimizationWorker:
+    """
+    Worker en arrière-plan alimenté par une file d'attente
+
+    Les tâches sont exécutées une par une, dans l'ordre de soumission, sur un
+    thread dédié : le calcul du score, study.tell et study.ask ne bloquent plus
+    les requêtes HTTP.
+
+    Les tâches enregistrées (task) sont suivies dans la table worker_jobs : leur
+    statut est consultable depuis tous les workers, et celles d'un processus arrêté
+    avant de les terminer sont reprises au démarrage (resume).
+    """
+
+    def __init__(self, lock_dir=JOBS_DIR, retention_days=JOB_RETENTION_DAYS, max_jobs=1000):
+        """
+        Args:
+            lock_dir (Path): Répertoire des fichiers de verrou des processus
+            retention_days (int): Conservation en base des tâches terminées (jours)
+            max_jobs (int): Nombre de tâches conservées en mémoire pour l'attente de leur fin
+        """
+        self.lock_dir = lock_dir
+        self.retention_days = retention_days
+        self.max_jobs = max_jobs
+        self.owner = None
+        self._owner_file = None
+        self._tasks = {}
+        self._task_names = {}
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def task(self, name):
+        """
+        Enregistre une fonction comme tâche suivie en base (décorateur)
+
+        Ses arguments doivent être sérialisables en JSON : ils sont conservés pour la reprise.
+        """
+        def register(func):
+            self._tasks[name] = func
+            self._task_names[func] = name
+            return func
+        return register
+
+    def _ensure_started(self):
+        # Démarrage paresseux : le thread et l'identité du processus sont créés dans le
+        # processus qui les utilise (important avec gunicorn, qui forke après l'import des modules)
+        with self._lock:
+            if self.owner is None:
+                self.owner = uuid.uuid4().hex
+                self.lock_dir.mkdir(parents=True, exist_ok=True)
+                self._owner_file = open(self.lock_dir / f"{self.owner}.lock", "w")
+                _lock_file(self._owner_file)
+                atexit.register(self._release_owner)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="optimization-worker", daemon=True)
+                self._thread.start()
+
+    def _release_owner(self):
+        # Arrêt normal : les tâches encore en file seront reprises par le prochain processus
+        self._owner_file.close()
+        try:
+            os.remove(self._owner_file.name)
+        except OSError:
+            pass
+
+    def _owner_alive(self, owner):
+        """Indique si le processus propriétaire d'une tâche tient encore son verrou"""
+        path = self.lock_dir / f"{owner}.lock"
+        try:
+            with open(path, "a") as lock_file:
+                return not _lock_file(lock_file, blocking=False)
+        except OSError:
+            return False
+
+    def _enqueue(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            # Oublie les tâches les plus anciennes déjà terminées
+            while len(self._jobs) > self.max_jobs:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.done.is_set():
+                    break
+                del self._jobs[oldest_id]
+        self._queue.put(job)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Ajoute une tâche à la file
+
+        Returns:
+            OptimizationJob: Tâche créée
+        """
+        self._ensure_started()
+        job = OptimizationJob(func, args, kwargs, task=self._task_names.get(func))
+        if job.task is not None:
+            JobRepository.create_job(job.id, job.task, {"args": list(args), "kwargs": kwargs}, self.owner)
+        self._enqueue(job)
+        return job
+
+    def get_job(self, job_id):
+        """
+        Récupère une tâche suivie par son ID (quel que soit le worker qui l'exécute)
+
+        Returns:
+            WorkerJob: Tâche enregistrée en base, None si inconnue
+        """
+        return JobRepository.get_job(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """
+        Attend la fin d'une tâche
+
+        Une tâche exécutée par un autre worker est relue en base jusqu'à sa fin.
+
+        Returns:
+            WorkerJob: Tâche (éventuellement encore en cours si timeout atteint) ou None
+        """
+        with self._lock:
+            local = self._jobs.get(job_id)
+        if local is not None:
+            local.done.wait(timeout)
+            return self.get_job(job_id)
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        job = self.get_job(job_id)
+        while job is not None and job.status in UNFINISHED_STATUSES and \
+                (deadline is None or time.monotonic() < deadline):
+            time.sleep(JOB_POLL_INTERVAL)
+            job = self.get_job(job_id)
+        return job
+
+    def resume(self):
+        """
+        Reprend les tâches inachevées des processus arrêtés (à appeler au démarrage)
+
+        Un processus est considéré arrêté lorsque son fichier de verrou n'est plus tenu
+        (workers d'un même hôte partageant lock_dir). Purge aussi les tâches terminées
+        depuis plus de retention_days jours.
+
+        Returns:
+            int: Nombre de tâches reprises
+        """
+        self._ensure_started()
+        JobRepository.delete_finished_jobs(datetime.utcnow() - timedelta(days=self.retention_days))
+
+        resumed = 0
+        stopped = {}
+        for job_id, task, arguments, owner in JobRepository.get_unfinished_jobs():
+            func = self._tasks.get(task)
+            if func is None or owner == self.owner:
+                continue
+            if owner not in stopped:
+                stopped[owner] = not self._owner_alive(owner)
+            if not stopped[owner] or not JobRepository.claim_job(job_id, owner, self.owner):
+                continue
+            self._enqueue(OptimizationJob(func, arguments["args"], arguments["kwargs"], task=task, job_id=job_id))
+            resumed += 1
+
+        # Fichiers de verrou des processus arrêtés
+        for owner, is_stopped in stopped.items():
+            if is_stopped and owner is not None:
+                try:
+                    os.remove(self.lock_dir / f"{owner}.lock")
+                except OSError:
+                    pass
+
+        if resumed:
+            logger.info(f"{resumed} tâche(s) reprise(s) après l'arrêt d'un worker")
+        return resumed
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.status = JOB_STATUS["RUNNING"]
+            if job.task is not None:
+                JobRepository.update_job(job.id, job.status)
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+                job.status = JOB_STATUS["DONE"]
+            except Exception as e:
+                logger.error(f"Erreur lors de l'exécution de la tâche {job.id}: {str(e)}")
+                job.error = str(e)
+                job.status = JOB_STATUS["FAILED"]
+            finally:
+                job.finished_at = datetime.utcnow()
+                if job.task is not None:
+                    JobRepository.update_job(job.id, job.status, result=job.result, error=job.error)
+                job.done.set()
+                self._queue.task_done()
+
+
+# Worker partagé par l'application
+worker = OptimizationWorker()
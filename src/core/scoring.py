@@ -1,17 +1,31 @@
+import logging
+import threading
 import numpy as np
-from src.config.constants import PERFORMANCE_METRICS
+from src.config.constants import PERFORMANCE_METRICS, SETUP_STATUS
+from src.core.statistics import MetricStatistics
+from src.storage.repository import MetricStatisticsRepository, SetupRepository, TelemetryRepository
+
+logger = logging.getLogger(__name__)
+
+# Nombre de tours à partir duquel la normalisation utilise les quantiles (5 %-95 %) plutôt que min/max
+ROBUST_MIN_COUNT = 20
 
 class SetupScorer:
     """Classe responsable de l'évaluation des performances d'un setup"""
     
-    def __init__(self, weight_config=None):
+    def __init__(self, weight_config=None, car_id=None, track_id=None):
         """
         Initialise le scoreur avec une configuration de poids
         
         Args:
             weight_config (dict): Configuration des poids pour chaque métrique
                                  Si None, utilise une configuration par défaut
+            car_id (str): Voiture dont les statistiques sont persistées (None = en mémoire seulement)
+            track_id (str): Circuit dont les statistiques sont persistées
         """
+        self.car_id = car_id
+        self.track_id = track_id
+        
         # Configuration par défaut des poids (priorité au temps au tour)
         self.default_weights = {
             "lap_time": 10.0,                # Le plus important
@@ -60,8 +74,17 @@ class SetupScorer:
             "tire_avg_temp_rr": (80, 90),
         }
         
-        # Historique des métriques pour la normalisation
-        self.metric_history = {metric: [] for metric in PERFORMANCE_METRICS}
+        # Statistiques incrémentales des métriques pour la normalisation (mémoire constante)
+        self.metric_stats = {metric: MetricStatistics() for metric in PERFORMANCE_METRICS}
+        if self.car_id is not None and self.track_id is not None:
+            stored = MetricStatisticsRepository.get_statistics(self.car_id, self.track_id)
+            self._load_statistics(stored)
+    
+    def _load_statistics(self, stored):
+        """Charge des statistiques sérialisées"""
+        for metric, values in stored.items():
+            if metric in self.metric_stats:
+                self.metric_stats[metric] = MetricStatistics.from_dict(values)
     
     def _temp_orientation(self, value, tire_position):
         """Calcule l'orientation de la température (pénalise l'écart à la plage idéale)"""
@@ -77,16 +100,40 @@ class SetupScorer:
             return 1.0 - 0.2 * (value - max_temp)
     
     def update_history(self, telemetry_data):
-        """Met à jour l'historique des métriques avec de nouvelles données"""
-        for metric in PERFORMANCE_METRICS:
-            if metric in telemetry_data:
-                self.metric_history[metric].append(telemetry_data[metric])
+        """Met à jour les statistiques des métriques avec de nouvelles données"""
+        values = {
+            metric: telemetry_data[metric]
+            for metric in PERFORMANCE_METRICS
+            if metric in telemetry_data
+        }
+        
+        if self.car_id is None or self.track_id is None:
+            for metric, value in values.items():
+                self.metric_stats[metric].add(value)
+            return
+        
+        # Mise à jour à partir des statistiques en base (partagées entre workers)
+        def apply(stored):
+            updated = {}
+            for metric, value in values.items():
+                stats = MetricStatistics.from_dict(stored[metric]) if metric in stored else MetricStatistics()
+                stats.add(value)
+                updated[metric] = stats.to_dict()
+            return updated
+        
+        updated = MetricStatisticsRepository.update_statistics(self.car_id, self.track_id, apply)
+        if updated is None:
+            # Base indisponible : conserve au moins la mise à jour en mémoire
+            for metric, value in values.items():
+                self.metric_stats[metric].add(value)
+        else:
+            self._load_statistics(updated)
     
     def normalize_metric(self, metric_name, value):
-        """Normalise une métrique en fonction de son historique"""
-        history = self.metric_history.get(metric_name, [])
+        """Normalise une métrique en fonction de ses statistiques"""
+        stats = self.metric_stats.get(metric_name)
         
-        if not history:
+        if stats is None or stats.count == 0:
             return value  # Pas d'historique, retourne la valeur brute
         
         if metric_name.startswith("tire_avg_temp_"):
@@ -95,14 +142,14 @@ class SetupScorer:
             return self._temp_orientation(value, tire_position)
             
         # Pour les autres métriques, normalise par rapport à min/max
-        min_val = min(history)
-        max_val = max(history)
+        # (quantiles 5 %-95 % une fois l'historique suffisant, pour ignorer les tours aberrants)
+        min_val, max_val = stats.bounds(ROBUST_MIN_COUNT)
         
         if min_val == max_val:
             return 0.5  # Évite division par zéro
             
         # Normalisation entre 0 et 1
-        normalized = (value - min_val) / (max_val - min_val)
+        normalized = min(1.0, max(0.0, (value - min_val) / (max_val - min_val)))
         
         # Applique l'orientation (-1 pour inverser si lower is better)
         orientation = self.metric_orientation.get(metric_name, 1.0)
@@ -145,3 +192,200 @@ class SetupScorer:
         global_score = sum(scores.values()) / total_weight
         
         return global_score
+
+    
+    def score_matrix(self, values, metrics=PERFORMANCE_METRICS):
+        """
+        Calcule les scores de nombreux tours en opérations vectorisées
+        
+        Les bornes de normalisation sont celles des statistiques du scoreur, comme pour
+        calculate_score (quantiles 5 %-95 % au-delà de ROBUST_MIN_COUNT tours), et
+        l'historique du scoreur n'est pas modifié.
+        
+        Args:
+            values (np.ndarray): Matrice (tours x métriques), NaN si la métrique est absente
+            metrics (list): Nom des métriques de chaque colonne
+            
+        Returns:
+            np.ndarray: Score global de chaque tour
+        """
+        values = np.asarray(values, dtype=float)
+        normalized = np.full(values.shape, np.nan)
+        weights = np.zeros(len(metrics))
+        
+        for column, metric in enumerate(metrics):
+            if metric not in self.weights:
+                continue
+            
+            column_values = values[:, column]
+            if np.isnan(column_values).all():
+                continue
+            weights[column] = self.weights[metric]
+            
+            if metric.startswith("tire_avg_temp_"):
+                # Même pénalité que _temp_orientation, appliquée à toute la colonne
+                min_temp, max_temp = self.ideal_ranges[metric]
+                normalized[:, column] = np.where(
+                    column_values < min_temp,
+                    1.0 - 0.1 * (min_temp - column_values),
+                    np.where(column_values > max_temp, 1.0 - 0.2 * (column_values - max_temp), 1.0)
+                )
+                continue
+            
+            stats = self.metric_stats.get(metric)
+            if stats is None or stats.count == 0:
+                # Pas d'historique : valeur brute, comme normalize_metric
+                normalized[:, column] = column_values
+                continue
+            
+            min_val, max_val = stats.bounds(ROBUST_MIN_COUNT)
+            if min_val == max_val:
+                normalized[:, column] = 0.5
+            else:
+                normalized[:, column] = np.clip((column_values - min_val) / (max_val - min_val), 0.0, 1.0)
+                orientation = self.metric_orientation.get(metric, 1.0)
+                if isinstance(orientation, float) and orientation < 0:
+                    normalized[:, column] = 1.0 - normalized[:, column]
+        
+        # Moyenne pondérée sur les métriques présentes dans chaque tour
+        present = ~np.isnan(normalized)
+        row_weights = np.where(present, weights, 0.0)
+        total_weight = row_weights.sum(axis=1)
+        weighted = np.where(present, normalized, 0.0) @ weights
+        
+        scores = np.zeros(len(values))
+        np.divide(weighted, total_weight, out=scores, where=total_weight > 0)
+        return scores
+
+
+# Scoreurs partagés par voiture et circuit (une seule copie des statistiques par processus)
+_scorers = {}
+_scorers_lock = threading.Lock()
+
+def get_scorer(car_id, track_id):
+    """
+    Renvoie le scoreur d'une voiture et d'un circuit
+    
+    Args:
+        car_id (str): ID de la voiture
+        track_id (str): ID du circuit
+        
+    Returns:
+        SetupScorer: Scoreur dont les statistiques sont persistées
+    """
+    with _scorers_lock:
+        scorer = _scorers.get((car_id, track_id))
+        if scorer is None:
+            scorer = _scorers[(car_id, track_id)] = SetupScorer(car_id=car_id, track_id=track_id)
+        return scorer
+
+def rebuild_metric_statistics(force=False):
+    """
+    Reconstruit les statistiques des métriques depuis telemetry_results en une passe
+    
+    Args:
+        force (bool): Reconstruit même si des statistiques existent déjà
+        
+    Returns:
+        int: Nombre de tours pris en compte (None si aucune reconstruction)
+    """
+    if not force and not MetricStatisticsRepository.is_empty():
+        return None
+    
+    statistics = {}
+    laps = 0
+    for car_id, track_id, telemetry_data in TelemetryRepository.iter_metric_history():
+        metrics = statistics.setdefault((car_id, track_id), {})
+        for metric in PERFORMANCE_METRICS:
+            value = (telemetry_data or {}).get(metric)
+            if isinstance(value, (int, float)):
+                metrics.setdefault(metric, MetricStatistics()).add(value)
+        laps += 1
+    
+    if laps == 0 and not force:
+        return None
+    
+    MetricStatisticsRepository.replace_all({
+        key: {metric: stats.to_dict() for metric, stats in metrics.items()}
+        for key, metrics in statistics.items()
+    })
+    
+    with _scorers_lock:
+        _scorers.clear()
+    
+    logger.info(f"Statistiques des métriques reconstruites à partir de {laps} tours")
+    return laps
+
+def _metric_value(telemetry_data, metric):
+    value = telemetry_data.get(metric) if telemetry_data else None
+    return value if isinstance(value, (int, float)) else np.nan
+
+def _pair_statistics(values):
+    """Statistiques des métriques d'une voiture/circuit à partir de sa matrice de tours"""
+    statistics = {}
+    for index, metric in enumerate(PERFORMANCE_METRICS):
+        column = values[:, index]
+        column = column[~np.isnan(column)]
+        if len(column):
+            stats = MetricStatistics()
+            for value in column.tolist():
+                stats.add(value)
+            statistics[metric] = stats.to_dict()
+    return statistics
+
+def rescore_setups(car_id, track_id):
+    """
+    Recalcule le score de tous les setups testés d'une voiture et d'un circuit
+    
+    À lancer après une modification des poids par défaut (default_weights) ou des
+    plages idéales du scoreur : le scoreur des tours reçus ensuite utilise les mêmes.
+    Toute la télémétrie est chargée dans une matrice NumPy, les scores sont calculés
+    en opérations vectorisées puis écrits en une seule mise à jour groupée.
+    Le score d'un setup est celui de son dernier tour, comme à la réception, et la
+    normalisation utilise les statistiques persistées de la voiture et du circuit
+    (calculées d'abord depuis ces mêmes tours si elles sont absentes). Seuls les setups
+    testés sont notés : un setup élagué (écarté) ou en cours de relais reste sans score.
+    
+    Les trials Optuna déjà terminés ne sont pas modifiés (Optuna ne permet pas de
+    réécrire leur valeur) : l'étude d'une session en cours garde les anciens scores.
+    Une nouvelle session amorcée avec l'historique (warm_start) repart des scores recalculés.
+    
+    Args:
+        car_id (str): ID de la voiture
+        track_id (str): ID du circuit
+        
+    Returns:
+        dict: Nombre de tours et de setups recalculés (None si erreur d'écriture)
+    """
+    rows = TelemetryRepository.get_metric_rows(car_id, track_id)
+    if not rows:
+        return {"laps": 0, "setups": 0}
+    
+    values = np.array(
+        [[_metric_value(telemetry_data, metric) for metric in PERFORMANCE_METRICS] for _, _, telemetry_data in rows],
+        dtype=float
+    )
+    
+    # Statistiques absentes : calculées depuis tous les tours du couple (comme à la réception),
+    # sans toucher aux autres voitures/circuits
+    if not MetricStatisticsRepository.get_statistics(car_id, track_id):
+        statistics = _pair_statistics(values)
+        MetricStatisticsRepository.update_statistics(car_id, track_id, lambda stored: stored or statistics)
+        with _scorers_lock:
+            _scorers.pop((car_id, track_id), None)
+    scorer = SetupScorer(car_id=car_id, track_id=track_id)
+    scores = scorer.score_matrix(values)
+    
+    # Les tours sont dans l'ordre d'enregistrement : le dernier tour de chaque setup l'emporte
+    setup_scores = {
+        setup_id: score
+        for (setup_id, status, _), score in zip(rows, scores.tolist())
+        if status == SETUP_STATUS["TESTED"]
+    }
+    
+    updated = SetupRepository.update_scores(setup_scores)
+    if updated is None:
+        return None
+    
+    logger.info(f"{updated} setups recalculés à partir de {len(rows)} tours ({car_id}/{track_id})")
+    return {"laps": len(rows), "setups": updated}
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from src.config.settings import OPTIMIZER_CACHE_SIZE, OPTIMIZER_CACHE_MAX_TRIALS, OPTIMIZER_IDLE_TIMEOUT
+from src.core.optimizer import SetupOptimizer
+from src.storage.repository import OptimizationRepository
+
+logger = logging.getLogger(__name__)
+
+
+class OptimizerRegistry:
+    """
+    Registre des optimiseurs actifs, indexés par ID de session
+
+    Plusieurs sessions (voiture/piste) peuvent être optimisées en parallèle.
+    Les études sont chargées à la première utilisation depuis le stockage
+    partagé, puis évincées lorsqu'elles sont inactives (LRU, délai d'inactivité
+    et plafond sur le nombre total de trials en mémoire).
+    """
+
+    def __init__(self, max_size=OPTIMIZER_CACHE_SIZE, max_trials=OPTIMIZER_CACHE_MAX_TRIALS,
+                 idle_timeout=OPTIMIZER_IDLE_TIMEOUT):
+        """
+        Args:
+            max_size (int): Nombre maximal d'optimiseurs conservés
+            max_trials (int): Nombre maximal de trials cumulés en mémoire
+            idle_timeout (int): Délai d'inactivité (secondes) avant éviction
+        """
+        self.max_size = max_size
+        self.max_trials = max_trials
+        self.idle_timeout = idle_timeout
+        self._optimizers = OrderedDict()  # session_id -> (optimizer, dernière utilisation)
+        self._lock = threading.RLock()
+
+    def register(self, optimizer):
+        """Ajoute un optimiseur dont la session vient d'être démarrée"""
+        with self._lock:
+            self._optimizers[optimizer.session_id] = (optimizer, time.monotonic())
+            self._optimizers.move_to_end(optimizer.session_id)
+            self._evict()
+
+    def discard(self, session_id):
+        """Retire l'optimiseur d'une session (arrêtée ou évincée)"""
+        with self._lock:
+            self._optimizers.pop(session_id, None)
+
+    def get(self, session_id):
+        """
+        Renvoie l'optimiseur d'une session active, chargé à la demande
+
+        Args:
+            session_id (int): ID de la session d'optimisation
+
+        Returns:
+            SetupOptimizer: Optimiseur de la session, None si la session est inconnue ou fermée
+        """
+        if session_id is None:
+            return None
+
+        # La session peut avoir été arrêtée par un autre worker
+        session = OptimizationRepository.get_session_by_id(session_id)
+        if session is None or session.end_time is not None or session.study_name is None:
+            self.discard(session_id)
+            return None
+
+        with self._lock:
+            entry = self._optimizers.get(session_id)
+            if entry is None:
+                optimizer = SetupOptimizer.load(session)
+            else:
+                optimizer = entry[0]
+            self._optimizers[session_id] = (optimizer, time.monotonic())
+            self._optimizers.move_to_end(session_id)
+            self._evict()
+            return optimizer
+
+    def resolve(self, session_id=None, car_id=None, track_id=None):
+        """
+        Renvoie l'optimiseur désigné par une session ou une voiture/piste
+
+        Sans critère, utilise la session active la plus récente (compatibilité
+        avec les clients qui ne gèrent qu'une session).
+
+        Returns:
+            SetupOptimizer: Optimiseur correspondant ou None
+        """
+        if session_id is None:
+            session = OptimizationRepository.get_active_session(car_id=car_id, track_id=track_id)
+            if session is None:
+                return None
+            session_id = session.id
+        return self.get(session_id)
+
+    def active_session_ids(self):
+        """IDs des sessions actuellement chargées en mémoire"""
+        with self._lock:
+            return list(self._optimizers)
+
+    def _evict(self):
+        now = time.monotonic()
+
+        # Sessions inactives depuis trop longtemps
+        for session_id, (optimizer, last_used) in list(self._optimizers.items()):
+            if now - last_used > self.idle_timeout:
+                logger.info(f"Éviction de l'optimiseur inactif de la session {session_id}")
+                del self._optimizers[session_id]
+
+        # LRU : nombre d'études et plafond mémoire (trials cumulés), en gardant la plus récente
+        while len(self._optimizers) > 1:
+            total_trials = sum(optimizer.trial_count for optimizer, _ in self._optimizers.values())
+            if len(self._optimizers) <= self.max_size and total_trials <= self.max_trials:
+                break
+            session_id, _ = self._optimizers.popitem(last=False)
+            logger.info(f"Éviction de l'optimiseur de la session {session_id} (cache plein)")
+
+
+# Registre partagé par l'application
+registry = OptimizerRegistry()
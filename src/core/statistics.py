@@ -0,0 +1,157 @@
+import math
+
+# Quantiles utilisés pour la normalisation robuste (insensible aux tours aberrants)
+LOW_QUANTILE = 0.05
+HIGH_QUANTILE = 0.95
+
+
+class P2Quantile:
+    """
+    Estimation d'un quantile en mémoire constante (algorithme P² de Jain et Chlamtac)
+
+    Cinq marqueurs suffisent, quel que soit le nombre de valeurs observées.
+    """
+
+    def __init__(self, p):
+        """
+        Args:
+            p (float): Quantile estimé (entre 0 et 1)
+        """
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        """Ajoute une valeur à l'estimation"""
+        heights = self.heights
+
+        # Initialisation avec les cinq premières valeurs
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        positions = self.positions
+
+        # Cellule contenant la nouvelle valeur
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Ajuste les marqueurs intermédiaires
+        for i in range(1, 4):
+            delta = self.desired[i] - positions[i]
+            if (delta >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (delta <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if delta > 0 else -1
+                candidate = self._parabolic(i, step)
+                if heights[i - 1] < candidate < heights[i + 1]:
+                    heights[i] = candidate
+                else:
+                    heights[i] = self._linear(i, step)
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        h, n = self.heights, self.positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, step):
+        h, n = self.heights, self.positions
+        return h[i] + step * (h[i + step] - h[i]) / (n[i + step] - n[i])
+
+    def value(self):
+        """Valeur estimée du quantile (None si aucune valeur)"""
+        if not self.heights:
+            return None
+        if len(self.heights) < 5:
+            # Peu de valeurs : quantile exact sur les valeurs triées
+            index = min(len(self.heights) - 1, int(math.floor(self.p * len(self.heights))))
+            return self.heights[index]
+        return self.heights[2]
+
+    def to_dict(self):
+        return {
+            "p": self.p,
+            "heights": list(self.heights),
+            "positions": list(self.positions),
+            "desired": list(self.desired)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        quantile = cls(data["p"])
+        quantile.heights = list(data["heights"])
+        quantile.positions = list(data["positions"])
+        quantile.desired = list(data["desired"])
+        return quantile
+
+
+class MetricStatistics:
+    """Statistiques incrémentales d'une métrique : effectif, min/max et quantiles robustes"""
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.low = P2Quantile(LOW_QUANTILE)
+        self.high = P2Quantile(HIGH_QUANTILE)
+
+    def add(self, value):
+        """Ajoute une valeur observée"""
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.low.add(value)
+        self.high.add(value)
+
+    def bounds(self, robust_min_count=None):
+        """
+        Bornes de normalisation
+
+        Args:
+            robust_min_count (int): Effectif à partir duquel les quantiles remplacent min/max
+
+        Returns:
+            tuple: (borne basse, borne haute)
+        """
+        if robust_min_count is not None and self.count >= robust_min_count:
+            low, high = self.low.value(), self.high.value()
+            if low is not None and high is not None and high > low:
+                return low, high
+        return self.min, self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "low": self.low.to_dict(),
+            "high": self.high.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data["count"]
+        stats.min = data["min"]
+        stats.max = data["max"]
+        stats.low = P2Quantile.from_dict(data["low"])
+        stats.high = P2Quantile.from_dict(data["high"])
+        return stats
@@ -0,0 +1,194 @@
+import math
+import numpy as np
+import optuna
+
+# Hyperparamètres du noyau, dans l'espace des paramètres ramené à [0, 1] et pour des scores centrés réduits
+LENGTH_SCALE = 0.3
+NOISE_VARIANCE = 0.05
+
+# Part des candidats tirés autour des meilleurs setups observés (le reste est uniforme)
+LOCAL_CANDIDATE_RATIO = 0.5
+LOCAL_CANDIDATE_SCALE = 0.1
+LOCAL_CANDIDATE_CENTERS = 5
+
+# Distance minimale (espace normalisé) entre un candidat retenu et un setup en cours de test
+MIN_PENDING_DISTANCE = 0.05
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
+
+def _matern52(a, b):
+    """Noyau de Matérn 5/2 entre deux lots de points normalisés"""
+    sq = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * a @ b.T
+    r = np.sqrt(np.maximum(sq, 0.0)) * (math.sqrt(5.0) / LENGTH_SCALE)
+    return (1.0 + r + r * r / 3.0) * np.exp(-r)
+
+
+class ParameterSpace:
+    """Conversion vectorisée entre setups et points de [0, 1]^d (pas et bornes de la voiture)"""
+
+    def __init__(self, distributions):
+        """
+        Args:
+            distributions (dict): Distributions Optuna indexées par nom de paramètre
+        """
+        self.names = list(distributions)
+        self.low = np.array([distributions[name].low for name in self.names], dtype=float)
+        self.high = np.array([distributions[name].high for name in self.names], dtype=float)
+        self.step = np.array([distributions[name].step or 0.0 for name in self.names], dtype=float)
+        self.integer = np.array([
+            isinstance(distributions[name], optuna.distributions.IntDistribution)
+            for name in self.names
+        ])
+        self.span = np.where(self.high > self.low, self.high - self.low, 1.0)
+
+    def to_unit(self, params_list):
+        """Setups (liste de dicts) -> matrice de points normalisés"""
+        values = np.array([[params[name] for name in self.names] for params in params_list], dtype=float)
+        return (values.reshape(-1, len(self.names)) - self.low) / self.span
+
+    def snap(self, points):
+        """Ramène des points normalisés sur la grille des valeurs autorisées"""
+        values = self.low + np.clip(points, 0.0, 1.0) * self.span
+        stepped = self.step > 0
+        values[:, stepped] = self.low[stepped] + \
+            np.round((values[:, stepped] - self.low[stepped]) / self.step[stepped]) * self.step[stepped]
+        values = np.clip(values, self.low, self.high)
+        return values, (values - self.low) / self.span
+
+    def to_params(self, values):
+        """Ligne de valeurs -> setup (types et arrondis de la voiture)"""
+        params = {}
+        for name, value, integer, step in zip(self.names, values, self.integer, self.step):
+            if integer:
+                params[name] = int(round(value))
+            else:
+                # Arrondi au pas pour éviter les artefacts binaires (ex: 0.30000000000000004)
+                decimals = max(0, -int(math.floor(math.log10(step)))) + 2 if step else 12
+                params[name] = round(float(value), decimals)
+        return params
+
+
+class GaussianProcessSurrogate:
+    """
+    Processus gaussien (noyau de Matérn 5/2) estimant le score d'un setup à partir des setups testés
+
+    L'inverse de la matrice de covariance est complété par blocs (complément de Schur)
+    à chaque ajout de points : O(n²) par tour noté au lieu d'un réajustement complet en O(n³).
+    Au-delà de max_points, les meilleurs et les plus récents sont conservés.
+    """
+
+    def __init__(self, max_points=500):
+        """
+        Args:
+            max_points (int): Nombre maximal de points conservés par le modèle
+        """
+        self.max_points = max_points
+        self.x = np.empty((0, 0))
+        self.y = np.empty(0)
+        self._inverse = np.empty((0, 0))
+
+    def __len__(self):
+        return len(self.y)
+
+    def add(self, points, values):
+        """
+        Ajoute des setups notés au modèle
+
+        Args:
+            points (np.ndarray): Points normalisés (n x d)
+            values (iterable): Scores correspondants
+        """
+        points = np.asarray(points, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+
+        if len(self.y) + len(values) > self.max_points:
+            self._refit(np.vstack([self.x, points]) if len(self.y) else points,
+                        np.concatenate([self.y, values]))
+            return
+
+        cross = _matern52(points, points) + NOISE_VARIANCE * np.eye(len(values))
+        if not len(self.y):
+            self.x, self.y = points, values
+            self._inverse = np.linalg.inv(cross)
+            return
+
+        # Inverse par blocs : [[A, C], [Cᵀ, D]]⁻¹ à partir de A⁻¹
+        covariance = _matern52(self.x, points)
+        projected = self._inverse @ covariance
+        schur_inverse = np.linalg.inv(cross - covariance.T @ projected)
+        upper_right = -projected @ schur_inverse
+        self._inverse = np.block([
+            [self._inverse - upper_right @ projected.T, upper_right],
+            [upper_right.T, schur_inverse]
+        ])
+        self.x = np.vstack([self.x, points])
+        self.y = np.concatenate([self.y, values])
+
+    def _refit(self, points, values):
+        """Réajustement complet sur les meilleurs et les plus récents des points"""
+        keep_best = np.argsort(-values)[:self.max_points // 2]
+        recent = np.setdiff1d(np.arange(len(values)), keep_best)[::-1]
+        keep = np.sort(np.concatenate([keep_best, recent[:self.max_points * 3 // 4 - len(keep_best)]]))
+        self.x, self.y = points[keep], values[keep]
+        self._inverse = np.linalg.inv(_matern52(self.x, self.x) + NOISE_VARIANCE * np.eye(len(keep)))
+
+    def predict(self, points):
+        """
+        Moyenne et écart-type prédits (scores centrés réduits) pour un lot de points
+
+        Returns:
+            tuple: (moyennes, écarts-types, meilleur score observé centré réduit)
+        """
+        mean, std = self.y.mean(), self.y.std() or 1.0
+        targets = (self.y - mean) / std
+        covariance = _matern52(points, self.x)
+        weighted = covariance @ self._inverse
+        mu = weighted @ targets
+        variance = np.maximum(1.0 - (weighted * covariance).sum(axis=1), 1e-12)
+        return mu, np.sqrt(variance), targets.max()
+
+    def expected_improvement(self, points, xi=0.01):
+        """Amélioration espérée (maximisation du score) de chaque point"""
+        mu, sigma, best = self.predict(points)
+        improvement = mu - best - xi
+        z = improvement / sigma
+        cdf = 0.5 * (1.0 + _erf(z / math.sqrt(2.0)))
+        pdf = np.exp(-0.5 * z * z) / math.sqrt(2.0 * math.pi)
+        return improvement * cdf + sigma * pdf
+
+
+def screen_candidates(surrogate, space, n_candidates, rng, pending=None):
+    """
+    Tire des candidats et renvoie le plus prometteur selon l'amélioration espérée
+
+    Les candidats sont tirés par lots (moitié uniformes, moitié autour des meilleurs
+    setups observés), ramenés sur la grille des pas, puis évalués en une passe.
+
+    Args:
+        surrogate (GaussianProcessSurrogate): Modèle ajusté
+        space (ParameterSpace): Espace des paramètres de la voiture
+        n_candidates (int): Nombre de candidats évalués
+        rng (np.random.Generator): Générateur aléatoire
+        pending (np.ndarray): Points normalisés des setups en cours de test (évités)
+
+    Returns:
+        tuple: (setup retenu, amélioration espérée)
+    """
+    dimension = len(space.names)
+    n_local = int(n_candidates * LOCAL_CANDIDATE_RATIO)
+    centers = surrogate.x[np.argsort(-surrogate.y)[:LOCAL_CANDIDATE_CENTERS]]
+    local = centers[rng.integers(len(centers), size=n_local)] + \
+        rng.normal(scale=LOCAL_CANDIDATE_SCALE, size=(n_local, dimension))
+    uniform = rng.random((n_candidates - n_local, dimension))
+    values, points = space.snap(np.vstack([local, uniform]))
+
+    scores = surrogate.expected_improvement(points)
+    if pending is not None and len(pending):
+        distance = np.sqrt(((points[:, None, :] - pending[None, :, :]) ** 2).mean(axis=2)).min(axis=1)
+        scores = np.where(distance < MIN_PENDING_DISTANCE, -np.inf, scores)
+
+    best = int(np.argmax(scores))
+    return space.to_params(values[best]), float(scores[best])
@@ -0,0 +1,132 @@
+import json
+import logging
+import math
+from src.config.settings import TRACK_FEATURES_FILE
+from src.core.statistics import MetricStatistics
+from src.core.scoring import ROBUST_MIN_COUNT
+from src.storage.repository import MetricStatisticsRepository
+
+logger = logging.getLogger(__name__)
+
+# Métriques formant la signature télémétrique d'un circuit (regroupées par caractéristique)
+SIGNATURE_FEATURES = {
+    "lap_time": ["lap_time"],
+    "tire_temp": ["tire_avg_temp_fl", "tire_avg_temp_fr", "tire_avg_temp_rl", "tire_avg_temp_rr"],
+    "car_stability": ["car_stability"],
+    "corner_entry_stability": ["corner_entry_stability"],
+    "corner_exit_stability": ["corner_exit_stability"],
+    "traction": ["traction"],
+    "braking_stability": ["braking_stability"],
+}
+
+# Écart relatif moyen (quadratique) pour lequel la similarité vaut exp(-1/2) ≈ 0.6
+SIMILARITY_BANDWIDTH = 0.2
+
+
+def load_track_features(path=TRACK_FEATURES_FILE):
+    """
+    Charge la table des caractéristiques de circuits fournie par l'utilisateur
+
+    Le fichier JSON associe à chaque circuit des caractéristiques numériques
+    (ex: {"spa": {"length_km": 7.0, "corners": 19, "altitude_m": 400}}).
+
+    Returns:
+        dict: Caractéristiques indexées par circuit ({} si le fichier est absent)
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Table des caractéristiques de circuits illisible ({path}): {str(e)}")
+        return {}
+
+
+def track_signature(statistics):
+    """
+    Résume la télémétrie d'un circuit (échelle du temps au tour, températures des pneus, stabilité)
+
+    Chaque caractéristique est le centre de la plage normale (5 %-95 %) des métriques correspondantes.
+
+    Args:
+        statistics (dict): Statistiques sérialisées des métriques du circuit
+
+    Returns:
+        dict: Valeur de chaque caractéristique disponible
+    """
+    signature = {}
+    for feature, metrics in SIGNATURE_FEATURES.items():
+        centers = []
+        for metric in metrics:
+            if metric not in statistics:
+                continue
+            low, high = MetricStatistics.from_dict(statistics[metric]).bounds(ROBUST_MIN_COUNT)
+            if low is not None and high is not None:
+                centers.append((low + high) / 2)
+        if centers:
+            signature[feature] = sum(centers) / len(centers)
+    return signature
+
+
+def similarity(features_a, features_b):
+    """
+    Similarité entre deux circuits décrits par les mêmes caractéristiques
+
+    Returns:
+        float: Similarité entre 0 et 1 (None si aucune caractéristique commune)
+    """
+    common = [feature for feature in features_a if feature in features_b]
+    if not common:
+        return None
+
+    distance = 0.0
+    for feature in common:
+        a, b = float(features_a[feature]), float(features_b[feature])
+        scale = (abs(a) + abs(b)) / 2
+        distance += ((a - b) / scale) ** 2 if scale > 0 else 0.0
+    distance /= len(common)
+    return math.exp(-distance / (2 * SIMILARITY_BANDWIDTH ** 2))
+
+
+def similar_tracks(car_id, track_id, limit=3, min_similarity=0.3):
+    """
+    Circuits de la voiture les plus proches d'un circuit donné
+
+    La table des caractéristiques fournie par l'utilisateur est utilisée lorsque les
+    deux circuits y figurent ; sinon les signatures télémétriques sont comparées
+    (le circuit cible n'en a qu'après ses premiers tours).
+
+    Args:
+        car_id (str): ID de la voiture
+        track_id (str): ID du circuit cible
+        limit (int): Nombre maximal de circuits renvoyés
+        min_similarity (float): Similarité minimale retenue
+
+    Returns:
+        list: Tuples (circuit, similarité), du plus proche au moins proche,
+              None si le circuit cible n'est encore décrit ni par la table ni par sa télémétrie
+    """
+    features = load_track_features()
+    signatures = {
+        track: track_signature(statistics)
+        for track, statistics in MetricStatisticsRepository.get_car_statistics(car_id).items()
+    }
+    if track_id not in features and not signatures.get(track_id):
+        return None
+
+    scored = []
+    for track in set(signatures) | set(features):
+        if track == track_id:
+            continue
+        if track in features and track_id in features:
+            value = similarity(features[track_id], features[track])
+        elif track in signatures and track_id in signatures:
+            value = similarity(signatures[track_id], signatures[track])
+        else:
+            value = None
+        if value is not None and value >= min_similarity:
+            scored.append((track, value))
+
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
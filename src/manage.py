@@ -0,0 +1,88 @@
+import argparse
+import logging
+import sys
+from src.storage.database import init_db
+from src.storage.repository import PerformanceRepository, TelemetryRepository
+from src.storage.columnar import telemetry_columns, telemetry_store
+from src.storage.archive import archive_cold_sessions
+from src.core.scoring import rebuild_metric_statistics
+
+
+def rebuild_performance(args):
+    """Reconstruit les résumés de performance depuis la télémétrie enregistrée"""
+    if not PerformanceRepository.rebuild():
+        return 1
+    print("Résumés de performance reconstruits")
+    return 0
+
+
+def rebuild_statistics(args):
+    """Reconstruit les statistiques de normalisation des métriques"""
+    laps = rebuild_metric_statistics(force=True)
+    print(f"Statistiques reconstruites à partir de {laps} tours")
+    return 0
+
+
+def rebuild_telemetry_store(args):
+    """Reconstruit l'archive colonnaire de la télémétrie depuis la base"""
+    telemetry_store.clear()
+    laps = 0
+    batch = {}
+    for telemetry, setup in TelemetryRepository.iter_telemetry_with_setups():
+        batch.setdefault((setup.car_id, setup.track_id), []).append(telemetry_columns(
+            telemetry.id, telemetry.setup_id, telemetry.lap_time, telemetry.submission_time,
+            telemetry.telemetry_data, telemetry.weather_conditions, setup.setup_parameters
+        ))
+        laps += 1
+        if laps % 1000 == 0:
+            for (car_id, track_id), rows in batch.items():
+                telemetry_store.append(car_id, track_id, rows)
+            batch = {}
+    for (car_id, track_id), rows in batch.items():
+        telemetry_store.append(car_id, track_id, rows)
+    print(f"Archive colonnaire reconstruite à partir de {laps} tours")
+    return 0
+
+
+def archive_sessions(args):
+    """Archive les sessions fermées depuis longtemps dans HISTORY_DIR puis compacte la base"""
+    result = archive_cold_sessions(days=args.days, compact=not args.no_compact)
+    print(f"{result['sessions']} session(s) archivée(s), {result['setups']} setup(s) déplacé(s)")
+    return 0
+
+
+COMMANDS = {
+    "rebuild-performance": rebuild_performance,
+    "rebuild-statistics": rebuild_statistics,
+    "rebuild-telemetry-store": rebuild_telemetry_store,
+    "archive-sessions": archive_sessions,
+}
+
+# Options propres à chaque commande : (arguments, options d'argparse)
+COMMAND_ARGUMENTS = {
+    "archive-sessions": [
+        (["--days"], {"type": int, "default": None,
+                      "help": "Ancienneté minimale de fermeture en jours (défaut : ARCHIVE_AFTER_DAYS)"}),
+        (["--no-compact"], {"action": "store_true", "help": "Ne pas compacter la base après archivage"}),
+    ],
+}
+
+
+def main(argv=None):
+    """Commandes de maintenance : python -m src.manage <commande>"""
+    parser = argparse.ArgumentParser(prog="python -m src.manage", description="Maintenance de la base Auriga")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, command in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=command.__doc__)
+        for flags, options in COMMAND_ARGUMENTS.get(name, []):
+            subparser.add_argument(*flags, **options)
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    return COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -7,6 +7,18 @@ Base = declarative_base()
 
 class SetupConfiguration(Base):
     __tablename__ = "setup_configurations"
+    __table_args__ = (
+        # Historique et liste des setups d'une voiture/piste (plus récents d'abord)
+        Index("ix_setup_car_track_generation", "car_id", "track_id", "generation_time"),
+        # Meilleurs setups testés d'une voiture/piste
+        Index("ix_setup_car_track_status_score", "car_id", "track_id", "status", "score"),
+        # Setups en attente et décompte par statut d'une session
+        Index("ix_setup_session_status_generation", "optimization_session_id", "status", "generation_time"),
+        # Prochain setup en attente non réservé toutes sessions confondues, baux expirés
+        Index("ix_setup_status_lease_generation", "status", "lease_expires_at", "generation_time"),
+        # IDs jamais réutilisés : chaque base (shard) attribue ses IDs dans sa propre plage
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True)
     car_id = Column(String, nullable=False)
@@ -17,9 +29,14 @@ class SetupConfiguration(Base):
     source = Column(String, nullable=False)
     score = Column(Float, nullable=True)
     optimization_session_id = Column(Integer, ForeignKey('optimization_sessions.id'))
+    trial_number = Column(Integer, nullable=True)  # Numéro du trial Optuna associé
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)  # Version (ETag)
+    claimed_by = Column(String, nullable=True)  # Poste de test (rig) ayant réservé le setup
+    lease_expires_at = Column(DateTime, nullable=True)  # Fin de la réservation (le setup revient ensuite dans la file)
     
     telemetry_results = relationship("TelemetryResult", back_populates="setup")
-    optimization_session = relationship("OptimizationSession", back_populates="setups")
+    optimization_session = relationship("OptimizationSession", back_populates="setups",
+                                        foreign_keys=[optimization_session_id])
     
     def to_dict(self):
         return {
@@ -49,6 +66,10 @@ class SetupConfiguration(Base):
 
 class TelemetryResult(Base):
     __tablename__ = "telemetry_results"
+    __table_args__ = (
+        Index("ix_telemetry_setup", "setup_id"),
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True)
     setup_id = Column(Integer, ForeignKey('setup_configurations.id'))
@@ -74,6 +95,13 @@ class TelemetryResult(Base):
 
 class OptimizationSession(Base):
     __tablename__ = "optimization_sessions"
+    __table_args__ = (
+        # Session active d'une voiture/piste
+        Index("ix_session_car_track_end", "car_id", "track_id", "end_time"),
+        # Sessions actives, plus récentes d'abord
+        Index("ix_session_end_start", "end_time", "start_time"),
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True)
     car_id = Column(String, nullable=False)
@@ -82,6 +110,8 @@ class OptimizationSession(Base):
     end_time = Column(DateTime, nullable=True)
     optimization_parameters = Column(JSON, nullable=False)
     best_setup_id = Column(Integer, ForeignKey('setup_configurations.id'), nullable=True)
+    study_name = Column(String, nullable=True)  # Nom de l'étude Optuna dans le stockage partagé
+    archived_at = Column(DateTime, nullable=True)  # Setups et télémétrie déplacés dans HISTORY_DIR
     
     setups = relationship("SetupConfiguration", back_populates="optimization_session", 
                           foreign_keys=[SetupConfiguration.optimization_session_id])
@@ -95,5 +125,120 @@ class OptimizationSession(Base):
             "start_time": self.start_time.isoformat(),
             "end_time": self.end_time.isoformat() if self.end_time else None,
             "optimization_parameters": self.optimization_parameters,
-            "best_setup_id": self.best_setup_id
+            "best_setup_id": self.best_setup_id,
+            "study_name": self.study_name,
+            "archived_at": self.archived_at.isoformat() if self.archived_at else None
+        }
+
+
+class MetricStatistic(Base):
+    __tablename__ = "metric_statistics"
+    __table_args__ = (UniqueConstraint("car_id", "track_id", "metric"),)
+    
+    id = Column(Integer, primary_key=True)
+    car_id = Column(String, nullable=False)
+    track_id = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+    statistics = Column(JSON, nullable=False)  # Effectif, min/max et marqueurs des quantiles
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PerformanceSummary(Base):
+    """Résumé des performances d'un setup, maintenu à chaque enregistrement de télémétrie"""
+    __tablename__ = "performance_summaries"
+    __table_args__ = (
+        # Graphique de performance d'une voiture/piste (lecture d'une seule plage d'index)
+        Index("ix_performance_car_track_generation", "car_id", "track_id", "generation_time"),
+    )
+    
+    setup_id = Column(Integer, ForeignKey('setup_configurations.id'), primary_key=True)
+    car_id = Column(String, nullable=False)
+    track_id = Column(String, nullable=False)
+    generation_time = Column(DateTime, nullable=True)  # Date de génération du setup (ordre du graphique)
+    lap_count = Column(Integer, nullable=False, default=0)
+    best_lap_time = Column(Float, nullable=True)
+    mean_lap_time = Column(Float, nullable=True)
+    score = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            "setup_id": self.setup_id,
+            "car_id": self.car_id,
+            "track_id": self.track_id,
+            "lap_count": self.lap_count,
+            "best_lap_time": self.best_lap_time,
+            "mean_lap_time": self.mean_lap_time,
+            "score": self.score,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class SetupTotal(Base):
+    """Nombre de setups et révision de la liste d'une voiture/piste, maintenus à chaque écriture"""
+    __tablename__ = "setup_totals"
+    
+    car_id = Column(String, primary_key=True)
+    track_id = Column(String, primary_key=True)
+    setup_count = Column(Integer, nullable=False, default=0)
+    revision = Column(Integer, nullable=False, default=0)  # Incrémentée à chaque modification (ETag)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SessionStatistics(Base):
+    """Statistiques d'une session d'optimisation, maintenues à chaque création ou notation de setup"""
+    __tablename__ = "session_statistics"
+    
+    session_id = Column(Integer, ForeignKey('optimization_sessions.id'), primary_key=True)
+    trials_completed = Column(Integer, nullable=False, default=0)
+    trials_pending = Column(Integer, nullable=False, default=0)
+    best_score = Column(Float, nullable=True)
+    best_setup_id = Column(Integer, ForeignKey('setup_configurations.id'), nullable=True)
+    direction = Column(String, nullable=True)  # Direction de l'étude ("minimize", sinon maximisation)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ArchivedSetup(Base):
+    """Setup déplacé dans l'archive de sa session (retrouvé lors d'un accès pour la réhydrater)"""
+    __tablename__ = "archived_setups"
+    
+    setup_id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey('optimization_sessions.id'), nullable=False, index=True)
+
+
+class IngestCheckpoint(Base):
+    """Dernier tour du journal d'ingestion validé en base, par flux (un flux par processus)"""
+    __tablename__ = "ingest_checkpoints"
+    
+    stream = Column(String, primary_key=True)
+    sequence = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class WorkerJob(Base):
+    """Tâche du worker d'optimisation, suivie depuis tous les workers et reprise après un arrêt"""
+    __tablename__ = "worker_jobs"
+    __table_args__ = (
+        # Tâches inachevées (reprise au démarrage) et purge des tâches terminées
+        Index("ix_worker_job_status_created", "status", "created_at"),
+    )
+    
+    id = Column(String, primary_key=True)  # Identifiant communiqué au client
+    task = Column(String, nullable=False)  # Nom de la tâche enregistrée auprès du worker
+    arguments = Column(JSON, nullable=False)  # Arguments de la tâche (reprise)
+    status = Column(String, nullable=False)
+    owner = Column(String, nullable=True)  # Processus qui exécute la tâche
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
         }
@@ -0,0 +1,259 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, delete, insert
+from sqlalchemy.exc import SQLAlchemyError
+from src.config.settings import ARCHIVE_AFTER_DAYS, HISTORY_DIR
+from src.models.setup import (
+    ArchivedSetup, OptimizationSession, PerformanceSummary, SessionStatistics, SetupConfiguration, TelemetryResult
+)
+from src.storage.database import get_session, router
+from src.storage.repository import SetupRepository, _touch_setup_totals
+
+logger = logging.getLogger(__name__)
+
+# Version du format des fichiers d'archive
+ARCHIVE_FORMAT = 1
+
+
+def archive_path(session_id):
+    """Fichier d'archive d'une session"""
+    return HISTORY_DIR / f"session_{session_id}.json.gz"
+
+
+def _row_dict(row):
+    return {column.name: getattr(row, column.name) for column in row.__table__.columns}
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def _restore_rows(model, rows):
+    """Reconvertit les dates d'une table archivée"""
+    date_columns = [column.name for column in model.__table__.columns if isinstance(column.type, DateTime)]
+    for row in rows:
+        for name in date_columns:
+            if row.get(name) is not None:
+                row[name] = datetime.fromisoformat(row[name])
+    return rows
+
+
+def _write_archive(path, payload):
+    """Écrit un fichier d'archive compressé de façon atomique (fichier temporaire puis renommage)"""
+    temporary = path.with_name(path.name + ".tmp")
+    with gzip.open(temporary, "wb") as archive_file:
+        archive_file.write(json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8"))
+    with open(temporary, "rb") as archive_file:
+        os.fsync(archive_file.fileno())
+    os.replace(temporary, path)
+
+
+def archive_session(session_id):
+    """
+    Déplace les setups, la télémétrie et les résumés de performance d'une session
+    dans un fichier compressé de HISTORY_DIR
+
+    La session reste en base comme ligne témoin (avec ses statistiques) ; ses meilleurs
+    setups restent aussi en base pour que son statut reste complet sans réhydratation.
+
+    Args:
+        session_id (int): ID de la session (fermée)
+
+    Returns:
+        int: Nombre de setups archivés (None si erreur)
+    """
+    db = get_session()
+    path = archive_path(session_id)
+    written = False
+    try:
+        session = db.get(OptimizationSession, session_id)
+        if session is None or session.end_time is None or session.archived_at is not None:
+            return 0
+
+        stats = db.get(SessionStatistics, session_id)
+        kept_ids = {session.best_setup_id, stats.best_setup_id if stats else None} - {None}
+        setups = db.query(SetupConfiguration)\
+            .filter(SetupConfiguration.optimization_session_id == session_id,
+                    SetupConfiguration.id.notin_(list(kept_ids)))\
+            .all()
+        setup_ids = [setup.id for setup in setups]
+
+        telemetry = db.query(TelemetryResult).filter(TelemetryResult.setup_id.in_(setup_ids)).all()
+        summaries = db.query(PerformanceSummary).filter(PerformanceSummary.setup_id.in_(setup_ids)).all()
+
+        _write_archive(path, {
+            "format": ARCHIVE_FORMAT,
+            "session": _row_dict(session),
+            "setups": [_row_dict(setup) for setup in setups],
+            "telemetry_results": [_row_dict(result) for result in telemetry],
+            "performance_summaries": [_row_dict(summary) for summary in summaries]
+        })
+        written = True
+
+        if setup_ids:
+            db.execute(delete(TelemetryResult).where(TelemetryResult.setup_id.in_(setup_ids)))
+            db.execute(delete(PerformanceSummary).where(PerformanceSummary.setup_id.in_(setup_ids)))
+            db.execute(insert(ArchivedSetup.__table__), [
+                {"setup_id": setup_id, "session_id": session_id} for setup_id in setup_ids
+            ], bind_arguments={"shard_id": router.shard_for_id(session_id)})
+            db.execute(delete(SetupConfiguration).where(SetupConfiguration.id.in_(setup_ids)))
+            _touch_setup_totals(db, [(session.car_id, session.track_id)], added=-len(setup_ids))
+        session.archived_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"Session {session_id} archivée: {len(setup_ids)} setups, {len(telemetry)} tours")
+        return len(setup_ids)
+    except (SQLAlchemyError, OSError) as e:
+        db.rollback()
+        if written:
+            path.unlink(missing_ok=True)
+        logger.error(f"Erreur lors de l'archivage de la session {session_id}: {str(e)}")
+        return None
+    finally:
+        db.close()
+
+
+def get_cold_sessions(days=None):
+    """
+    Sessions fermées depuis plus de N jours et pas encore archivées
+
+    Returns:
+        list: IDs des sessions
+    """
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    db = get_session()
+    try:
+        rows = db.query(OptimizationSession.id)\
+            .filter(OptimizationSession.end_time.isnot(None),
+                    OptimizationSession.end_time < cutoff,
+                    OptimizationSession.archived_at.is_(None))\
+            .order_by(OptimizationSession.end_time)\
+            .all()
+        return [session_id for session_id, in rows]
+    except SQLAlchemyError as e:
+        logger.error(f"Erreur lors de la recherche des sessions à archiver: {str(e)}")
+        return []
+    finally:
+        db.close()
+
+
+def archive_cold_sessions(days=None, compact=True):
+    """
+    Archive les sessions fermées depuis plus de N jours, puis compacte la base
+
+    Args:
+        days (int): Ancienneté minimale de fermeture (None = ARCHIVE_AFTER_DAYS)
+        compact (bool): Compacte la base après archivage
+
+    Returns:
+        dict: Nombre de sessions et de setups archivés
+    """
+    sessions = setups = 0
+    for session_id in get_cold_sessions(days):
+        archived = archive_session(session_id)
+        if archived is None:
+            continue
+        sessions += 1
+        setups += archived
+
+    if compact and sessions:
+        compact_database()
+    return {"sessions": sessions, "setups": setups}
+
+
+def rehydrate_session(session_id):
+    """
+    Réintègre en base les setups, la télémétrie et les résumés d'une session archivée
+
+    Le fichier d'archive est conservé : il sera remplacé au prochain archivage de la session.
+
+    Returns:
+        bool: True si la session est (de nouveau) complète en base
+    """
+    db = get_session()
+    try:
+        session = db.get(OptimizationSession, session_id)
+        if session is None:
+            return False
+        if session.archived_at is None:
+            return True
+
+        with gzip.open(archive_path(session_id), "rb") as archive_file:
+            payload = json.loads(archive_file.read())
+
+        setups = payload["setups"]
+        if setups:
+            # Les setups d'abord : résumés et télémétrie y font référence
+            for model, rows in ((SetupConfiguration, setups),
+                                (PerformanceSummary, payload["performance_summaries"]),
+                                (TelemetryResult, payload["telemetry_results"])):
+                if rows:
+                    db.execute(insert(model.__table__), _restore_rows(model, rows),
+                               bind_arguments={"shard_id": router.shard_for_id(session_id)})
+            db.execute(delete(ArchivedSetup).where(ArchivedSetup.session_id == session_id))
+            _touch_setup_totals(db, [(session.car_id, session.track_id)], added=len(setups))
+        session.archived_at = None
+        db.commit()
+        logger.info(f"Session {session_id} réhydratée: {len(setups)} setups")
+        return True
+    except (SQLAlchemyError, OSError, ValueError, KeyError) as e:
+        db.rollback()
+        logger.error(f"Erreur lors de la réhydratation de la session {session_id}: {str(e)}")
+        return False
+    finally:
+        db.close()
+
+
+def load_setup(setup_id):
+    """
+    Récupère un setup, en réhydratant sa session s'il a été archivé
+
+    Returns:
+        SetupConfiguration: Setup ou None s'il n'existe pas
+    """
+    setup = SetupRepository.get_setup_by_id(setup_id)
+    if setup is not None:
+        return setup
+
+    db = get_session()
+    try:
+        archived = db.get(ArchivedSetup, setup_id)
+        session_id = archived.session_id if archived else None
+    except SQLAlchemyError as e:
+        logger.error(f"Erreur lors de la recherche du setup archivé: {str(e)}")
+        session_id = None
+    finally:
+        db.close()
+
+    if session_id is None or not rehydrate_session(session_id):
+        return None
+    return SetupRepository.get_setup_by_id(setup_id)
+
+
+def compact_database():
+    """
+    Récupère l'espace libéré par l'archivage (VACUUM hors transaction), dans chaque base
+    
+    Avec SQLite, le journal WAL est aussi vidé dans le fichier principal.
+    """
+    compacted = False
+    for engine in router.engines():
+        dialect = engine.dialect.name
+        if dialect not in ("sqlite", "postgresql"):
+            logger.warning(f"Compactage non disponible pour {dialect}")
+            continue
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            if dialect == "sqlite":
+                connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+                connection.exec_driver_sql("VACUUM")
+            else:
+                connection.exec_driver_sql("VACUUM ANALYZE")
+        compacted = True
+    if compacted:
+        logger.info("Base de données compactée")
+    return compacted
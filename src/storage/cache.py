@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Petit cache en mémoire (par processus) à durée de vie limitée
+
+    Les écritures locales invalident les entrées concernées ; la durée de vie
+    borne le retard sur les écritures faites par d'autres workers.
+    """
+
+    def __init__(self, ttl, max_size=256):
+        """
+        Args:
+            ttl (float): Durée de vie d'une entrée (secondes, 0 = cache désactivé)
+            max_size (int): Nombre maximal d'entrées
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Renvoie la valeur en cache (None si absente ou expirée)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        """Enregistre une valeur"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Supprime une entrée"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,248 @@
+import logging
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+import numpy as np
+from sqlalchemy import event
+from src.config.settings import TELEMETRY_DIR
+from src.storage.database import UnitOfWorkSession
+
+try:
+    import fcntl
+except ImportError:  # Verrou inter-processus indisponible (Windows) : verrou de thread seul
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Colonne d'index : sa longueur fait foi pour le nombre de tours enregistrés (écrite en dernier)
+INDEX_COLUMN = "telemetry_id"
+BASE_COLUMNS = [INDEX_COLUMN, "setup_id", "lap_time", "submission_time"]
+
+# Type des colonnes : flottants 64 bits petit-boutistes (NaN = valeur absente)
+COLUMN_DTYPE = np.dtype("<f8")
+COLUMN_SUFFIX = ".f64"
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.\-]+$")
+
+
+def _numeric(value):
+    """Valeur numérique d'une entrée de télémétrie (None si non numérique)"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def telemetry_columns(telemetry_id, setup_id, lap_time, submission_time, telemetry_data=None,
+                      weather_conditions=None, setup_parameters=None):
+    """
+    Aplatit un tour en colonnes numériques
+
+    Les métriques de télémétrie gardent leur nom ; les conditions météo et les
+    paramètres du setup sont préfixés (weather.*, setup.*) pour pouvoir croiser
+    une métrique et un réglage sans relire les blobs JSON.
+
+    Returns:
+        dict: Valeurs indexées par nom de colonne
+    """
+    row = {}
+    for prefix, values in (("", telemetry_data), ("weather.", weather_conditions), ("setup.", setup_parameters)):
+        if not isinstance(values, dict):
+            continue
+        for key, value in values.items():
+            value = _numeric(value)
+            if value is not None:
+                row[f"{prefix}{key}"] = value
+
+    row.update({
+        INDEX_COLUMN: float(telemetry_id),
+        "setup_id": float(setup_id),
+        "lap_time": float(lap_time),
+        "submission_time": submission_time.timestamp() if submission_time is not None else np.nan
+    })
+    return row
+
+
+class ColumnarTelemetryStore:
+    """
+    Archive colonnaire de la télémétrie, un répertoire par voiture et par piste
+
+    Chaque colonne est un fichier binaire de flottants ajoutés en fin de fichier :
+    les lectures passent par np.memmap et ne touchent que les colonnes demandées.
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root (Path): Répertoire racine de l'archive
+        """
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _directory(self, car_id, track_id):
+        for name in (car_id, track_id):
+            if not _NAME_PATTERN.match(str(name)) or name in (".", ".."):
+                raise ValueError(f"Identifiant invalide pour l'archive de télémétrie: {name}")
+        return self.root / str(car_id) / str(track_id)
+
+    @staticmethod
+    def _column_path(directory, column):
+        return directory / f"{column}{COLUMN_SUFFIX}"
+
+    @contextmanager
+    def _write_lock(self, directory):
+        """Verrou d'écriture d'une archive (threads du processus et autres workers)"""
+        with self._lock:
+            directory.mkdir(parents=True, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(directory / ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _row_count(directory):
+        path = ColumnarTelemetryStore._column_path(directory, INDEX_COLUMN)
+        try:
+            return os.path.getsize(path) // COLUMN_DTYPE.itemsize
+        except FileNotFoundError:
+            return 0
+
+    def columns(self, car_id, track_id):
+        """Noms des colonnes disponibles pour une voiture et une piste"""
+        directory = self._directory(car_id, track_id)
+        if not directory.exists():
+            return []
+        return sorted(path.name[:-len(COLUMN_SUFFIX)] for path in directory.glob(f"*{COLUMN_SUFFIX}"))
+
+    def row_count(self, car_id, track_id):
+        """Nombre de tours archivés pour une voiture et une piste"""
+        return self._row_count(self._directory(car_id, track_id))
+
+    def append(self, car_id, track_id, rows):
+        """
+        Ajoute des tours à l'archive d'une voiture et d'une piste
+
+        Args:
+            car_id (str): ID de la voiture
+            track_id (str): ID du circuit
+            rows (list): Dictionnaires colonne -> valeur (voir telemetry_columns)
+
+        Returns:
+            int: Nombre de tours archivés après l'ajout
+        """
+        directory = self._directory(car_id, track_id)
+        if not rows:
+            return self._row_count(directory)
+
+        names = {name for row in rows for name in row if _NAME_PATTERN.match(name)}
+        with self._write_lock(directory):
+            count = self._row_count(directory)
+            existing = {path.name[:-len(COLUMN_SUFFIX)] for path in directory.glob(f"*{COLUMN_SUFFIX}")}
+
+            # L'index est écrit en dernier : une écriture interrompue laisse des lignes
+            # en trop dans les autres colonnes, ignorées puis écrasées au prochain ajout
+            for column in sorted((existing | names) - {INDEX_COLUMN}) + [INDEX_COLUMN]:
+                values = np.array([row.get(column, np.nan) for row in rows], dtype=COLUMN_DTYPE)
+                path = self._column_path(directory, column)
+                with open(path, "r+b" if path.exists() else "w+b") as column_file:
+                    column_file.seek(0, os.SEEK_END)
+                    size = column_file.tell() // COLUMN_DTYPE.itemsize
+                    if size > count:
+                        column_file.truncate(count * COLUMN_DTYPE.itemsize)
+                    elif size < count:
+                        # Nouvelle colonne : valeurs absentes pour les tours déjà archivés
+                        np.full(count - size, np.nan, dtype=COLUMN_DTYPE).tofile(column_file)
+                    column_file.seek(count * COLUMN_DTYPE.itemsize)
+                    values.tofile(column_file)
+
+            return count + len(rows)
+
+    def read_columns(self, car_id, track_id, columns):
+        """
+        Lit des colonnes en mémoire mappée (seuls les fichiers demandés sont ouverts)
+
+        Args:
+            car_id (str): ID de la voiture
+            track_id (str): ID du circuit
+            columns (list): Noms des colonnes
+
+        Returns:
+            dict: Tableaux NumPy en lecture seule indexés par nom de colonne
+                  (NaN pour une colonne absente ou une valeur manquante)
+        """
+        directory = self._directory(car_id, track_id)
+        count = self._row_count(directory)
+        arrays = {}
+        for column in columns:
+            path = self._column_path(directory, column)
+            size = os.path.getsize(path) // COLUMN_DTYPE.itemsize if path.exists() else 0
+            if count == 0:
+                arrays[column] = np.empty(0, dtype=COLUMN_DTYPE)
+            elif size >= count:
+                arrays[column] = np.memmap(path, dtype=COLUMN_DTYPE, mode="r", shape=(count,))
+            else:
+                # Colonne créée après ces tours (ou en cours d'écriture)
+                values = np.full(count, np.nan, dtype=COLUMN_DTYPE)
+                if size:
+                    values[:size] = np.memmap(path, dtype=COLUMN_DTYPE, mode="r", shape=(size,))
+                arrays[column] = values
+        return arrays
+
+    def read_frame(self, car_id, track_id, columns):
+        """
+        Lit des colonnes dans un DataFrame pandas (sans copie des colonnes mappées)
+
+        Returns:
+            pandas.DataFrame: Une ligne par tour archivé
+        """
+        import pandas as pd
+        return pd.DataFrame(self.read_columns(car_id, track_id, columns), copy=False)
+
+    def clear(self):
+        """Supprime toute l'archive (avant reconstruction)"""
+        with self._lock:
+            if self.root.exists():
+                shutil.rmtree(self.root)
+            self.root.mkdir(parents=True, exist_ok=True)
+
+
+telemetry_store = ColumnarTelemetryStore(TELEMETRY_DIR)
+
+
+def queue_telemetry(db, car_id, track_id, row):
+    """
+    Programme l'archivage d'un tour à la validation de la transaction en cours
+
+    L'archive n'est écrite qu'après le commit réel (fin de l'unité de travail) :
+    un tour annulé n'y apparaît jamais.
+    """
+    db.info.setdefault("columnar_telemetry", []).append((car_id, track_id, row))
+
+
+@event.listens_for(UnitOfWorkSession, "after_commit")
+def _write_queued_telemetry(session):
+    pending = session.info.pop("columnar_telemetry", None)
+    if not pending:
+        return
+    groups = {}
+    for car_id, track_id, row in pending:
+        groups.setdefault((car_id, track_id), []).append(row)
+    for (car_id, track_id), rows in groups.items():
+        try:
+            telemetry_store.append(car_id, track_id, rows)
+        except (OSError, ValueError) as e:
+            # La base reste la référence : python -m src.manage rebuild-telemetry-store
+            logger.error(f"Erreur lors de l'archivage colonnaire de la télémétrie: {str(e)}")
+
+
+@event.listens_for(UnitOfWorkSession, "after_rollback")
+def _discard_queued_telemetry(session):
+    session.info.pop("columnar_telemetry", None)
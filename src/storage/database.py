@@ -1,24 +1,263 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session as OrmSession, sessionmaker, scoped_session
+from sqlalchemy.ext.horizontal_shard import ShardedSession
 from sqlalchemy.ext.declarative import declarative_base
-from src.config.settings import DB_URL
+import logging
+import optuna
+from src.config.settings import (
+    DB_URL, OPTUNA_STORAGE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    SQLITE_BUSY_TIMEOUT, SQLITE_MMAP_SIZE, DB_SHARDING, CATALOG_DB_URL, SHARDS_DIR
+)
 from src.models.setup import Base
+from src.storage.migrations import run_migrations
+from src.storage.shards import GLOBAL_ID_TABLES, SHARD_ID_SPAN, ShardRouter
+
+logger = logging.getLogger(__name__)
+
+IS_SQLITE = DB_URL.startswith("sqlite")
+
+def _engine_kwargs(url):
+    """Configuration du pool de connexions"""
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        # Base en mémoire : une seule connexion, pas de pool configurable
+        return {}
+    kwargs = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    if url.startswith("sqlite"):
+        # Les connexions du pool passent d'un thread à l'autre (worker, requêtes)
+        kwargs["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT / 1000}
+    else:
+        kwargs["pool_pre_ping"] = True
+    return kwargs
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """
+    WAL : les lectures (tableau de bord) ne sont plus bloquées par les écritures (télémétrie).
+    synchronous=NORMAL suffit en WAL ; busy_timeout attend le verrou d'écriture au lieu d'échouer.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def create_database_engine(url):
+    """Crée un moteur (pool et PRAGMAs SQLite) pour la base principale ou un shard"""
+    database_engine = create_engine(url, **_engine_kwargs(url))
+    if url.startswith("sqlite"):
+        event.listen(database_engine, "connect", _configure_sqlite)
+    return database_engine
+
+def _initialize_shard(shard_engine, shard_index):
+    """
+    Crée et met à jour le schéma d'un shard, puis place ses compteurs d'IDs dans sa plage
+    
+    Les tables à IDs globaux sont en AUTOINCREMENT : SQLite repart de sqlite_sequence,
+    initialisée à shard_index * SHARD_ID_SPAN pour un nouveau shard.
+    """
+    Base.metadata.create_all(shard_engine)
+    run_migrations(shard_engine)
+    if shard_index == 0 or shard_engine.dialect.name != "sqlite":
+        return
+    with shard_engine.begin() as connection:
+        for table in GLOBAL_ID_TABLES:
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_sequence WHERE name = ?", (table,)
+            ).first()
+            if exists is None:
+                connection.exec_driver_sql(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, shard_index * SHARD_ID_SPAN)
+                )
+
+# Création du moteur de base de données (base par défaut, seul shard sans répartition)
+engine = create_database_engine(DB_URL)
+
+# Routage des données entre les bases (une par voiture avec DB_SHARDING=car)
+router = ShardRouter(
+    engine, create_database_engine, _initialize_shard,
+    sharded=DB_SHARDING == "car",
+    shard_dir=SHARDS_DIR,
+    catalog_engine=create_database_engine(CATALOG_DB_URL) if DB_SHARDING == "car" else None
+)
+
+
+class UnitOfWorkSession(OrmSession):
+    """
+    Session pouvant participer à une unité de travail (une transaction par requête)
+    
+    Pendant une unité de travail, commit() se contente d'envoyer les écritures (flush)
+    et close() ne fait rien : la transaction est validée une seule fois en fin de requête.
+    Un rollback() annule toutes les écritures déjà faites par la requête : l'unité de
+    travail est alors marquée en échec et ne peut plus être validée (la requête échoue).
+    Hors requête (worker, démarrage), le comportement est celui d'une session classique.
+    """
+    
+    @property
+    def in_unit_of_work(self):
+        return self.info.get("unit_of_work", False)
+    
+    def commit(self):
+        if self.in_unit_of_work:
+            self.flush()
+        else:
+            super().commit()
+    
+    def rollback(self):
+        if self.in_unit_of_work:
+            self.info["unit_of_work_failed"] = True
+        super().rollback()
+    
+    def close(self):
+        if not self.in_unit_of_work:
+            super().close()
+
+
+class ShardedUnitOfWorkSession(UnitOfWorkSession, ShardedSession):
+    """
+    Session répartie entre les shards du routeur (DB_SHARDING=car)
+    
+    Les moteurs des shards sont ouverts à la demande : un shard créé par un autre
+    worker est utilisable sans redémarrage.
+    """
+    
+    def get_bind(self, mapper=None, *, shard_id=None, instance=None, clause=None, **kw):
+        if shard_id is None:
+            if mapper is None:
+                # Requête SQL sans entité : routée d'après ses critères
+                shard_id = router.shard_for_clause(clause)
+            else:
+                shard_id = self._choose_shard_and_assign(mapper, instance=instance, clause=clause)
+        return router.engine(shard_id)
 
-# Création du moteur de base de données
-engine = create_engine(DB_URL)
 
 # Création de la session
-session_factory = sessionmaker(bind=engine)
+if router.sharded:
+    session_factory = sessionmaker(
+        class_=ShardedUnitOfWorkSession,
+        shard_chooser=router.shard_chooser,
+        identity_chooser=router.identity_chooser,
+        execute_chooser=router.execute_chooser
+    )
+else:
+    session_factory = sessionmaker(bind=engine, class_=UnitOfWorkSession)
 Session = scoped_session(session_factory)
 
-# Création des tables si elles n'existent pas
+# Stockages Optuna partagés entre les workers, par URL (créés à la première utilisation)
+_study_storages = {}
+
+# Création des tables si elles n'existent pas, puis mise à jour du schéma des bases existantes
 def init_db():
     Base.metadata.create_all(engine)
+    run_migrations(engine)
+    router.initialize()
 
 def get_session():
-    """Renvoie une session de base de données"""
+    """Renvoie la session de base de données du thread courant"""
+    return Session()
+
+def begin_unit_of_work():
+    """Ouvre l'unité de travail de la requête : les repositories partagent une même transaction"""
+    Session().info["unit_of_work"] = True
+
+def commit_unit_of_work():
+    """
+    Valide la transaction de l'unité de travail en cours
+    
+    Returns:
+        bool: True si succès (ou aucune unité de travail), False si la transaction a été annulée
+    """
+    if not Session.registry.has():
+        return True
+    db = Session()
+    if not db.in_unit_of_work:
+        return True
+    if db.info.get("unit_of_work_failed"):
+        # Une écriture a échoué plus tôt dans la requête : les précédentes ont été annulées
+        db.rollback()
+        logger.error("Unité de travail annulée après l'échec d'une écriture")
+        return False
+    try:
+        OrmSession.commit(db)
+        return True
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Erreur lors de la validation de l'unité de travail: {str(e)}")
+        return False
+
+def end_unit_of_work(commit=True):
+    """
+    Termine l'unité de travail de la requête et libère la connexion
+    
+    Args:
+        commit (bool): Valide la transaction (sinon annulation)
+        
+    Returns:
+        bool: True si la transaction a été validée
+    """
+    if not Session.registry.has():
+        return True
     db = Session()
+    success = commit_unit_of_work() if commit else False
+    if not success:
+        db.rollback()
+    db.info.pop("unit_of_work", None)
+    db.info.pop("unit_of_work_failed", None)
+    Session.remove()
+    return success
+
+@contextmanager
+def suspend_unit_of_work():
+    """
+    Valide l'unité de travail de la requête avant de passer la main à l'optimiseur
+    
+    SQLite n'accepte qu'un écrivain par fichier : les écritures Optuna (autre connexion)
+    et l'attente du verrou d'un optimiseur (tenu par le worker, qui écrit lui aussi)
+    ne doivent pas se faire pendant que la transaction de la requête est ouverte.
+    Les écritures de la requête sont donc validées une fois, à l'entrée du bloc ;
+    dans le bloc, chaque appel aux repositories valide ses propres écritures.
+    L'unité de travail reprend à la sortie. Sans effet avec un serveur de base de
+    données ou hors requête (worker).
+    
+    Raises:
+        SQLAlchemyError: Si la validation de l'unité de travail échoue
+    """
+    if not IS_SQLITE or not Session.registry.has() or not Session().in_unit_of_work:
+        yield
+        return
+    if not commit_unit_of_work():
+        raise SQLAlchemyError("Erreur lors de l'enregistrement des modifications de la requête")
+    db = Session()
+    db.info["unit_of_work"] = False
     try:
-        return db
+        yield
     finally:
-        db.close()
+        db.info["unit_of_work"] = True
+
+def get_study_storage(car_id=None):
+    """
+    Renvoie le stockage Optuna partagé (RDB) des études d'une voiture
+    
+    L'état des études vit en base et non en mémoire : chaque worker gunicorn
+    peut ainsi servir ask/tell pour n'importe quelle session. Sans OPTUNA_STORAGE_URL,
+    les études sont stockées dans la base (shard) des setups de la voiture.
+    
+    Args:
+        car_id (str): ID de la voiture
+    """
+    url = OPTUNA_STORAGE_URL or router.url(router.shard_for_car(car_id, create=car_id is not None))
+    storage = _study_storages.get(url)
+    if storage is None:
+        engine_kwargs = {}
+        if url.startswith("sqlite"):
+            # Attend le verrou d'écriture au lieu d'échouer immédiatement
+            engine_kwargs["connect_args"] = {"timeout": SQLITE_BUSY_TIMEOUT / 1000}
+        storage = optuna.storages.RDBStorage(url, engine_kwargs=engine_kwargs)
+        _study_storages[url] = storage
+    return storage
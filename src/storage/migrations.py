@@ -0,0 +1,283 @@
+import logging
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Integer, MetaData, String, Table, bindparam, inspect, select, text
+
+logger = logging.getLogger(__name__)
+
+# Table de suivi des migrations appliquées (hors des modèles de l'application)
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def add_columns(connection, table_name, columns):
+    """
+    Ajoute à une table existante les colonnes qui lui manquent
+
+    La base peut avoir été créée après la migration (create_all) : seules
+    les colonnes absentes sont ajoutées.
+
+    Args:
+        connection: Connexion SQLAlchemy (dans une transaction)
+        table_name (str): Nom de la table
+        columns (list): Tuples (nom, type SQL) des colonnes (nullables)
+    """
+    inspector = inspect(connection)
+    if table_name not in inspector.get_table_names():
+        return
+    existing = {column["name"] for column in inspector.get_columns(table_name)}
+    for name, column_type in columns:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+
+
+def execute_statements(connection, statements):
+    """Exécute une suite d'instructions SQL figées"""
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+# Le schéma de chaque migration est figé tel qu'il était à sa création :
+# les modèles peuvent évoluer sans modifier les migrations déjà appliquées.
+def _baseline_columns(connection):
+    # Colonnes ajoutées aux modèles avant l'existence des migrations
+    add_columns(connection, "setup_configurations", [("trial_number", "INTEGER"), ("updated_at", "TIMESTAMP")])
+    add_columns(connection, "optimization_sessions", [("study_name", "VARCHAR")])
+
+
+def _hot_path_indexes(connection):
+    execute_statements(connection, [
+        "CREATE INDEX IF NOT EXISTS ix_setup_car_track_generation "
+        "ON setup_configurations (car_id, track_id, generation_time)",
+        "CREATE INDEX IF NOT EXISTS ix_setup_car_track_status_score "
+        "ON setup_configurations (car_id, track_id, status, score)",
+        "CREATE INDEX IF NOT EXISTS ix_setup_session_status_generation "
+        "ON setup_configurations (optimization_session_id, status, generation_time)",
+        "CREATE INDEX IF NOT EXISTS ix_setup_status_generation ON setup_configurations (status, generation_time)",
+        "CREATE INDEX IF NOT EXISTS ix_telemetry_setup ON telemetry_results (setup_id)",
+        "CREATE INDEX IF NOT EXISTS ix_session_car_track_end ON optimization_sessions (car_id, track_id, end_time)",
+        "CREATE INDEX IF NOT EXISTS ix_session_end_start ON optimization_sessions (end_time, start_time)",
+    ])
+
+
+def _performance_summaries(connection):
+    # Résumé des performances de chaque setup, rempli depuis la télémétrie existante
+    execute_statements(connection, [
+        """CREATE TABLE IF NOT EXISTS performance_summaries (
+            setup_id INTEGER NOT NULL PRIMARY KEY REFERENCES setup_configurations (id),
+            car_id VARCHAR NOT NULL,
+            track_id VARCHAR NOT NULL,
+            generation_time TIMESTAMP,
+            lap_count INTEGER NOT NULL,
+            best_lap_time FLOAT,
+            mean_lap_time FLOAT,
+            score FLOAT,
+            updated_at TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_performance_car_track_generation "
+        "ON performance_summaries (car_id, track_id, generation_time)",
+        "DELETE FROM performance_summaries",
+    ])
+    connection.execute(text("""
+        INSERT INTO performance_summaries
+            (setup_id, car_id, track_id, generation_time, lap_count, best_lap_time, mean_lap_time, score, updated_at)
+        SELECT s.id, s.car_id, s.track_id, s.generation_time,
+               laps.lap_count, laps.best_lap_time, laps.mean_lap_time, s.score, :now
+        FROM setup_configurations s
+        JOIN (
+            SELECT setup_id, COUNT(id) AS lap_count, MIN(lap_time) AS best_lap_time, AVG(lap_time) AS mean_lap_time
+            FROM telemetry_results
+            GROUP BY setup_id
+        ) laps ON laps.setup_id = s.id
+    """).bindparams(bindparam("now", type_=DateTime)), {"now": datetime.utcnow()})
+
+
+def _setup_totals(connection):
+    # Totaux des listes de setups (pagination et ETag sans COUNT)
+    execute_statements(connection, [
+        """CREATE TABLE IF NOT EXISTS setup_totals (
+            car_id VARCHAR NOT NULL,
+            track_id VARCHAR NOT NULL,
+            setup_count INTEGER NOT NULL,
+            revision INTEGER NOT NULL,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (car_id, track_id)
+        )""",
+        "DELETE FROM setup_totals",
+    ])
+    connection.execute(text("""
+        INSERT INTO setup_totals (car_id, track_id, setup_count, revision, updated_at)
+        SELECT car_id, track_id, COUNT(id), 1, :now
+        FROM setup_configurations
+        GROUP BY car_id, track_id
+    """).bindparams(bindparam("now", type_=DateTime)), {"now": datetime.utcnow()})
+
+
+def _session_statistics(connection):
+    # Statistiques des sessions (statut sans COUNT ni tri)
+    execute_statements(connection, [
+        """CREATE TABLE IF NOT EXISTS session_statistics (
+            session_id INTEGER NOT NULL PRIMARY KEY REFERENCES optimization_sessions (id),
+            trials_completed INTEGER NOT NULL,
+            trials_pending INTEGER NOT NULL,
+            best_score FLOAT,
+            best_setup_id INTEGER REFERENCES setup_configurations (id),
+            updated_at TIMESTAMP
+        )""",
+        "DELETE FROM session_statistics",
+    ])
+    connection.execute(text("""
+        INSERT INTO session_statistics (session_id, trials_completed, trials_pending, updated_at)
+        SELECT o.id,
+               (SELECT COUNT(s.id) FROM setup_configurations s
+                WHERE s.optimization_session_id = o.id AND s.status = 'tested'),
+               (SELECT COUNT(s.id) FROM setup_configurations s
+                WHERE s.optimization_session_id = o.id AND s.status = 'pending'),
+               :now
+        FROM optimization_sessions o
+    """).bindparams(bindparam("now", type_=DateTime)), {"now": datetime.utcnow()})
+
+    # Meilleur setup testé de chaque session (à score égal, le plus ancien)
+    connection.execute(text("""
+        UPDATE session_statistics SET
+            best_setup_id = (
+                SELECT s.id FROM setup_configurations s
+                WHERE s.optimization_session_id = session_statistics.session_id
+                  AND s.status = 'tested' AND s.score IS NOT NULL
+                ORDER BY s.score DESC, s.id
+                LIMIT 1
+            ),
+            best_score = (
+                SELECT MAX(s.score) FROM setup_configurations s
+                WHERE s.optimization_session_id = session_statistics.session_id
+                  AND s.status = 'tested' AND s.score IS NOT NULL
+            )
+    """))
+
+
+def _session_archive(connection):
+    # Colonne archived_at des sessions et index des setups archivés
+    add_columns(connection, "optimization_sessions", [("archived_at", "TIMESTAMP")])
+    execute_statements(connection, [
+        """CREATE TABLE IF NOT EXISTS archived_setups (
+            setup_id INTEGER NOT NULL PRIMARY KEY,
+            session_id INTEGER NOT NULL REFERENCES optimization_sessions (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_archived_setups_session_id ON archived_setups (session_id)",
+    ])
+
+
+def _setup_leases(connection):
+    # Réservation des setups par les postes de test : colonnes et index de la file
+    add_columns(connection, "setup_configurations", [("claimed_by", "VARCHAR"), ("lease_expires_at", "TIMESTAMP")])
+    execute_statements(connection, [
+        "DROP INDEX IF EXISTS ix_setup_status_generation",
+        "CREATE INDEX IF NOT EXISTS ix_setup_status_lease_generation "
+        "ON setup_configurations (status, lease_expires_at, generation_time)",
+    ])
+
+
+def _worker_jobs(connection):
+    # Tâches du worker d'optimisation (suivi partagé entre les workers, reprise au démarrage)
+    execute_statements(connection, [
+        """CREATE TABLE IF NOT EXISTS worker_jobs (
+            id VARCHAR NOT NULL PRIMARY KEY,
+            task VARCHAR NOT NULL,
+            arguments JSON NOT NULL,
+            status VARCHAR NOT NULL,
+            owner VARCHAR,
+            result JSON,
+            error VARCHAR,
+            created_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_worker_job_status_created ON worker_jobs (status, created_at)",
+    ])
+
+
+def _session_direction(connection):
+    # Direction de l'étude de chaque session : le meilleur setup d'une minimisation a le plus petit score
+    add_columns(connection, "session_statistics", [("direction", "VARCHAR")])
+    sessions = connection.execute(
+        text("SELECT id, optimization_parameters FROM optimization_sessions")
+        .columns(optimization_parameters=JSON)
+    ).all()
+    minimized = [session_id for session_id, parameters in sessions
+                 if (parameters or {}).get("direction") == "minimize"]
+    execute_statements(connection, ["UPDATE session_statistics SET direction = 'maximize'"])
+    for session_id in minimized:
+        connection.execute(text("""
+            UPDATE session_statistics SET
+                direction = 'minimize',
+                best_setup_id = (
+                    SELECT s.id FROM setup_configurations s
+                    WHERE s.optimization_session_id = :session_id
+                      AND s.status = 'tested' AND s.score IS NOT NULL
+                    ORDER BY s.score, s.id
+                    LIMIT 1
+                ),
+                best_score = (
+                    SELECT MIN(s.score) FROM setup_configurations s
+                    WHERE s.optimization_session_id = :session_id
+                      AND s.status = 'tested' AND s.score IS NOT NULL
+                )
+            WHERE session_id = :session_id
+        """), {"session_id": session_id})
+
+
+# Migrations dans l'ordre d'application : (version, nom, fonction)
+# Une migration déjà appliquée ne doit jamais être modifiée : ajouter une nouvelle version.
+MIGRATIONS = [
+    (1, "baseline_columns", _baseline_columns),
+    (2, "hot_path_indexes", _hot_path_indexes),
+    (3, "performance_summaries", _performance_summaries),
+    (4, "setup_totals", _setup_totals),
+    (5, "session_statistics", _session_statistics),
+    (6, "session_archive", _session_archive),
+    (7, "setup_leases", _setup_leases),
+    (8, "worker_jobs", _worker_jobs),
+    (9, "session_direction", _session_direction),
+]
+
+
+def get_applied_versions(engine):
+    """Renvoie les versions de migration déjà appliquées"""
+    migration_metadata.create_all(engine)
+    with engine.connect() as connection:
+        return {row.version for row in connection.execute(select(schema_migrations.c.version))}
+
+
+def run_migrations(engine):
+    """
+    Applique les migrations en attente, chacune dans sa propre transaction
+
+    Returns:
+        list: Noms des migrations appliquées
+    """
+    applied = get_applied_versions(engine)
+    performed = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version,
+                name=name,
+                applied_at=datetime.utcnow()
+            ))
+        logger.info(f"Migration {version} appliquée: {name}")
+        performed.append(name)
+    return performed
+
+
+if __name__ == "__main__":
+    from src.storage.database import init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
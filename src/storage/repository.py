@@ -1,15 +1,219 @@
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, case, delete, func, insert, literal, or_, select, tuple_, update
 from sqlalchemy.exc import SQLAlchemyError
-from src.models.setup import SetupConfiguration, TelemetryResult, OptimizationSession
-from src.storage.database import get_session
-from src.config.constants import SETUP_STATUS
+from src.models.setup import (
+    SetupConfiguration, TelemetryResult, OptimizationSession, MetricStatistic, PerformanceSummary, SetupTotal,
+    SessionStatistics, IngestCheckpoint, WorkerJob
+)
+from src.storage.cache import TTLCache
+from src.storage.columnar import queue_telemetry, telemetry_columns
+from src.storage.database import get_session, router
+from src.storage.shards import DEFAULT_SHARD
+from src.config.constants import SETUP_STATUS, JOB_STATUS
+from src.config.settings import SESSION_STATUS_CACHE_TTL, COLUMNAR_TELEMETRY, SETUP_LEASE_SECONDS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Statut des sessions (sondé en continu par le tableau de bord)
+_session_status_cache = TTLCache(SESSION_STATUS_CACHE_TTL)
+
+# Tentatives de réservation d'un setup (un autre poste peut prendre le candidat entre-temps)
+CLAIM_ATTEMPTS = 5
+
+def _first_across_shards(query, key, reverse=False):
+    """
+    Premier résultat d'une requête triée, toutes bases confondues
+    
+    Chaque shard renvoie son premier résultat (les résultats des shards sont mis bout
+    à bout, pas fusionnés dans l'ordre) : le tri est refait sur ces candidats.
+    
+    Args:
+        query: Requête triée
+        key (callable): Clé de tri d'un résultat
+        reverse (bool): Tri décroissant
+    """
+    rows = query.limit(1).all()
+    if not rows:
+        return None
+    return sorted(rows, key=key, reverse=reverse)[0]
+
+def _lock_for_update(db, shard_id=DEFAULT_SHARD):
+    """
+    Prend le verrou d'écriture d'une base avant une lecture suivie d'une mise à jour
+    
+    SQLite n'a pas de verrou de ligne (SELECT ... FOR UPDATE est ignoré) : la transaction
+    est ouverte par BEGIN IMMEDIATE, un seul worker lit et écrit à la fois. Une transaction
+    déjà ouverte (écriture précédente de la requête) détient déjà ce verrou.
+    
+    Args:
+        db: Session de base de données
+        shard_id (str): Shard lu puis modifié
+    """
+    connection = db.connection(bind_arguments={"shard_id": shard_id})
+    if connection.dialect.name == "sqlite" and not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def _touch_setup_totals(db, car_tracks, added=0):
+    """
+    Met à jour le total et la révision des listes de setups (dans la transaction en cours)
+    
+    Args:
+        db: Session de base de données
+        car_tracks (iterable): Couples (car_id, track_id) modifiés
+        added (int): Nombre de setups ajoutés à chaque liste
+    """
+    for car_id, track_id in set(car_tracks):
+        result = db.execute(
+            update(SetupTotal)
+            .where(SetupTotal.car_id == car_id, SetupTotal.track_id == track_id)
+            .values(setup_count=SetupTotal.setup_count + added,
+                    revision=SetupTotal.revision + 1,
+                    updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.add(SetupTotal(car_id=car_id, track_id=track_id, setup_count=added, revision=1))
+            db.flush()
+
+def _status_deltas(old_status, new_status):
+    """Variation des compteurs (en attente, terminés) d'une session lors d'un changement de statut"""
+    pending = completed = 0
+    if old_status == SETUP_STATUS["PENDING"]:
+        pending -= 1
+    if new_status == SETUP_STATUS["PENDING"]:
+        pending += 1
+    if old_status == SETUP_STATUS["TESTED"]:
+        completed -= 1
+    if new_status == SETUP_STATUS["TESTED"]:
+        completed += 1
+    return pending, completed
+
+def _update_session_statistics(db, session_id, pending=0, completed=0, score=None, setup_id=None):
+    """
+    Met à jour les statistiques d'une session (dans la transaction en cours)
+    
+    Args:
+        db: Session de base de données
+        session_id (int): ID de la session d'optimisation (ignoré si None)
+        pending (int): Variation du nombre de setups en attente
+        completed (int): Variation du nombre de setups testés
+        score (float): Nouveau score d'un setup, retenu s'il améliore le meilleur score
+                       (plus petit pour une session en minimisation)
+        setup_id (int): ID du setup noté
+    """
+    if session_id is None:
+        return
+    
+    values = {
+        "trials_pending": SessionStatistics.trials_pending + pending,
+        "trials_completed": SessionStatistics.trials_completed + completed,
+        "updated_at": datetime.utcnow()
+    }
+    if score is not None:
+        improves = or_(
+            SessionStatistics.best_score.is_(None),
+            case((SessionStatistics.direction == "minimize", SessionStatistics.best_score > score),
+                 else_=SessionStatistics.best_score < score)
+        )
+        values["best_setup_id"] = case((improves, setup_id), else_=SessionStatistics.best_setup_id)
+        values["best_score"] = case((improves, score), else_=SessionStatistics.best_score)
+    
+    result = db.execute(
+        update(SessionStatistics)
+        .where(SessionStatistics.session_id == session_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(SessionStatistics(session_id=session_id, trials_pending=max(pending, 0),
+                                 trials_completed=max(completed, 0), best_score=score,
+                                 best_setup_id=setup_id if score is not None else None))
+        db.flush()
+    _session_status_cache.invalidate(session_id)
+
+def _archive_laps(db, telemetry_rows, setups):
+    """
+    Programme l'écriture des tours dans l'archive colonnaire (après le commit)
+    
+    Args:
+        db: Session de base de données
+        telemetry_rows (list): Télémétries enregistrées (IDs attribués)
+        setups (dict): Setups indexés par ID
+    """
+    if not COLUMNAR_TELEMETRY:
+        return
+    for telemetry in telemetry_rows:
+        setup = setups.get(telemetry.setup_id)
+        if setup is None:
+            continue
+        queue_telemetry(db, setup.car_id, setup.track_id, telemetry_columns(
+            telemetry.id, telemetry.setup_id, telemetry.lap_time, telemetry.submission_time,
+            telemetry.telemetry_data, telemetry.weather_conditions, setup.setup_parameters
+        ))
+
+def _record_laps(db, laps, scores=None):
+    """
+    Met à jour les résumés de performance avec de nouveaux tours (dans la transaction en cours)
+    
+    Args:
+        db: Session de base de données
+        laps (list): Tuples (setup_id, lap_time) dans l'ordre de réception
+        scores (dict): Scores des setups à reporter dans les résumés
+    """
+    setup_ids = {setup_id for setup_id, _ in laps}
+    summaries = {
+        summary.setup_id: summary
+        for summary in db.query(PerformanceSummary).filter(PerformanceSummary.setup_id.in_(list(setup_ids)))
+    }
+    
+    # Premier tour d'un setup : crée son résumé
+    missing = setup_ids - summaries.keys()
+    if missing:
+        rows = db.query(SetupConfiguration.id, SetupConfiguration.car_id, SetupConfiguration.track_id,
+                        SetupConfiguration.generation_time)\
+            .filter(SetupConfiguration.id.in_(list(missing)))
+        for setup_id, car_id, track_id, generation_time in rows:
+            summary = PerformanceSummary(setup_id=setup_id, car_id=car_id, track_id=track_id,
+                                         generation_time=generation_time, lap_count=0)
+            db.add(summary)
+            summaries[setup_id] = summary
+    
+    for setup_id, lap_time in laps:
+        summary = summaries.get(setup_id)
+        if summary is None:
+            continue
+        count = summary.lap_count or 0
+        summary.mean_lap_time = lap_time if count == 0 else (summary.mean_lap_time * count + lap_time) / (count + 1)
+        summary.best_lap_time = lap_time if summary.best_lap_time is None else min(summary.best_lap_time, lap_time)
+        summary.lap_count = count + 1
+    
+    for setup_id, score in (scores or {}).items():
+        if score is not None and setup_id in summaries:
+            summaries[setup_id].score = score
+
+def _reserve_setup(db, setup_id, rig_id, expires, condition):
+    """
+    Réserve un setup encore en attente si la condition est remplie (mise à jour conditionnelle)
+    
+    Returns:
+        bool: True si le setup a été réservé par ce poste
+    """
+    setups = SetupConfiguration.__table__
+    result = db.execute(
+        update(setups)
+        .where(setups.c.id == setup_id, setups.c.status == SETUP_STATUS["PENDING"], condition)
+        .values(claimed_by=rig_id, lease_expires_at=expires),
+        bind_arguments={"shard_id": router.shard_for_id(setup_id)}
+    )
+    return result.rowcount == 1
+
 class SetupRepository:
     @staticmethod
-    def create_setup(car_id, track_id, setup_parameters, status, source, optimization_session_id=None):
+    def create_setup(car_id, track_id, setup_parameters, status, source, optimization_session_id=None,
+                     trial_number=None):
         """Crée un nouveau setup dans la base de données"""
+        router.register_program(car_id, track_id)
         db = get_session()
         try:
             setup = SetupConfiguration(
@@ -18,9 +222,13 @@ class SetupRepository:
                 setup_parameters=setup_parameters,
                 status=status,
                 source=source,
-                optimization_session_id=optimization_session_id
+                optimization_session_id=optimization_session_id,
+                trial_number=trial_number
             )
             db.add(setup)
+            _touch_setup_totals(db, [(car_id, track_id)], added=1)
+            pending, completed = _status_deltas(None, status)
+            _update_session_statistics(db, optimization_session_id, pending, completed)
             db.commit()
             return setup.id
         except SQLAlchemyError as e:
@@ -49,9 +257,16 @@ class SetupRepository:
         try:
             setup = db.query(SetupConfiguration).filter(SetupConfiguration.id == setup_id).first()
             if setup:
+                pending, completed = _status_deltas(setup.status, status)
                 setup.status = status
                 if score is not None:
                     setup.score = score
+                    summary = db.get(PerformanceSummary, setup_id)
+                    if summary is not None:
+                        summary.score = score
+                _touch_setup_totals(db, [(setup.car_id, setup.track_id)])
+                _update_session_statistics(db, setup.optimization_session_id, pending, completed,
+                                           score, setup_id)
                 db.commit()
                 return True
             return False
@@ -63,20 +278,369 @@ class SetupRepository:
             db.close()
     
     @staticmethod
-    def get_pending_setup():
-        """Récupère le prochain setup en attente de test"""
+    def get_setups_after(car_id, track_id, cursor=None, limit=10):
+        """
+        Récupère une page de setups (plus récents d'abord) par clé de pagination
+        
+        Le coût est le même quelle que soit la profondeur de la page : la requête
+        reprend l'index (car_id, track_id, generation_time) juste après le curseur.
+        
+        Args:
+            cursor (tuple): (generation_time, id) du dernier setup de la page précédente
+            limit (int): Taille de la page
+            
+        Returns:
+            tuple: (liste des setups, curseur du dernier setup ou None s'il n'y a pas de page suivante)
+        """
+        db = get_session()
+        try:
+            query = db.query(SetupConfiguration).filter(
+                SetupConfiguration.car_id == car_id,
+                SetupConfiguration.track_id == track_id
+            )
+            if cursor is not None:
+                query = query.filter(tuple_(SetupConfiguration.generation_time, SetupConfiguration.id) < tuple(cursor))
+            setups = query.order_by(SetupConfiguration.generation_time.desc(), SetupConfiguration.id.desc())\
+                .limit(limit + 1)\
+                .all()
+            
+            # Une ligne de plus que demandé indique l'existence d'une page suivante
+            next_cursor = None
+            if len(setups) > limit:
+                setups = setups[:limit]
+                next_cursor = (setups[-1].generation_time, setups[-1].id)
+            return setups, next_cursor
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des setups: {str(e)}")
+            return [], None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_setups_page(car_id, track_id, page=1, page_size=10):
+        """
+        Récupère une page de setups par numéro de page (pagination historique par décalage)
+        
+        Returns:
+            list: Setups de la page (plus récents d'abord)
+        """
+        db = get_session()
+        try:
+            return db.query(SetupConfiguration).filter(
+                SetupConfiguration.car_id == car_id,
+                SetupConfiguration.track_id == track_id
+            ).order_by(SetupConfiguration.generation_time.desc(), SetupConfiguration.id.desc())\
+                .offset((page - 1) * page_size)\
+                .limit(page_size)\
+                .all()
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des setups: {str(e)}")
+            return []
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_setups_version(car_id, track_id):
+        """
+        Nombre de setups et révision de la liste d'une voiture et d'une piste (lecture par clé primaire)
+        
+        Returns:
+            tuple: (nombre de setups, révision), (0, 0) si aucun setup
+        """
+        db = get_session()
+        try:
+            totals = db.get(SetupTotal, (car_id, track_id))
+            if totals is None:
+                return 0, 0
+            return totals.setup_count, totals.revision
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors du calcul de la version des setups: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_trial_numbers(setup_ids):
+        """Récupère les numéros de trial Optuna associés à des setups"""
+        db = get_session()
+        try:
+            rows = db.query(SetupConfiguration.id, SetupConfiguration.trial_number)\
+                .filter(SetupConfiguration.id.in_(list(setup_ids)),
+                        SetupConfiguration.trial_number.isnot(None))\
+                .all()
+            return {setup_id: trial_number for setup_id, trial_number in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des numéros de trial: {str(e)}")
+            return {}
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_session_ids(setup_ids):
+        """Récupère la session d'optimisation de chaque setup"""
+        db = get_session()
+        try:
+            rows = db.query(SetupConfiguration.id, SetupConfiguration.optimization_session_id)\
+                .filter(SetupConfiguration.id.in_(list(setup_ids)))\
+                .all()
+            return {setup_id: session_id for setup_id, session_id in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des sessions des setups: {str(e)}")
+            return {}
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_car_tracks(setup_ids):
+        """Récupère la voiture et le circuit de chaque setup"""
+        db = get_session()
+        try:
+            rows = db.query(SetupConfiguration.id, SetupConfiguration.car_id, SetupConfiguration.track_id)\
+                .filter(SetupConfiguration.id.in_(list(setup_ids)))\
+                .all()
+            return {setup_id: (car_id, track_id) for setup_id, car_id, track_id in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des voitures et circuits des setups: {str(e)}")
+            return {}
+        finally:
+            db.close()
+    
+    @staticmethod
+    def update_scores(scores):
+        """
+        Met à jour le score de plusieurs setups en une seule requête groupée
+        
+        Args:
+            scores (dict): Scores indexés par ID de setup
+            
+        Returns:
+            int: Nombre de setups mis à jour (None si erreur)
+        """
         db = get_session()
         try:
+            if scores:
+                # Une requête groupée par base : les IDs désignent leur shard
+                setups = SetupConfiguration.__table__
+                summaries = PerformanceSummary.__table__
+                for shard_id, setup_ids in router.group_ids(scores).items():
+                    bind_arguments = {"shard_id": shard_id}
+                    db.execute(
+                        update(setups)
+                        .where(setups.c.id == bindparam("setup_id"))
+                        .values(score=bindparam("setup_score")),
+                        [{"setup_id": setup_id, "setup_score": scores[setup_id]} for setup_id in setup_ids],
+                        bind_arguments=bind_arguments
+                    )
+                    db.execute(
+                        update(summaries)
+                        .where(summaries.c.setup_id == bindparam("summary_setup_id"))
+                        .values(score=bindparam("summary_score"), updated_at=datetime.utcnow()),
+                        [{"summary_setup_id": setup_id, "summary_score": scores[setup_id]} for setup_id in setup_ids],
+                        bind_arguments=bind_arguments
+                    )
+                car_tracks = db.query(SetupConfiguration.car_id, SetupConfiguration.track_id)\
+                    .filter(SetupConfiguration.id.in_(list(scores)))\
+                    .distinct()\
+                    .all()
+                _touch_setup_totals(db, [tuple(car_track) for car_track in car_tracks])
+                
+                # Les scores peuvent baisser : recalcule le meilleur setup des sessions concernées
+                session_ids = db.query(SetupConfiguration.optimization_session_id)\
+                    .filter(SetupConfiguration.id.in_(list(scores)),
+                            SetupConfiguration.optimization_session_id.isnot(None))\
+                    .distinct()\
+                    .all()
+                for (session_id,) in session_ids:
+                    direction = db.query(SessionStatistics.direction)\
+                        .filter(SessionStatistics.session_id == session_id)\
+                        .scalar()
+                    best_first = SetupConfiguration.score.asc() if direction == "minimize" \
+                        else SetupConfiguration.score.desc()
+                    best = db.query(SetupConfiguration.id, SetupConfiguration.score)\
+                        .filter(SetupConfiguration.optimization_session_id == session_id,
+                                SetupConfiguration.status == SETUP_STATUS["TESTED"],
+                                SetupConfiguration.score.isnot(None))\
+                        .order_by(best_first, SetupConfiguration.id)\
+                        .first()
+                    db.execute(
+                        update(SessionStatistics)
+                        .where(SessionStatistics.session_id == session_id)
+                        .values(best_setup_id=best[0] if best else None,
+                                best_score=best[1] if best else None,
+                                updated_at=datetime.utcnow())
+                        .execution_options(synchronize_session=False)
+                    )
+                    _session_status_cache.invalidate(session_id)
+            db.commit()
+            return len(scores)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la mise à jour des scores: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_pending_setup(optimization_session_id=None):
+        """Récupère le prochain setup en attente de test et non réservé (éventuellement pour une session)"""
+        db = get_session()
+        try:
+            query = db.query(SetupConfiguration)\
+                .filter(SetupConfiguration.status == SETUP_STATUS["PENDING"],
+                        SetupConfiguration.lease_expires_at.is_(None))
+            if optimization_session_id is not None:
+                query = query.filter(SetupConfiguration.optimization_session_id == optimization_session_id)
+            return _first_across_shards(query.order_by(SetupConfiguration.generation_time),
+                                        key=lambda setup: setup.generation_time)
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération du setup en attente: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def claim_setup(rig_id, optimization_session_id=None, lease_seconds=SETUP_LEASE_SECONDS):
+        """
+        Réserve le prochain setup en attente pour un poste de test
+        
+        La réservation est une mise à jour conditionnelle (setup en attente et non réservé) :
+        deux postes qui interrogent la file en même temps obtiennent des setups différents.
+        Un poste qui détient déjà une réservation en cours la retrouve, prolongée.
+        
+        Args:
+            rig_id (str): Identifiant du poste de test
+            optimization_session_id (int): ID de la session (None = toutes les sessions)
+            lease_seconds (int): Durée de la réservation (secondes)
+            
+        Returns:
+            SetupConfiguration: Setup réservé, None si aucun setup n'est disponible
+        """
+        db = get_session()
+        try:
+            now = datetime.utcnow()
+            expires = now + timedelta(seconds=lease_seconds)
+            query = db.query(SetupConfiguration.id, SetupConfiguration.generation_time)\
+                .filter(SetupConfiguration.status == SETUP_STATUS["PENDING"])
+            if optimization_session_id is not None:
+                query = query.filter(SetupConfiguration.optimization_session_id == optimization_session_id)
+            query = query.order_by(SetupConfiguration.generation_time)
+            
+            setups = SetupConfiguration.__table__
+            claimed_id = None
+            held = _first_across_shards(
+                query.filter(SetupConfiguration.claimed_by == rig_id, SetupConfiguration.lease_expires_at > now),
+                key=lambda row: row.generation_time
+            )
+            if held is not None and _reserve_setup(db, held.id, rig_id, expires, setups.c.claimed_by == rig_id):
+                claimed_id = held.id
+            
+            for _ in range(CLAIM_ATTEMPTS if claimed_id is None else 0):
+                candidate = _first_across_shards(query.filter(SetupConfiguration.lease_expires_at.is_(None)),
+                                                 key=lambda row: row.generation_time)
+                if candidate is None:
+                    break
+                if _reserve_setup(db, candidate.id, rig_id, expires, setups.c.lease_expires_at.is_(None)):
+                    claimed_id = candidate.id
+                    break
+            
+            db.commit()
+            if claimed_id is None:
+                return None
             return db.query(SetupConfiguration)\
-                .filter(SetupConfiguration.status == SETUP_STATUS["PENDING"])\
-                .order_by(SetupConfiguration.generation_time)\
+                .populate_existing()\
+                .filter(SetupConfiguration.id == claimed_id)\
                 .first()
         except SQLAlchemyError as e:
-            logger.error(f"Erreur lors de la récupération du setup en attente: {str(e)}")
+            db.rollback()
+            logger.error(f"Erreur lors de la réservation d'un setup: {str(e)}")
             return None
         finally:
             db.close()
     
+    @staticmethod
+    def renew_lease(setup_id, rig_id, lease_seconds=SETUP_LEASE_SECONDS):
+        """
+        Prolonge la réservation d'un setup par son poste de test (relais plus long que prévu)
+        
+        Returns:
+            datetime: Nouvelle fin de réservation, None si le setup n'est plus réservé par ce poste
+        """
+        db = get_session()
+        try:
+            expires = datetime.utcnow() + timedelta(seconds=lease_seconds)
+            setups = SetupConfiguration.__table__
+            renewed = _reserve_setup(db, setup_id, rig_id, expires, setups.c.claimed_by == rig_id)
+            db.commit()
+            return expires if renewed else None
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la prolongation de la réservation: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def release_expired_leases():
+        """
+        Remet en file les setups dont la réservation a expiré (poste arrêté ou déconnecté)
+        
+        Returns:
+            int: Nombre de setups remis en file (None si erreur)
+        """
+        db = get_session()
+        try:
+            setups = SetupConfiguration.__table__
+            statement = update(setups)\
+                .where(setups.c.status == SETUP_STATUS["PENDING"],
+                       setups.c.lease_expires_at < datetime.utcnow())\
+                .values(claimed_by=None, lease_expires_at=None)
+            released = sum(
+                db.execute(statement, bind_arguments={"shard_id": shard_id}).rowcount
+                for shard_id in router.shard_ids()
+            )
+            db.commit()
+            return released
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la remise en file des réservations expirées: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def count_pending_setups(optimization_session_id):
+        """Compte les setups en attente de test et non réservés pour une session d'optimisation"""
+        db = get_session()
+        try:
+            # func.count plutôt que Query.count() : la sous-requête de count() perd le critère
+            # de session et serait envoyée à toutes les bases
+            return db.query(func.count(SetupConfiguration.id))\
+                .filter(SetupConfiguration.optimization_session_id == optimization_session_id,
+                        SetupConfiguration.status == SETUP_STATUS["PENDING"],
+                        SetupConfiguration.lease_expires_at.is_(None))\
+                .scalar()
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors du comptage des setups en attente: {str(e)}")
+            return 0
+        finally:
+            db.close()
+    
+    @staticmethod
+    def count_setups_by_status(optimization_session_id):
+        """Compte les setups d'une session d'optimisation par statut"""
+        db = get_session()
+        try:
+            rows = db.query(SetupConfiguration.status, func.count(SetupConfiguration.id))\
+                .filter(SetupConfiguration.optimization_session_id == optimization_session_id)\
+                .group_by(SetupConfiguration.status)\
+                .all()
+            return {status: count for status, count in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors du comptage des setups: {str(e)}")
+            return {}
+        finally:
+            db.close()
+    
     @staticmethod
     def get_best_setups(car_id, track_id, limit=5):
         """Récupère les meilleurs setups pour une voiture et une piste données"""
@@ -96,6 +660,33 @@ class SetupRepository:
         finally:
             db.close()
 
+    @staticmethod
+    def get_scored_setups(car_id, track_id, limit=None):
+        """
+        Récupère les paramètres et scores des setups testés pour une voiture et une piste
+        
+        Returns:
+            list: Tuples (id, paramètres, score), du meilleur score au moins bon
+        """
+        db = get_session()
+        try:
+            query = db.query(SetupConfiguration.id,
+                             SetupConfiguration.setup_parameters,
+                             SetupConfiguration.score)\
+                .filter(SetupConfiguration.car_id == car_id,
+                        SetupConfiguration.track_id == track_id,
+                        SetupConfiguration.status == SETUP_STATUS["TESTED"],
+                        SetupConfiguration.score.isnot(None))\
+                .order_by(SetupConfiguration.score.desc(), SetupConfiguration.id)
+            if limit:
+                query = query.limit(limit)
+            return [tuple(row) for row in query.all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération de l'historique des setups: {str(e)}")
+            return []
+        finally:
+            db.close()
+
 
 class TelemetryRepository:
     @staticmethod
@@ -111,6 +702,9 @@ class TelemetryRepository:
                 driver_notes=driver_notes
             )
             db.add(telemetry)
+            _record_laps(db, [(setup_id, lap_time)])
+            db.flush()
+            _archive_laps(db, [telemetry], {setup_id: db.get(SetupConfiguration, setup_id)})
             db.commit()
             return telemetry.id
         except SQLAlchemyError as e:
@@ -120,6 +714,74 @@ class TelemetryRepository:
         finally:
             db.close()
     
+    @staticmethod
+    def save_telemetry_batch(records, ingest_checkpoint=None):
+        """
+        Enregistre un lot de télémétrie et met à jour les setups associés
+        dans une seule transaction
+
+        Args:
+            records (list): Dictionnaires contenant setup_id, lap_time, telemetry_data,
+                            weather_conditions, driver_notes et score
+            ingest_checkpoint (tuple): (flux, séquence) du journal d'ingestion à enregistrer
+                                       dans la même transaction
+
+        Returns:
+            list: IDs des télémétries enregistrées (dans l'ordre du lot) ou None si erreur
+        """
+        db = get_session()
+        try:
+            telemetry_rows = [
+                TelemetryResult(
+                    setup_id=record["setup_id"],
+                    lap_time=record["lap_time"],
+                    telemetry_data=record["telemetry_data"],
+                    weather_conditions=record.get("weather_conditions"),
+                    driver_notes=record.get("driver_notes")
+                )
+                for record in records
+            ]
+            db.add_all(telemetry_rows)
+
+            # Le dernier tour reçu pour un setup fait foi, comme pour l'envoi unitaire
+            scores = {record["setup_id"]: record.get("score") for record in records}
+            setups = db.query(SetupConfiguration)\
+                .filter(SetupConfiguration.id.in_(list(scores)))\
+                .all()
+            for setup in setups:
+                if setup.status == SETUP_STATUS["DISCARDED"]:
+                    # Setup élagué pendant son relais : le tour est conservé, pas le score
+                    scores[setup.id] = None
+                    continue
+                pending, completed = _status_deltas(setup.status, SETUP_STATUS["TESTED"])
+                setup.status = SETUP_STATUS["TESTED"]
+                if scores[setup.id] is not None:
+                    setup.score = scores[setup.id]
+                _update_session_statistics(db, setup.optimization_session_id, pending, completed,
+                                           scores[setup.id], setup.id)
+            _record_laps(db, [(record["setup_id"], record["lap_time"]) for record in records], scores)
+            _touch_setup_totals(db, [(setup.car_id, setup.track_id) for setup in setups])
+            if ingest_checkpoint is not None:
+                # Point de reprise enregistré dans chaque base écrite par le lot
+                stream, sequence = ingest_checkpoint
+                for shard_id in router.group_ids(scores):
+                    bind_arguments = {"shard_id": shard_id}
+                    db.execute(delete(IngestCheckpoint).where(IngestCheckpoint.stream == stream),
+                               bind_arguments=bind_arguments)
+                    db.execute(insert(IngestCheckpoint.__table__), [{"stream": stream, "sequence": sequence}],
+                               bind_arguments=bind_arguments)
+            db.flush()
+            _archive_laps(db, telemetry_rows, {setup.id: setup for setup in setups})
+
+            db.commit()
+            return [telemetry.id for telemetry in telemetry_rows]
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de l'enregistrement du lot de télémétrie: {str(e)}")
+            return None
+        finally:
+            db.close()
+
     @staticmethod
     def get_telemetry_for_setup(setup_id):
         """Récupère la télémétrie pour un setup donné"""
@@ -131,21 +793,513 @@ class TelemetryRepository:
             return []
         finally:
             db.close()
+    
+    @staticmethod
+    def get_telemetry_by_id(telemetry_id):
+        """Récupère un tour par son ID"""
+        db = get_session()
+        try:
+            return db.query(TelemetryResult).filter(TelemetryResult.id == telemetry_id).first()
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération du tour: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_telemetry_version(setup_id):
+        """
+        Version de la télémétrie d'un setup (pour l'ETag)
+        
+        Returns:
+            tuple: (nombre de tours, dernier ID)
+        """
+        db = get_session()
+        try:
+            count, max_id = db.query(func.count(TelemetryResult.id), func.max(TelemetryResult.id))\
+                .filter(TelemetryResult.setup_id == setup_id)\
+                .one()
+            return count, max_id
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors du calcul de la version de la télémétrie: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def iter_metric_history(batch_size=1000):
+        """
+        Parcourt toute la télémétrie enregistrée en une passe, par lots
+        
+        Yields:
+            tuple: (car_id, track_id, telemetry_data) dans l'ordre d'enregistrement
+        """
+        db = get_session()
+        try:
+            rows = db.query(SetupConfiguration.car_id, SetupConfiguration.track_id, TelemetryResult.telemetry_data)\
+                .join(SetupConfiguration, TelemetryResult.setup_id == SetupConfiguration.id)\
+                .order_by(TelemetryResult.id)\
+                .yield_per(batch_size)
+            for row in rows:
+                yield row
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors du parcours de la télémétrie: {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def iter_telemetry_with_setups(batch_size=1000):
+        """
+        Parcourt toute la télémétrie avec son setup, par lots (reconstruction de l'archive)
+        
+        Yields:
+            tuple: (TelemetryResult, SetupConfiguration) dans l'ordre d'enregistrement
+        """
+        db = get_session()
+        try:
+            rows = db.query(TelemetryResult, SetupConfiguration)\
+                .join(SetupConfiguration, TelemetryResult.setup_id == SetupConfiguration.id)\
+                .order_by(TelemetryResult.id)\
+                .yield_per(batch_size)
+            for row in rows:
+                yield row
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors du parcours de la télémétrie: {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_metric_rows(car_id, track_id):
+        """
+        Récupère la télémétrie d'une voiture et d'une piste, dans l'ordre d'enregistrement
+        
+        Returns:
+            list: Tuples (setup_id, statut du setup, telemetry_data)
+        """
+        db = get_session()
+        try:
+            return db.query(TelemetryResult.setup_id, SetupConfiguration.status, TelemetryResult.telemetry_data)\
+                .join(SetupConfiguration, TelemetryResult.setup_id == SetupConfiguration.id)\
+                .filter(SetupConfiguration.car_id == car_id, SetupConfiguration.track_id == track_id)\
+                .order_by(TelemetryResult.id)\
+                .all()
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération de la télémétrie: {str(e)}")
+            return []
+        finally:
+            db.close()
+
+
+class IngestRepository:
+    @staticmethod
+    def get_committed(stream):
+        """
+        Tours d'un flux du journal d'ingestion déjà validés en base
+        
+        Chaque base écrite par un lot garde la dernière séquence du flux qu'elle a validée :
+        un tour est validé si sa séquence ne dépasse pas celle de la base de son setup.
+        
+        Returns:
+            callable: committed(séquence, tour) -> bool (None si erreur)
+        """
+        db = get_session()
+        try:
+            checkpoints = {}
+            for shard_id in router.shard_ids():
+                sequence = db.execute(
+                    select(IngestCheckpoint.sequence).where(IngestCheckpoint.stream == stream),
+                    bind_arguments={"shard_id": shard_id}
+                ).scalar()
+                checkpoints[shard_id] = sequence or 0
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la lecture du point de reprise: {str(e)}")
+            return None
+        finally:
+            db.close()
+        
+        def committed(sequence, record):
+            return sequence <= checkpoints.get(router.shard_for_id(record.get("setup_id")), 0)
+        return committed
+    
+    @staticmethod
+    def clear_checkpoint(stream):
+        """Supprime le point de reprise d'un flux entièrement rejoué"""
+        db = get_session()
+        try:
+            for shard_id in router.shard_ids():
+                db.execute(delete(IngestCheckpoint).where(IngestCheckpoint.stream == stream),
+                           bind_arguments={"shard_id": shard_id})
+            db.commit()
+            return True
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la suppression du point de reprise: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+
+class JobRepository:
+    """Tâches du worker d'optimisation (base par défaut : une tâche n'appartient à aucune voiture)"""
+    
+    @staticmethod
+    def create_job(job_id, task, arguments, owner):
+        """
+        Enregistre une tâche en attente
+        
+        Args:
+            job_id (str): Identifiant de la tâche
+            task (str): Nom de la tâche enregistrée auprès du worker
+            arguments (dict): Arguments de la tâche (sérialisables en JSON)
+            owner (str): Processus qui exécute la tâche
+            
+        Returns:
+            bool: True si succès, False sinon
+        """
+        db = get_session()
+        try:
+            db.execute(
+                insert(WorkerJob).values(
+                    id=job_id, task=task, arguments=arguments, status=JOB_STATUS["QUEUED"],
+                    owner=owner, created_at=datetime.utcnow()
+                ),
+                bind_arguments={"shard_id": DEFAULT_SHARD}
+            )
+            db.commit()
+            return True
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de l'enregistrement de la tâche: {str(e)}")
+            return False
+        finally:
+            db.close()
+    
+    @staticmethod
+    def update_job(job_id, status, result=None, error=None):
+        """Met à jour le statut d'une tâche (et son résultat une fois terminée)"""
+        db = get_session()
+        try:
+            values = {"status": status}
+            if status in (JOB_STATUS["DONE"], JOB_STATUS["FAILED"]):
+                values.update(result=result, error=error, finished_at=datetime.utcnow())
+            db.execute(
+                update(WorkerJob).where(WorkerJob.id == job_id).values(**values),
+                bind_arguments={"shard_id": DEFAULT_SHARD}
+            )
+            db.commit()
+            return True
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la mise à jour de la tâche: {str(e)}")
+            return False
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_job(job_id):
+        """Récupère une tâche par son ID"""
+        db = get_session()
+        try:
+            return db.execute(
+                select(WorkerJob).where(WorkerJob.id == job_id),
+                bind_arguments={"shard_id": DEFAULT_SHARD}
+            ).scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération de la tâche: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_unfinished_jobs():
+        """
+        Récupère les tâches en attente ou en cours, des plus anciennes aux plus récentes
+        
+        Returns:
+            list: Tuples (id, tâche, arguments, processus)
+        """
+        db = get_session()
+        try:
+            rows = db.execute(
+                select(WorkerJob.id, WorkerJob.task, WorkerJob.arguments, WorkerJob.owner)
+                .where(WorkerJob.status.in_([JOB_STATUS["QUEUED"], JOB_STATUS["RUNNING"]]))
+                .order_by(WorkerJob.status, WorkerJob.created_at),
+                bind_arguments={"shard_id": DEFAULT_SHARD}
+            ).all()
+            return [tuple(row) for row in rows]
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des tâches inachevées: {str(e)}")
+            return []
+        finally:
+            db.close()
+    
+    @staticmethod
+    def claim_job(job_id, previous_owner, owner):
+        """
+        Reprend une tâche inachevée d'un processus arrêté
+        
+        La mise à jour est conditionnée au processus précédent : deux workers qui
+        démarrent en même temps ne reprennent pas la même tâche.
+        
+        Returns:
+            bool: True si la tâche a été reprise par ce processus
+        """
+        db = get_session()
+        try:
+            claimed = db.execute(
+                update(WorkerJob)
+                .where(WorkerJob.id == job_id,
+                       WorkerJob.owner == previous_owner,
+                       WorkerJob.status.in_([JOB_STATUS["QUEUED"], JOB_STATUS["RUNNING"]]))
+                .values(owner=owner, status=JOB_STATUS["QUEUED"]),
+                bind_arguments={"shard_id": DEFAULT_SHARD}
+            ).rowcount
+            db.commit()
+            return claimed == 1
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la reprise de la tâche: {str(e)}")
+            return False
+        finally:
+            db.close()
+    
+    @staticmethod
+    def delete_finished_jobs(before):
+        """
+        Supprime les tâches terminées avant une date
+        
+        Returns:
+            int: Nombre de tâches supprimées (None si erreur)
+        """
+        db = get_session()
+        try:
+            deleted = db.execute(
+                delete(WorkerJob)
+                .where(WorkerJob.status.in_([JOB_STATUS["DONE"], JOB_STATUS["FAILED"]]),
+                       WorkerJob.created_at < before),
+                bind_arguments={"shard_id": DEFAULT_SHARD}
+            ).rowcount
+            db.commit()
+            return deleted
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la purge des tâches terminées: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+
+class MetricStatisticsRepository:
+    @staticmethod
+    def get_statistics(car_id, track_id):
+        """Récupère les statistiques des métriques pour une voiture et une piste"""
+        db = get_session()
+        try:
+            rows = db.query(MetricStatistic)\
+                .filter(MetricStatistic.car_id == car_id,
+                        MetricStatistic.track_id == track_id)\
+                .all()
+            return {row.metric: row.statistics for row in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des statistiques: {str(e)}")
+            return {}
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_car_statistics(car_id):
+        """Récupère les statistiques des métriques de tous les circuits d'une voiture"""
+        db = get_session()
+        try:
+            rows = db.query(MetricStatistic)\
+                .filter(MetricStatistic.car_id == car_id)\
+                .all()
+            statistics = {}
+            for row in rows:
+                statistics.setdefault(row.track_id, {})[row.metric] = row.statistics
+            return statistics
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des statistiques de la voiture: {str(e)}")
+            return {}
+        finally:
+            db.close()
+    
+    @staticmethod
+    def update_statistics(car_id, track_id, update):
+        """
+        Met à jour les statistiques d'une voiture et d'une piste en une transaction
+        
+        La fonction de mise à jour reçoit les statistiques actuellement en base
+        (et non une copie en mémoire). Le verrou d'écriture est pris avant la lecture
+        (FOR UPDATE, BEGIN IMMEDIATE sous SQLite) : deux workers qui notent un tour en
+        même temps se succèdent sans perdre de mise à jour.
+        
+        Args:
+            car_id (str): ID de la voiture
+            track_id (str): ID du circuit
+            update (callable): Reçoit {métrique: statistiques} et renvoie les statistiques modifiées
+            
+        Returns:
+            dict: Statistiques après mise à jour, None si erreur
+        """
+        db = get_session()
+        try:
+            _lock_for_update(db, router.shard_for_car(car_id, create=True))
+            rows = {
+                row.metric: row
+                for row in db.query(MetricStatistic)
+                    .filter(MetricStatistic.car_id == car_id,
+                            MetricStatistic.track_id == track_id)
+                    .with_for_update()
+                    .all()
+            }
+            statistics = update({metric: row.statistics for metric, row in rows.items()})
+            
+            for metric, values in statistics.items():
+                row = rows.get(metric)
+                if row is None:
+                    db.add(MetricStatistic(car_id=car_id, track_id=track_id, metric=metric, statistics=values))
+                else:
+                    row.statistics = values
+            
+            db.commit()
+            return statistics
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la mise à jour des statistiques: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def replace_all(statistics):
+        """
+        Remplace toutes les statistiques (reconstruction depuis l'historique)
+        
+        Args:
+            statistics (dict): {(car_id, track_id): {métrique: statistiques}}
+        """
+        db = get_session()
+        try:
+            for shard_id in router.shard_ids():
+                db.execute(delete(MetricStatistic), bind_arguments={"shard_id": shard_id})
+            db.add_all([
+                MetricStatistic(car_id=car_id, track_id=track_id, metric=metric, statistics=values)
+                for (car_id, track_id), metrics in statistics.items()
+                for metric, values in metrics.items()
+            ])
+            db.commit()
+            return True
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la reconstruction des statistiques: {str(e)}")
+            return False
+        finally:
+            db.close()
+    
+    @staticmethod
+    def is_empty():
+        """Indique si aucune statistique n'a encore été enregistrée"""
+        db = get_session()
+        try:
+            return db.query(MetricStatistic.id).first() is None
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la lecture des statistiques: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+
+class PerformanceRepository:
+    @staticmethod
+    def get_performance(car_id, track_id):
+        """Récupère les résumés de performance des setups notés d'une voiture et d'une piste"""
+        db = get_session()
+        try:
+            return db.query(PerformanceSummary)\
+                .filter(PerformanceSummary.car_id == car_id,
+                        PerformanceSummary.track_id == track_id,
+                        PerformanceSummary.score.isnot(None))\
+                .order_by(PerformanceSummary.generation_time)\
+                .all()
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des performances: {str(e)}")
+            return []
+        finally:
+            db.close()
+    
+    @staticmethod
+    def rebuild(connection=None):
+        """
+        Reconstruit tous les résumés de performance depuis telemetry_results (une requête agrégée)
+        
+        Args:
+            connection: Connexion à utiliser (migrations) ; par défaut une session
+            
+        Returns:
+            bool: True si succès, False sinon
+        """
+        laps = select(
+            TelemetryResult.setup_id,
+            func.count(TelemetryResult.id).label("lap_count"),
+            func.min(TelemetryResult.lap_time).label("best_lap_time"),
+            func.avg(TelemetryResult.lap_time).label("mean_lap_time")
+        ).group_by(TelemetryResult.setup_id).subquery()
+        
+        summaries = select(
+            SetupConfiguration.id, SetupConfiguration.car_id, SetupConfiguration.track_id,
+            SetupConfiguration.generation_time, laps.c.lap_count, laps.c.best_lap_time,
+            laps.c.mean_lap_time, SetupConfiguration.score, literal(datetime.utcnow())
+        ).join(laps, laps.c.setup_id == SetupConfiguration.id)
+        
+        statements = [
+            delete(PerformanceSummary),
+            insert(PerformanceSummary).from_select(
+                ["setup_id", "car_id", "track_id", "generation_time", "lap_count",
+                 "best_lap_time", "mean_lap_time", "score", "updated_at"],
+                summaries
+            )
+        ]
+        
+        if connection is not None:
+            for statement in statements:
+                connection.execute(statement)
+            return True
+        
+        db = get_session()
+        try:
+            for shard_id in router.shard_ids():
+                for statement in statements:
+                    db.execute(statement, bind_arguments={"shard_id": shard_id})
+            db.commit()
+            return True
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la reconstruction des performances: {str(e)}")
+            return False
+        finally:
+            db.close()
 
 
 class OptimizationRepository:
     @staticmethod
-    def create_session(car_id, track_id, optimization_parameters):
+    def create_session(car_id, track_id, optimization_parameters, study_name=None):
         """Crée une nouvelle session d'optimisation"""
+        router.register_program(car_id, track_id)
         db = get_session()
         try:
             session = OptimizationSession(
                 car_id=car_id,
                 track_id=track_id,
-                optimization_parameters=optimization_parameters
+                optimization_parameters=optimization_parameters,
+                study_name=study_name
             )
             db.add(session)
+            db.flush()
+            db.add(SessionStatistics(session_id=session.id,
+                                     direction=(optimization_parameters or {}).get("direction", "maximize")))
             db.commit()
+            _session_status_cache.clear()
             return session.id
         except SQLAlchemyError as e:
             db.rollback()
@@ -182,6 +1336,7 @@ class OptimizationRepository:
             if session:
                 session.end_time = datetime.utcnow()
                 db.commit()
+                _session_status_cache.clear()
                 return True
             return False
         except SQLAlchemyError as e:
@@ -192,16 +1347,154 @@ class OptimizationRepository:
             db.close()
     
     @staticmethod
-    def get_active_session():
-        """Récupère la session d'optimisation active (si elle existe)"""
+    def get_session_by_id(session_id):
+        """Récupère une session d'optimisation par son ID"""
+        db = get_session()
+        try:
+            return db.query(OptimizationSession).filter(OptimizationSession.id == session_id).first()
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération de la session: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_active_session(car_id=None, track_id=None):
+        """Récupère la session d'optimisation active la plus récente (éventuellement pour une voiture et une piste)"""
+        db = get_session()
+        try:
+            query = db.query(OptimizationSession).filter(OptimizationSession.end_time.is_(None))
+            if car_id is not None:
+                query = query.filter(OptimizationSession.car_id == car_id)
+            if track_id is not None:
+                query = query.filter(OptimizationSession.track_id == track_id)
+            return _first_across_shards(query.order_by(OptimizationSession.start_time.desc()),
+                                        key=lambda session: session.start_time, reverse=True)
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération de la session active: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_active_sessions():
+        """Récupère toutes les sessions d'optimisation actives"""
         db = get_session()
         try:
-            return db.query(OptimizationSession)\
+            sessions = db.query(OptimizationSession)\
                 .filter(OptimizationSession.end_time.is_(None))\
                 .order_by(OptimizationSession.start_time.desc())\
-                .first()
+                .all()
+            # Avec plusieurs shards, les résultats sont mis bout à bout : tri global
+            return sorted(sessions, key=lambda session: session.start_time, reverse=True)
         except SQLAlchemyError as e:
-            logger.error(f"Erreur lors de la récupération de la session active: {str(e)}")
+            logger.error(f"Erreur lors de la récupération des sessions actives: {str(e)}")
+            return []
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_session_status(session_id=None, car_id=None, track_id=None):
+        """
+        Statut d'une session d'optimisation depuis ses statistiques maintenues
+        (aucune agrégation : une lecture par clé primaire, servie depuis un cache court)
+        
+        Args:
+            session_id (int): ID de la session (None = session active la plus récente)
+            car_id (str): Filtre sur la voiture (session active)
+            track_id (str): Filtre sur le circuit (session active)
+            
+        Returns:
+            dict: Statut de la session, None si aucune session
+        """
+        if session_id is None:
+            active_key = ("active", car_id, track_id)
+            session_id = _session_status_cache.get(active_key)
+        else:
+            active_key = None
+        
+        if session_id is not None:
+            status = _session_status_cache.get(session_id)
+            if status is not None:
+                return status
+        
+        db = get_session()
+        try:
+            query = db.query(OptimizationSession, SessionStatistics)\
+                .outerjoin(SessionStatistics, SessionStatistics.session_id == OptimizationSession.id)
+            if session_id is not None:
+                query = query.filter(OptimizationSession.id == session_id)
+            else:
+                query = query.filter(OptimizationSession.end_time.is_(None))
+                if car_id is not None:
+                    query = query.filter(OptimizationSession.car_id == car_id)
+                if track_id is not None:
+                    query = query.filter(OptimizationSession.track_id == track_id)
+                query = query.order_by(OptimizationSession.start_time.desc())
+            row = _first_across_shards(query, key=lambda row: row[0].start_time, reverse=True)
+            if row is None:
+                return None
+            
+            session, stats = row
+            status = {
+                "session_id": session.id,
+                "car_id": session.car_id,
+                "track_id": session.track_id,
+                "start_time": session.start_time,
+                "end_time": session.end_time,
+                "trials_completed": stats.trials_completed if stats else 0,
+                "trials_pending": stats.trials_pending if stats else 0,
+                "best_score": stats.best_score if stats else None,
+                "best_setup_id": stats.best_setup_id if stats and stats.best_setup_id else session.best_setup_id,
+                "updated_at": stats.updated_at if stats else None,
+                "is_active": session.end_time is None
+            }
+            _session_status_cache.set(session.id, status)
+            if active_key is not None:
+                _session_status_cache.set(active_key, session.id)
+            return status
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération du statut de la session: {str(e)}")
             return None
         finally:
             db.close()
+
+
+class CatalogRepository:
+    @staticmethod
+    def get_cars():
+        """
+        Liste des voitures ayant des setups ou des sessions
+        
+        Avec la répartition par voiture, la liste est lue dans le catalogue
+        (sans interroger chaque shard).
+        """
+        if router.sharded:
+            return sorted({car_id for car_id, _ in router.get_programs()})
+        db = get_session()
+        try:
+            rows = db.query(SetupTotal.car_id).distinct().order_by(SetupTotal.car_id).all()
+            return [car_id for car_id, in rows]
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des voitures: {str(e)}")
+            return []
+        finally:
+            db.close()
+    
+    @staticmethod
+    def get_tracks(car_id=None):
+        """Liste des circuits (éventuellement pour une voiture)"""
+        if router.sharded:
+            return sorted({track_id for _, track_id in router.get_programs(car_id)})
+        db = get_session()
+        try:
+            query = db.query(SetupTotal.track_id)
+            if car_id is not None:
+                query = query.filter(SetupTotal.car_id == car_id)
+            rows = query.distinct().order_by(SetupTotal.track_id).all()
+            return [track_id for track_id, in rows]
+        except SQLAlchemyError as e:
+            logger.error(f"Erreur lors de la récupération des circuits: {str(e)}")
+            return []
+        finally:
+            db.close()
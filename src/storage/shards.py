@@ -0,0 +1,369 @@
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList, ColumnElement
+
+logger = logging.getLogger(__name__)
+
+# Base historique (DATABASE_URL) : shard d'index 0
+DEFAULT_SHARD = "default"
+
+# Chaque shard attribue ses IDs dans sa plage [index * SHARD_ID_SPAN, (index + 1) * SHARD_ID_SPAN[ :
+# l'ID d'un setup, d'un tour ou d'une session suffit à retrouver sa base
+SHARD_ID_SPAN = 10 ** 12
+
+# Tables dont les IDs sont globaux (référencés par l'API)
+GLOBAL_ID_TABLES = ("setup_configurations", "telemetry_results", "optimization_sessions")
+
+# Colonnes contenant un ID global sans clé étrangère (table, colonne)
+ID_COLUMNS = {("archived_setups", "setup_id")}
+
+# Délai de relecture du catalogue (shards créés par d'autres workers)
+CATALOG_REFRESH_SECONDS = 5
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+# Catalogue : emplacement des shards, voiture -> shard et programmes (voiture, circuit)
+catalog_metadata = MetaData()
+shard_catalog = Table(
+    "shard_catalog",
+    catalog_metadata,
+    Column("shard_id", String, primary_key=True),
+    Column("shard_index", Integer, nullable=False, unique=True),
+    Column("url", String, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+car_shards = Table(
+    "car_shards",
+    catalog_metadata,
+    Column("car_id", String, primary_key=True),
+    Column("shard_id", String, nullable=False),
+)
+program_catalog = Table(
+    "program_catalog",
+    catalog_metadata,
+    Column("car_id", String, primary_key=True),
+    Column("track_id", String, primary_key=True),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+def routes_by_id(column):
+    """Indique si une colonne contient un ID global (ou y fait référence)"""
+    table_name = getattr(getattr(column, "table", None), "name", None)
+    if table_name in GLOBAL_ID_TABLES and column.primary_key:
+        return True
+    if (table_name, column.name) in ID_COLUMNS:
+        return True
+    return any(foreign_key.column.table.name in GLOBAL_ID_TABLES for foreign_key in column.foreign_keys)
+
+
+class ShardRouter:
+    """
+    Répartit les données entre plusieurs bases SQLite, une par voiture
+
+    Sans répartition (DB_SHARDING=none), toutes les requêtes vont à la base par défaut.
+    Avec DB_SHARDING=car, chaque voiture reçoit son fichier, son moteur et son pool :
+    deux programmes différents écrivent en parallèle. Le routage se fait sur car_id ou
+    sur les IDs globaux (plage propre à chaque shard) ; les requêtes sans critère de
+    routage interrogent toutes les bases.
+    """
+
+    def __init__(self, default_engine, create_engine, initialize_shard, sharded=False,
+                 shard_dir=None, catalog_engine=None):
+        """
+        Args:
+            default_engine: Moteur de la base par défaut (DATABASE_URL)
+            create_engine (callable): create_engine(url) -> moteur configuré (pool, PRAGMAs)
+            initialize_shard (callable): initialize_shard(engine, shard_index), crée et migre le schéma
+            sharded (bool): Active la répartition par voiture
+            shard_dir (Path): Répertoire des fichiers des shards
+            catalog_engine: Moteur de la base du catalogue
+        """
+        self.default_engine = default_engine
+        self.sharded = sharded
+        self.shard_dir = shard_dir
+        self.catalog_engine = catalog_engine
+        self._create_engine = create_engine
+        self._initialize_shard = initialize_shard
+        self._engines = {DEFAULT_SHARD: default_engine}
+        self._urls = {DEFAULT_SHARD: default_engine.url.render_as_string(hide_password=False)}
+        self._indexes = {0: DEFAULT_SHARD}
+        self._cars = {}
+        self._programs = set()
+        self._refreshed_at = 0
+        self._lock = threading.RLock()
+
+    def initialize(self):
+        """Crée le catalogue, y enregistre les données de la base par défaut et ouvre les shards connus"""
+        if not self.sharded:
+            return
+        catalog_metadata.create_all(self.catalog_engine)
+        with self.catalog_engine.begin() as connection:
+            if connection.execute(select(func.count()).select_from(shard_catalog)).scalar() == 0:
+                connection.execute(shard_catalog.insert().values(
+                    shard_id=DEFAULT_SHARD, shard_index=0, url=self._urls[DEFAULT_SHARD],
+                    created_at=datetime.utcnow()
+                ))
+                # Les voitures déjà présentes restent dans la base par défaut
+                programs = self._default_programs()
+                for car_id in sorted({car_id for car_id, _ in programs}):
+                    connection.execute(car_shards.insert().values(car_id=car_id, shard_id=DEFAULT_SHARD))
+                for car_id, track_id in programs:
+                    connection.execute(program_catalog.insert().values(
+                        car_id=car_id, track_id=track_id, created_at=datetime.utcnow()
+                    ))
+        self._refresh(force=True)
+        for shard_id in self.shard_ids():
+            self.engine(shard_id)
+
+    def _default_programs(self):
+        # Couples (voiture, circuit) de la base par défaut, d'après les totaux des listes de setups
+        with self.default_engine.connect() as connection:
+            rows = connection.exec_driver_sql("SELECT DISTINCT car_id, track_id FROM setup_totals")
+            return [(car_id, track_id) for car_id, track_id in rows]
+
+    def _refresh(self, force=False):
+        """Relit le catalogue (shards et voitures ajoutés par les autres workers)"""
+        if not force and time.monotonic() - self._refreshed_at < CATALOG_REFRESH_SECONDS:
+            return
+        with self.catalog_engine.connect() as connection:
+            shards = connection.execute(select(shard_catalog)).fetchall()
+            cars = connection.execute(select(car_shards)).fetchall()
+        with self._lock:
+            for row in shards:
+                self._indexes[row.shard_index] = row.shard_id
+                self._urls.setdefault(row.shard_id, row.url)
+            for row in cars:
+                self._cars[row.car_id] = row.shard_id
+            self._refreshed_at = time.monotonic()
+
+    def shard_ids(self):
+        """Identifiants de tous les shards"""
+        if not self.sharded:
+            return [DEFAULT_SHARD]
+        self._refresh()
+        with self._lock:
+            return [self._indexes[index] for index in sorted(self._indexes)]
+
+    def engine(self, shard_id):
+        """Moteur d'un shard (ouvert et migré à la première utilisation dans le processus)"""
+        engine = self._engines.get(shard_id)
+        if engine is not None:
+            return engine
+        with self._lock:
+            engine = self._engines.get(shard_id)
+            if engine is None:
+                if shard_id not in self._urls:
+                    self._refresh(force=True)
+                index = next(index for index, known in self._indexes.items() if known == shard_id)
+                engine = self._create_engine(self._urls[shard_id])
+                self._initialize_shard(engine, index)
+                self._engines[shard_id] = engine
+            return engine
+
+    def engines(self):
+        """Moteurs de tous les shards"""
+        return [self.engine(shard_id) for shard_id in self.shard_ids()]
+
+    def url(self, shard_id):
+        """URL de la base d'un shard"""
+        self.engine(shard_id)
+        return self._urls[shard_id]
+
+    def shard_for_car(self, car_id, create=False):
+        """
+        Shard d'une voiture
+
+        Args:
+            car_id (str): ID de la voiture
+            create (bool): Crée le shard d'une voiture inconnue (écriture)
+
+        Returns:
+            str: Identifiant du shard (base par défaut pour une voiture inconnue en lecture)
+        """
+        if not self.sharded or car_id is None:
+            return DEFAULT_SHARD
+        shard_id = self._cars.get(car_id)
+        if shard_id is None:
+            self._refresh(force=True)
+            shard_id = self._cars.get(car_id)
+        if shard_id is None:
+            if not create:
+                return DEFAULT_SHARD
+            shard_id = self._allocate(car_id)
+        return shard_id
+
+    def _allocate(self, car_id):
+        """Crée le shard d'une nouvelle voiture (le premier worker à l'enregistrer l'emporte)"""
+        for _ in range(3):
+            with self._lock:
+                try:
+                    with self.catalog_engine.begin() as connection:
+                        index = connection.execute(select(func.max(shard_catalog.c.shard_index))).scalar() + 1
+                        shard_id = car_id if _NAME_PATTERN.match(car_id) else f"shard{index}"
+                        url = f"sqlite:///{self.shard_dir / f'{shard_id}.db'}"
+                        connection.execute(shard_catalog.insert().values(
+                            shard_id=shard_id, shard_index=index, url=url, created_at=datetime.utcnow()
+                        ))
+                        connection.execute(car_shards.insert().values(car_id=car_id, shard_id=shard_id))
+                    logger.info(f"Shard {shard_id} créé pour la voiture {car_id}")
+                    self._refresh(force=True)
+                    self.engine(shard_id)
+                    return shard_id
+                except IntegrityError:
+                    # Un autre worker a créé un shard en même temps
+                    self._refresh(force=True)
+                    if car_id in self._cars:
+                        return self._cars[car_id]
+        raise RuntimeError(f"Impossible de créer le shard de la voiture {car_id}")
+
+    def shard_for_id(self, value):
+        """Shard d'un ID global (setup, tour, session)"""
+        if not self.sharded or value is None:
+            return DEFAULT_SHARD
+        index = int(value) // SHARD_ID_SPAN
+        shard_id = self._indexes.get(index)
+        if shard_id is None:
+            self._refresh(force=True)
+            shard_id = self._indexes.get(index, DEFAULT_SHARD)
+        return shard_id
+
+    def group_ids(self, ids):
+        """Regroupe des IDs globaux par shard"""
+        groups = {}
+        for value in ids:
+            groups.setdefault(self.shard_for_id(value), []).append(value)
+        return groups
+
+    def register_program(self, car_id, track_id):
+        """
+        Enregistre un couple (voiture, circuit) dans le catalogue (listes transverses)
+        et crée le shard de la voiture si besoin (à appeler avant la première écriture)
+        """
+        if not self.sharded or (car_id, track_id) in self._programs:
+            return
+        self.shard_for_car(car_id, create=True)
+        with self.catalog_engine.begin() as connection:
+            exists = connection.execute(
+                select(program_catalog.c.car_id)
+                .where(program_catalog.c.car_id == car_id, program_catalog.c.track_id == track_id)
+            ).first()
+            if exists is None:
+                try:
+                    connection.execute(program_catalog.insert().values(
+                        car_id=car_id, track_id=track_id, created_at=datetime.utcnow()
+                    ))
+                except IntegrityError:
+                    pass
+        self._programs.add((car_id, track_id))
+
+    def get_programs(self, car_id=None):
+        """
+        Couples (voiture, circuit) enregistrés dans le catalogue
+
+        Returns:
+            list: Tuples (car_id, track_id) triés
+        """
+        query = select(program_catalog.c.car_id, program_catalog.c.track_id)\
+            .order_by(program_catalog.c.car_id, program_catalog.c.track_id)
+        if car_id is not None:
+            query = query.where(program_catalog.c.car_id == car_id)
+        with self.catalog_engine.connect() as connection:
+            return [(row.car_id, row.track_id) for row in connection.execute(query)]
+
+    def _shards_for_clause(self, statement):
+        """
+        Shards désignés par les critères d'égalité (ou IN) sur car_id ou un ID global
+
+        Seuls les critères combinés par AND au premier niveau sont retenus : une
+        condition à l'intérieur d'un OR ne restreint pas les bases interrogées.
+
+        Returns:
+            list: Shards, None si la requête ne peut pas être routée
+        """
+        where = getattr(statement, "whereclause", None)
+        shards = None
+        criteria = [where] if where is not None else []
+        while criteria:
+            element = criteria.pop()
+            if isinstance(element, BooleanClauseList):
+                if element.operator is operators.and_:
+                    criteria.extend(element.clauses)
+                continue
+            found = self._shards_for_criterion(element)
+            if found is not None:
+                shards = found if shards is None else shards & found
+        return sorted(shards) if shards else None
+
+    def _shards_for_criterion(self, element):
+        """Shards désignés par un critère colonne = valeur ou colonne IN (valeurs)"""
+        if not isinstance(element, BinaryExpression) or not isinstance(element.right, BindParameter):
+            return None
+        column = element.left
+        if not isinstance(column, ColumnElement) or not hasattr(column, "foreign_keys"):
+            return None
+        value = element.right.effective_value
+        if element.operator is operators.eq:
+            values = [value]
+        elif element.operator is operators.in_op:
+            values = list(value or [])
+        else:
+            return None
+        if not values or any(item is None for item in values):
+            return None
+        if column.name == "car_id":
+            return {self.shard_for_car(item) for item in values}
+        if routes_by_id(column):
+            return {self.shard_for_id(item) for item in values}
+        return None
+
+    def shard_for_clause(self, clause):
+        """Shard d'une requête SQL sans entité (un seul shard doit être désigné)"""
+        if not self.sharded:
+            return DEFAULT_SHARD
+        shards = self._shards_for_clause(clause) if clause is not None else None
+        if not shards or len(shards) > 1:
+            raise ValueError("Requête multi-bases : préciser le shard (bind_arguments={'shard_id': ...})")
+        return shards[0]
+
+    # Fonctions de choix utilisées par la session (sqlalchemy.ext.horizontal_shard)
+
+    def shard_chooser(self, mapper, instance, clause=None, **kwargs):
+        """Shard d'une nouvelle ligne (car_id, puis ID global de référence)"""
+        if not self.sharded:
+            return DEFAULT_SHARD
+        if instance is not None:
+            table = mapper.local_table
+            if "car_id" in table.c and getattr(instance, "car_id", None) is not None:
+                return self.shard_for_car(instance.car_id, create=True)
+            for column in table.columns:
+                if routes_by_id(column) and getattr(instance, column.key, None) is not None:
+                    return self.shard_for_id(getattr(instance, column.key))
+        return self.shard_for_clause(clause)
+
+    def identity_chooser(self, mapper, primary_key, *, lazy_loaded_from=None, **kwargs):
+        """Shards pouvant contenir une clé primaire (session.get)"""
+        if not self.sharded:
+            return [DEFAULT_SHARD]
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token is not None:
+            return [lazy_loaded_from.identity_token]
+        for column, value in zip(mapper.primary_key, primary_key):
+            if column.name == "car_id":
+                return [self.shard_for_car(value)]
+            if routes_by_id(column):
+                return [self.shard_for_id(value)]
+        return self.shard_ids()
+
+    def execute_chooser(self, orm_context):
+        """Shards interrogés par une requête ORM (tous si aucun critère de routage)"""
+        if not self.sharded:
+            return [DEFAULT_SHARD]
+        if orm_context.is_insert:
+            raise ValueError("Insertion groupée multi-bases : préciser le shard (bind_arguments={'shard_id': ...})")
+        return self._shards_for_clause(orm_context.statement) or self.shard_ids()
@@ -1,6 +1,11 @@
 from flask import Blueprint, render_template, jsonify, request
-from src.storage.repository import SetupRepository, OptimizationRepository
-from src.models.setup import SetupConfiguration, TelemetryResult, OptimizationSession
+from src.storage.repository import (
+    SetupRepository, TelemetryRepository, OptimizationRepository, PerformanceRepository, CatalogRepository
+)
+from src.storage.archive import load_setup
+from src.api.responses import (
+    conditional_json, json_response, make_etag, serialize_setup, serialize_telemetry, setup_listing
+)
 from src.config.constants import SETUP_STATUS, SETUP_SOURCE
 import json
 
@@ -24,44 +29,24 @@ def setup_details(setup_id):
 
 @web_bp.route('/api/web/optimization/status')
 def get_optimization_status():
-    """Obtient le statut de l'optimisation en cours"""
-    active_session = OptimizationRepository.get_active_session()
-    
-    if active_session:
-        # Compte le nombre de setups testés et en attente
-        db = SetupRepository.get_session()
-        
-        trials_completed = db.query(SetupConfiguration).filter(
-            SetupConfiguration.optimization_session_id == active_session.id,
-            SetupConfiguration.status == SETUP_STATUS["TESTED"]
-        ).count()
-        
-        trials_pending = db.query(SetupConfiguration).filter(
-            SetupConfiguration.optimization_session_id == active_session.id,
-            SetupConfiguration.status == SETUP_STATUS["PENDING"]
-        ).count()
-        
-        # Récupère les meilleurs setups
-        best_setups = SetupRepository.get_best_setups(
-            car_id=active_session.car_id,
-            track_id=active_session.track_id,
-            limit=5
-        )
-        
-        best_score = best_setups[0].score if best_setups else None
-        
-        db.close()
-        
-        return jsonify({
+    """Obtient le statut d'une optimisation en cours (session_id, ou la plus récente)"""
+    session_id = request.args.get('session_id')
+    status = OptimizationRepository.get_session_status(
+        session_id=int(session_id) if session_id is not None else None
+    )
+    
+    if status and status["is_active"]:
+        return json_response({
             "is_active": True,
-            "session_id": active_session.id,
-            "car_id": active_session.car_id,
-            "track_id": active_session.track_id,
-            "start_time": active_session.start_time.isoformat(),
-            "trials_completed": trials_completed,
-            "trials_pending": trials_pending,
-            "best_score": best_score,
-            "best_setup_id": active_session.best_setup_id
+            "session_id": status["session_id"],
+            "car_id": status["car_id"],
+            "track_id": status["track_id"],
+            "start_time": status["start_time"],
+            "trials_completed": status["trials_completed"],
+            "trials_pending": status["trials_pending"],
+            "best_score": status["best_score"],
+            "best_setup_id": status["best_setup_id"],
+            "updated_at": status["updated_at"]
         })
     else:
         return jsonify({
@@ -70,106 +55,44 @@ def get_optimization_status():
 
 @web_bp.route('/api/web/setups')
 def get_setups():
-    """Obtient la liste des setups pour une voiture et un circuit"""
+    """Obtient la liste des setups pour une voiture et un circuit (pagination par curseur)"""
     car_id = request.args.get('car_id')
     track_id = request.args.get('track_id')
-    page = int(request.args.get('page', 1))
-    page_size = int(request.args.get('page_size', 10))
     
     if not car_id or not track_id:
         return jsonify({"error": "car_id et track_id sont requis"}), 400
     
-    # Récupère les setups depuis la base de données
-    db = SetupRepository.get_session()
-    
-    query = db.query(SetupConfiguration).filter(
-        SetupConfiguration.car_id == car_id,
-        SetupConfiguration.track_id == track_id
-    ).order_by(SetupConfiguration.generation_time.desc())
-    
-    # Pagination
-    total = query.count()
-    setups = query.offset((page - 1) * page_size).limit(page_size).all()
-    
-    db.close()
-    
-    # Construit la réponse
-    setup_list = []
-    for setup in setups:
-        setup_dict = {
-            "id": setup.id,
-            "car_id": setup.car_id,
-            "track_id": setup.track_id,
-            "setup_parameters": setup.setup_parameters,
-            "generation_time": setup.generation_time.isoformat(),
-            "status": setup.status,
-            "source": setup.source,
-            "score": setup.score
-        }
-        setup_list.append(setup_dict)
-    
-    return jsonify({
-        "setups": setup_list,
-        "total": total,
-        "page": page,
-        "page_size": page_size
-    })
+    try:
+        return setup_listing(car_id, track_id, request.args, "setups")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 @web_bp.route('/api/web/setup/<int:setup_id>')
 def get_setup(setup_id):
     """Obtient les détails d'un setup spécifique"""
-    setup = SetupRepository.get_setup_by_id(setup_id)
+    setup = load_setup(setup_id)
     
     if not setup:
         return jsonify({"error": "Setup non trouvé"}), 404
     
-    # Récupère les résultats de télémétrie associés
-    db = SetupRepository.get_session()
-    telemetry_results = db.query(TelemetryResult).filter(
-        TelemetryResult.setup_id == setup_id
-    ).all()
+    # La version dépend du setup et des tours enregistrés pour celui-ci
+    telemetry_version = TelemetryRepository.get_telemetry_version(setup_id)
+    etag = make_etag("setup_details", setup.id, setup.updated_at or setup.generation_time, telemetry_version)
     
-    telemetry_list = []
-    for result in telemetry_results:
-        telemetry_dict = {
-            "id": result.id,
-            "lap_time": result.lap_time,
-            "telemetry_data": result.telemetry_data,
-            "submission_time": result.submission_time.isoformat(),
-            "weather_conditions": result.weather_conditions,
-            "driver_notes": result.driver_notes
+    def build():
+        # Récupère les résultats de télémétrie associés
+        telemetry_results = TelemetryRepository.get_telemetry_for_setup(setup_id)
+        return {
+            **serialize_setup(setup),
+            "telemetry_results": [serialize_telemetry(result) for result in telemetry_results]
         }
-        telemetry_list.append(telemetry_dict)
-    
-    db.close()
-    
-    # Construit la réponse
-    setup_dict = {
-        "id": setup.id,
-        "car_id": setup.car_id,
-        "track_id": setup.track_id,
-        "setup_parameters": setup.setup_parameters,
-        "generation_time": setup.generation_time.isoformat(),
-        "status": setup.status,
-        "source": setup.source,
-        "score": setup.score,
-        "telemetry_results": telemetry_list
-    }
     
-    return jsonify(setup_dict)
+    return conditional_json(etag, build)
 
 @web_bp.route('/api/web/cars')
 def get_cars():
     """Obtient la liste des voitures disponibles"""
-    db = SetupRepository.get_session()
-    
-    # Récupère les voitures uniques
-    cars = db.query(SetupConfiguration.car_id).distinct().all()
-    car_list = [car[0] for car in cars]
-    
-    db.close()
-    
-    return jsonify(car_list)
+    return jsonify(CatalogRepository.get_cars())
 
 @web_bp.route('/api/web/tracks')
 def get_tracks():
@@ -179,18 +102,7 @@ def get_tracks():
     if not car_id:
         return jsonify({"error": "car_id est requis"}), 400
     
-    db = SetupRepository.get_session()
-    
-    # Récupère les circuits uniques pour cette voiture
-    tracks = db.query(SetupConfiguration.track_id).filter(
-        SetupConfiguration.car_id == car_id
-    ).distinct().all()
-    
-    track_list = [track[0] for track in tracks]
-    
-    db.close()
-    
-    return jsonify(track_list)
+    return jsonify(CatalogRepository.get_tracks(car_id))
 
 @web_bp.route('/api/web/performance')
 def get_performance_data():
@@ -201,36 +113,12 @@ def get_performance_data():
     if not car_id or not track_id:
         return jsonify({"error": "car_id et track_id sont requis"}), 400
     
-    db = SetupRepository.get_session()
-    
-    # Récupère les setups testés
-    setups = db.query(SetupConfiguration).filter(
-        SetupConfiguration.car_id == car_id,
-        SetupConfiguration.track_id == track_id,
-        SetupConfiguration.status == SETUP_STATUS["TESTED"],
-        SetupConfiguration.score.isnot(None)
-    ).order_by(SetupConfiguration.generation_time).all()
-    
-    # Prépare les données pour les graphiques
-    lap_times = []
-    scores = []
-    setup_ids = []
-    
-    for setup in setups:
-        # Récupère le temps au tour associé
-        telemetry = db.query(TelemetryResult).filter(
-            TelemetryResult.setup_id == setup.id
-        ).first()
-        
-        if telemetry:
-            lap_times.append(telemetry.lap_time)
-            scores.append(setup.score)
-            setup_ids.append(setup.id)
-    
-    db.close()
+    # Lecture d'une seule plage d'index : le résumé est maintenu à chaque tour enregistré
+    summaries = PerformanceRepository.get_performance(car_id, track_id)
     
     return jsonify({
-        "setup_ids": setup_ids,
-        "lap_times": lap_times,
-        "scores": scores
+        "setup_ids": [summary.setup_id for summary in summaries],
+        "lap_times": [summary.best_lap_time for summary in summaries],
+        "mean_lap_times": [summary.mean_lap_time for summary in summaries],
+        "scores": [summary.score for summary in summaries]
     })
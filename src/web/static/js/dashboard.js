@@ -14,6 +14,8 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentPage = 1;
     const pageSize = 10;
     let totalPages = 1;
+    // Curseur de chaque page déjà atteinte (pagination par curseur, page 1 = aucun curseur)
+    let pageCursors = [null];
     let selectedCar = '';
     let selectedTrack = '';
     
@@ -36,6 +38,7 @@ document.addEventListener('DOMContentLoaded', function() {
         selectedCar = carSelect.value;
         selectedTrack = trackSelect.value;
         currentPage = 1;
+        pageCursors = [null];
         
         loadSetups();
         loadPerformanceData();
@@ -67,7 +70,9 @@ document.addEventListener('DOMContentLoaded', function() {
         `;
         
         // Récupère les setups
-        const result = await fetchAPI(`/api/web/setups?car_id=${selectedCar}&track_id=${selectedTrack}&page=${currentPage}&page_size=${pageSize}`);
+        const cursor = pageCursors[currentPage - 1];
+        const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        const result = await fetchAPI(`/api/web/setups?car_id=${selectedCar}&track_id=${selectedTrack}&page_size=${pageSize}${cursorParam}`);
         if (!result) {
             setupsTable.querySelector('tbody').innerHTML = `
                 <tr>
@@ -87,8 +92,9 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
-        // Calcule le nombre total de pages
+        // Calcule le nombre total de pages et mémorise le curseur de la page suivante
         totalPages = Math.ceil(result.total / pageSize);
+        pageCursors[currentPage] = result.next_cursor;
         
         // Génère les lignes du tableau
         let html = '';
@@ -139,7 +145,9 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Pages
         for (let i = 1; i <= totalPages; i++) {
-            if (i === 1 || i === totalPages || (i >= currentPage - 1 && i <= currentPage + 1)) {
+            // Seules les pages déjà atteintes (curseur connu) sont accessibles directement
+            const reachable = pageCursors[i - 1] !== undefined;
+            if (reachable && (i === 1 || i === totalPages || (i >= currentPage - 1 && i <= currentPage + 1))) {
                 html += `
                     <li class="page-item ${i === currentPage ? 'active' : ''}">
                         <a class="page-link" href="#" data-page="${i}">${i}</a>
@@ -156,7 +164,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Bouton "Suivant"
         html += `
-            <li class="page-item ${currentPage === totalPages ? 'disabled' : ''}">
+            <li class="page-item ${!pageCursors[currentPage] ? 'disabled' : ''}">
                 <a class="page-link" href="#" data-page="${currentPage + 1}">Suivant</a>
             </li>
         `;
@@ -169,7 +177,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 e.preventDefault();
                 
                 const page = parseInt(this.dataset.page);
-                if (isNaN(page) || page < 1 || page > totalPages) {
+                if (isNaN(page) || page < 1 || page > totalPages || pageCursors[page - 1] === undefined) {
                     return;
                 }
                 
@@ -147,7 +147,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
         
         // Récupère les setups pour la voiture et le circuit actifs
-        const result = await fetchAPI(`/api/web/setups?car_id=${status.car_id}&track_id=${status.track_id}&page=1&page_size=5`);
+        const result = await fetchAPI(`/api/web/setups?car_id=${status.car_id}&track_id=${status.track_id}&page_size=5`);
         if (!result) {
             recentSetupsTable.querySelector('tbody').innerHTML = `
                 <tr>
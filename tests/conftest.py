@@ -0,0 +1,22 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Bases de test dans un répertoire temporaire, réparties par voiture : les requêtes sont
+# vérifiées sur la base par défaut comme sur les shards.
+# Les réglages sont lus à l'import de src.config.settings, avant celui des modules de l'application.
+TEST_DATA_DIR = Path(tempfile.mkdtemp(prefix="iracing-setup-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DATA_DIR}/optimization.db"
+os.environ["CATALOG_DATABASE_URL"] = f"sqlite:///{TEST_DATA_DIR}/catalog.db"
+os.environ["DB_SHARDING"] = "car"
+os.environ["COLUMNAR_TELEMETRY"] = "False"
+os.environ["INGEST_BUFFER"] = "False"
+
+from src.storage import database  # noqa: E402
+
+database.router.shard_dir = TEST_DATA_DIR
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
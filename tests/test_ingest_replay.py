@@ -0,0 +1,72 @@
+"""
+Reprise du journal d'ingestion après un arrêt brutal
+
+Les tours acquittés par un processus arrêté avant d'écrire son lot en base sont rejoués
+une seule fois ; ceux dont le lot a été validé (point de reprise) ne sont pas réinsérés.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from src.api.routes import _write_ingested
+from src.config.constants import SETUP_SOURCE, SETUP_STATUS
+from src.core.ingest import SEGMENT_SUFFIX, IngestBuffer
+from src.storage.database import init_db
+from src.storage.repository import IngestRepository, SetupRepository, TelemetryRepository
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Processus qui journalise des tours puis s'arrête sans écrire son lot (ni handler atexit)
+CRASHING_WRITER = """
+import json, os, sys
+from pathlib import Path
+from src.core.ingest import IngestBuffer
+buffer = IngestBuffer(Path(sys.argv[1]), handler=None, flush_interval_ms=3600000, max_records=1000)
+for record in json.loads(sys.argv[2]):
+    buffer.append(record)
+print(buffer.stream)
+os._exit(0)
+"""
+
+
+def journal_and_crash(ingest_dir, records):
+    result = subprocess.run([sys.executable, "-c", CRASHING_WRITER, str(ingest_dir), json.dumps(records)],
+                            cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def telemetry_count(setup_ids):
+    return sum(len(TelemetryRepository.get_telemetry_for_setup(setup_id)) for setup_id in setup_ids)
+
+
+@pytest.mark.parametrize("flushed", [0, 2, 4])
+def test_replay_writes_each_lap_once(tmp_path, flushed):
+    init_db()
+    # Deux voitures : le point de reprise est enregistré dans chaque base écrite
+    setup_ids = [
+        SetupRepository.create_setup(car_id, f"ingest_{flushed}", {"camber": 1.0}, SETUP_STATUS["PENDING"],
+                                     SETUP_SOURCE["MANUAL"])
+        for car_id in ("mx5", "gt3")
+    ]
+    records = [
+        {"setup_id": setup_ids[lap % 2], "lap_time": 90.0 + lap, "telemetry_data": {"lap_time": 90.0 + lap}}
+        for lap in range(4)
+    ]
+    stream = journal_and_crash(tmp_path, records)
+    assert len(list(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))) == 1
+
+    # Lot validé en base juste avant l'arrêt, segment pas encore supprimé
+    if flushed:
+        assert _write_ingested(stream, records[:flushed], flushed)
+
+    buffer = IngestBuffer(tmp_path, _write_ingested)
+    assert buffer.replay(IngestRepository.get_committed, IngestRepository.clear_checkpoint) == len(records) - flushed
+    assert telemetry_count(setup_ids) == len(records)
+    assert not list(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))
+    assert not IngestRepository.get_committed(stream)(1, records[0])
+
+    # Un second démarrage ne rejoue rien
+    assert IngestBuffer(tmp_path, _write_ingested).replay(IngestRepository.get_committed,
+                                                          IngestRepository.clear_checkpoint) == 0
+    assert telemetry_count(setup_ids) == len(records)
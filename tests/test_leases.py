@@ -0,0 +1,69 @@
+"""Réservation des setups par les postes de test"""
+import threading
+from src.config.constants import SETUP_SOURCE, SETUP_STATUS
+from src.core.leases import LeaseSweeper
+from src.storage.database import init_db
+from src.storage.repository import OptimizationRepository, SetupRepository
+
+SETUPS_PER_SESSION = 20
+
+
+def create_session(track_id, setup_count):
+    init_db()
+    session_id = OptimizationRepository.create_session("mx5", track_id, {})
+    setup_ids = [
+        SetupRepository.create_setup("mx5", track_id, {"camber": index}, SETUP_STATUS["PENDING"],
+                                     SETUP_SOURCE["OPTIMIZED"], optimization_session_id=session_id)
+        for index in range(setup_count)
+    ]
+    return session_id, setup_ids
+
+
+def test_concurrent_claims_never_share_a_setup():
+    session_id, setup_ids = create_session("leases_concurrent", SETUPS_PER_SESSION)
+    claimed = {"rig-a": [], "rig-b": []}
+    start = threading.Barrier(len(claimed))
+    errors = []
+
+    def claim_all(rig_id):
+        start.wait()
+        try:
+            # Chaque setup est terminé aussitôt : le poste en réserve alors un nouveau
+            while True:
+                setup = SetupRepository.claim_setup(rig_id, session_id)
+                if setup is None:
+                    break
+                claimed[rig_id].append(setup.id)
+                SetupRepository.update_setup_status(setup.id, SETUP_STATUS["TESTED"], 1.0)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=claim_all, args=(rig_id,)) for rig_id in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert not set(claimed["rig-a"]) & set(claimed["rig-b"])
+    assert sorted(claimed["rig-a"] + claimed["rig-b"]) == sorted(setup_ids)
+
+
+def test_expired_lease_returns_to_queue():
+    session_id, (setup_id,) = create_session("leases_expired", 1)
+    # Réservation déjà expirée : le poste s'est arrêté sans terminer son relais
+    assert SetupRepository.claim_setup("rig-a", session_id, lease_seconds=-1).id == setup_id
+    assert SetupRepository.count_pending_setups(session_id) == 0
+
+    assert LeaseSweeper(interval=0).sweep() == 1
+    assert SetupRepository.count_pending_setups(session_id) == 1
+    assert SetupRepository.claim_setup("rig-b", session_id).id == setup_id
+
+
+def test_renew_refused_for_another_rig():
+    session_id, (setup_id,) = create_session("leases_renew", 1)
+    assert SetupRepository.claim_setup("rig-a", session_id).id == setup_id
+
+    assert SetupRepository.renew_lease(setup_id, "rig-b") is None
+    assert SetupRepository.renew_lease(setup_id, "rig-a") is not None
+    assert SetupRepository.get_setup_by_id(setup_id).claimed_by == "rig-a"
@@ -0,0 +1,36 @@
+"""
+Mise à jour concurrente des statistiques des métriques
+
+Deux workers notent des tours du même circuit en même temps : aucun tour ne doit
+manquer dans les statistiques partagées.
+"""
+import threading
+from src.core.scoring import SetupScorer
+from src.storage.database import init_db
+from src.storage.repository import MetricStatisticsRepository
+
+LAPS_PER_WORKER = 40
+
+
+def test_concurrent_updates_keep_every_lap():
+    init_db()
+    errors = []
+
+    def add_laps(offset):
+        # Un scoreur par worker, comme dans deux processus gunicorn
+        scorer = SetupScorer(car_id="mx5", track_id="statistics")
+        try:
+            for lap in range(LAPS_PER_WORKER):
+                scorer.update_history({"lap_time": 90.0 + offset + lap / 100})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add_laps, args=(offset,)) for offset in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    statistics = MetricStatisticsRepository.get_statistics("mx5", "statistics")
+    assert statistics["lap_time"]["count"] == 2 * LAPS_PER_WORKER
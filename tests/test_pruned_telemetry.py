@@ -0,0 +1,54 @@
+"""
+Tour complet reçu pour un setup élagué pendant son relais
+
+Le pruner a déjà clos le trial et généré le setup suivant : /telemetry enregistre
+le tour sans noter le setup ni en générer un autre.
+"""
+import pytest
+from src.app import create_app
+from src.config.constants import SETUP_STATUS
+from src.storage.repository import SetupRepository, TelemetryRepository
+
+
+def lap(lap_number, lap_time):
+    return {"lap_number": lap_number, "lap_time": lap_time, "telemetry_data": {"lap_time": lap_time}}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return create_app().test_client()
+
+
+def test_telemetry_after_prune_has_no_side_effects(client):
+    session_id = client.post("/api/v1/optimization/start", json={
+        "car_id": "mx5", "track_id": "pruning",
+        "params": {"initial_setups": 1, "pruner": "median", "seed": 1, "warm_start": False, "transfer": False}
+    }).json["session_id"]
+
+    # Relais complets de référence pour le pruner (MedianPruner : 5 trials avant d'élaguer)
+    for _ in range(5):
+        setup = SetupRepository.claim_setup("rig", session_id)
+        client.post(f"/api/v1/setup/{setup.id}/lap", json=lap(1, 90.0))
+        response = client.post("/api/v1/telemetry", json={
+            "setup_id": setup.id, "lap_time": 90.0, "telemetry_data": {"lap_time": 90.0}
+        })
+        assert response.status_code == 200
+
+    setup = SetupRepository.claim_setup("rig", session_id)
+    response = client.post(f"/api/v1/setup/{setup.id}/lap", json=lap(1, 120.0))
+    assert response.json["prune"] is True
+    pending = SetupRepository.count_pending_setups(session_id)
+
+    response = client.post("/api/v1/telemetry", json={
+        "setup_id": setup.id, "lap_time": 120.0, "telemetry_data": {"lap_time": 120.0}
+    })
+    assert response.status_code == 200
+    assert response.json["prune"] is True
+    assert response.json["score"] is None
+    assert response.json["next_setup_id"] is None
+
+    pruned = SetupRepository.get_setup_by_id(setup.id)
+    assert pruned.status == SETUP_STATUS["DISCARDED"]
+    assert pruned.score is None
+    assert SetupRepository.count_pending_setups(session_id) == pending
+    assert len(TelemetryRepository.get_telemetry_for_setup(setup.id)) == 2
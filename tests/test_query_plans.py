@@ -0,0 +1,136 @@
+"""
+Plans d'exécution des requêtes des repositories (SQLite)
+
+Chaque appel est exécuté sur une base de test répartie par voiture ; les requêtes
+SELECT, UPDATE et DELETE envoyées à chaque base sont rejouées avec EXPLAIN QUERY PLAN
+sur tous les moteurs du routeur : aucune ne doit parcourir une table entière.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from src.config.constants import JOB_STATUS, SETUP_STATUS, SETUP_SOURCE
+from src.storage.database import init_db, router
+from src.storage.repository import (
+    SetupRepository, TelemetryRepository, IngestRepository, JobRepository, MetricStatisticsRepository,
+    OptimizationRepository, PerformanceRepository
+)
+
+# Instructions dont le plan est vérifié
+CHECKED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+# Appels des repositories : (nom, appel recevant les IDs créés par la fixture)
+REPOSITORY_QUERIES = [
+    ("SetupRepository.get_setup_by_id", lambda ids: SetupRepository.get_setup_by_id(ids["setup"])),
+    ("SetupRepository.update_setup_status",
+     lambda ids: SetupRepository.update_setup_status(ids["setup"], SETUP_STATUS["TESTED"], 0.5)),
+    ("SetupRepository.get_setups_after", lambda ids: SetupRepository.get_setups_after("mx5", "spa")),
+    ("SetupRepository.get_setups_after(cursor)",
+     lambda ids: SetupRepository.get_setups_after("mx5", "spa", (datetime(2024, 1, 1), ids["setup"]))),
+    ("SetupRepository.get_setups_version", lambda ids: SetupRepository.get_setups_version("mx5", "spa")),
+    ("SetupRepository.get_trial_numbers", lambda ids: SetupRepository.get_trial_numbers([ids["setup"]])),
+    ("SetupRepository.get_session_ids", lambda ids: SetupRepository.get_session_ids([ids["setup"]])),
+    ("SetupRepository.get_car_tracks", lambda ids: SetupRepository.get_car_tracks([ids["setup"]])),
+    ("SetupRepository.update_scores", lambda ids: SetupRepository.update_scores({ids["setup"]: 0.7})),
+    ("SetupRepository.get_pending_setup", lambda ids: SetupRepository.get_pending_setup()),
+    ("SetupRepository.get_pending_setup(session)",
+     lambda ids: SetupRepository.get_pending_setup(ids["session"])),
+    ("SetupRepository.claim_setup", lambda ids: SetupRepository.claim_setup("rig")),
+    ("SetupRepository.claim_setup(session)", lambda ids: SetupRepository.claim_setup("rig", ids["session"])),
+    ("SetupRepository.renew_lease", lambda ids: SetupRepository.renew_lease(ids["pending"], "rig")),
+    ("SetupRepository.release_expired_leases", lambda ids: SetupRepository.release_expired_leases()),
+    ("SetupRepository.count_pending_setups", lambda ids: SetupRepository.count_pending_setups(ids["session"])),
+    ("SetupRepository.count_setups_by_status",
+     lambda ids: SetupRepository.count_setups_by_status(ids["session"])),
+    ("SetupRepository.get_best_setups", lambda ids: SetupRepository.get_best_setups("mx5", "spa")),
+    ("SetupRepository.get_scored_setups", lambda ids: SetupRepository.get_scored_setups("mx5", "spa", 100)),
+    ("TelemetryRepository.save_telemetry",
+     lambda ids: TelemetryRepository.save_telemetry(ids["setup"], 91.0, {"lap_time": 91.0})),
+    ("TelemetryRepository.get_telemetry_for_setup",
+     lambda ids: TelemetryRepository.get_telemetry_for_setup(ids["setup"])),
+    ("TelemetryRepository.get_telemetry_by_id", lambda ids: TelemetryRepository.get_telemetry_by_id(ids["setup"])),
+    ("TelemetryRepository.get_telemetry_version",
+     lambda ids: TelemetryRepository.get_telemetry_version(ids["setup"])),
+    ("TelemetryRepository.get_metric_rows", lambda ids: TelemetryRepository.get_metric_rows("mx5", "spa")),
+    ("IngestRepository.get_committed", lambda ids: IngestRepository.get_committed("test")),
+    ("IngestRepository.clear_checkpoint", lambda ids: IngestRepository.clear_checkpoint("test")),
+    ("JobRepository.update_job", lambda ids: JobRepository.update_job("job", JOB_STATUS["RUNNING"])),
+    ("JobRepository.get_job", lambda ids: JobRepository.get_job("job")),
+    ("JobRepository.get_unfinished_jobs", lambda ids: JobRepository.get_unfinished_jobs()),
+    ("JobRepository.claim_job", lambda ids: JobRepository.claim_job("job", "owner", "other")),
+    ("JobRepository.delete_finished_jobs", lambda ids: JobRepository.delete_finished_jobs(datetime(2024, 1, 1))),
+    ("MetricStatisticsRepository.get_statistics",
+     lambda ids: MetricStatisticsRepository.get_statistics("mx5", "spa")),
+    ("MetricStatisticsRepository.get_car_statistics",
+     lambda ids: MetricStatisticsRepository.get_car_statistics("mx5")),
+    ("PerformanceRepository.get_performance", lambda ids: PerformanceRepository.get_performance("mx5", "spa")),
+    ("OptimizationRepository.get_session_by_id",
+     lambda ids: OptimizationRepository.get_session_by_id(ids["session"])),
+    ("OptimizationRepository.update_best_setup",
+     lambda ids: OptimizationRepository.update_best_setup(ids["session"], ids["setup"])),
+    ("OptimizationRepository.get_active_session", lambda ids: OptimizationRepository.get_active_session()),
+    ("OptimizationRepository.get_active_session(car, track)",
+     lambda ids: OptimizationRepository.get_active_session("mx5", "spa")),
+    ("OptimizationRepository.get_active_sessions", lambda ids: OptimizationRepository.get_active_sessions()),
+    ("OptimizationRepository.get_session_status",
+     lambda ids: OptimizationRepository.get_session_status(ids["session"])),
+    ("OptimizationRepository.get_session_status(active)",
+     lambda ids: OptimizationRepository.get_session_status(car_id="mx5", track_id="spa")),
+    ("OptimizationRepository.close_session", lambda ids: OptimizationRepository.close_session(ids["closed"])),
+]
+
+
+@pytest.fixture(scope="module")
+def ids():
+    """Données de test : une session de la voiture mx5 (shard dédié) et ses setups"""
+    init_db()
+    session_id = OptimizationRepository.create_session("mx5", "spa", {"n_trials": 10})
+    closed_id = OptimizationRepository.create_session("mx5", "monza", {"n_trials": 10})
+    setup_id = SetupRepository.create_setup("mx5", "spa", {"camber": -2.0}, SETUP_STATUS["TESTED"],
+                                         SETUP_SOURCE["OPTIMIZED"], optimization_session_id=session_id)
+    pending_id = SetupRepository.create_setup("mx5", "spa", {"camber": -1.5}, SETUP_STATUS["PENDING"],
+                                           SETUP_SOURCE["OPTIMIZED"], optimization_session_id=session_id)
+    JobRepository.create_job("job", "score_lap", {"args": [1], "kwargs": {}}, "owner")
+    return {"session": session_id, "closed": closed_id, "setup": setup_id, "pending": pending_id}
+
+
+@contextmanager
+def capture_statements(engines):
+    """Enregistre les requêtes vérifiées envoyées aux bases"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(CHECKED_STATEMENTS):
+            # Requête groupée (executemany) : le plan est celui d'une ligne
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(plan):
+    """Étapes du plan qui parcourent une table entière (SCAN sans index)"""
+    return [detail for detail in plan if detail.startswith("SCAN ") and " USING " not in detail]
+
+
+@pytest.mark.parametrize("name, call", REPOSITORY_QUERIES, ids=[name for name, _ in REPOSITORY_QUERIES])
+def test_query_plan_uses_indexes(ids, name, call):
+    engines = router.engines()
+    assert len(engines) > 1, "la voiture de test doit avoir son propre shard"
+
+    with capture_statements(engines) as statements:
+        call(ids)
+    assert statements, f"{name} n'a envoyé aucune requête"
+
+    for statement, parameters in statements:
+        for engine in engines:
+            with engine.connect() as connection:
+                rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            # Colonnes de SQLite : id, parent, notused, detail
+            scans = full_scans([row[-1] for row in rows])
+            assert not scans, f"{name} ({engine.url.database}): {', '.join(scans)}\n{' '.join(statement.split())}"
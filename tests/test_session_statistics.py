@@ -0,0 +1,22 @@
+"""Meilleur setup d'une session selon la direction de son étude"""
+import pytest
+from src.config.constants import SETUP_SOURCE, SETUP_STATUS
+from src.storage.database import init_db
+from src.storage.repository import OptimizationRepository, SetupRepository
+
+
+@pytest.mark.parametrize("direction, best", [("maximize", 3.0), ("minimize", 1.0)])
+def test_best_setup_follows_direction(direction, best):
+    init_db()
+    session_id = OptimizationRepository.create_session("mx5", f"direction_{direction}", {"direction": direction})
+    setup_ids = {}
+    for score in (2.0, 3.0, 1.0):
+        setup_id = SetupRepository.create_setup("mx5", f"direction_{direction}", {"camber": score},
+                                                SETUP_STATUS["PENDING"], SETUP_SOURCE["OPTIMIZED"],
+                                                optimization_session_id=session_id)
+        SetupRepository.update_setup_status(setup_id, SETUP_STATUS["TESTED"], score)
+        setup_ids[score] = setup_id
+
+    status = OptimizationRepository.get_session_status(session_id)
+    assert status["best_score"] == best
+    assert status["best_setup_id"] == setup_ids[best]
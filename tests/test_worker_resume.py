@@ -0,0 +1,38 @@
+"""Reprise au démarrage des tâches d'un worker arrêté"""
+import fcntl
+from src.config.constants import JOB_STATUS
+from src.core.pipeline import OptimizationWorker
+from src.storage.database import init_db
+from src.storage.repository import JobRepository
+
+
+def test_resume_claims_only_jobs_of_stopped_owners(tmp_path):
+    init_db()
+    calls = []
+    worker = OptimizationWorker(lock_dir=tmp_path)
+    worker.task("resume_record")(calls.append)
+
+    # Processus arrêté : son fichier de verrou existe encore mais n'est plus tenu
+    (tmp_path / "stopped.lock").touch()
+    JobRepository.create_job("resume-stopped", "resume_record", {"args": ["stopped"], "kwargs": {}}, "stopped")
+    # Processus en vie : il tient son verrou
+    alive_lock = open(tmp_path / "alive.lock", "w")
+    fcntl.flock(alive_lock, fcntl.LOCK_EX)
+    JobRepository.create_job("resume-alive", "resume_record", {"args": ["alive"], "kwargs": {}}, "alive")
+
+    try:
+        assert worker.resume() == 1
+        assert worker.wait("resume-stopped", timeout=5).status == JOB_STATUS["DONE"]
+
+        # Un second worker qui démarre ne reprend ni la tâche terminée ni celle du processus en vie
+        other = OptimizationWorker(lock_dir=tmp_path)
+        other.task("resume_record")(calls.append)
+        assert other.resume() == 0
+
+        assert calls == ["stopped"]
+        assert not (tmp_path / "stopped.lock").exists()
+        alive = JobRepository.get_job("resume-alive")
+        assert alive.status == JOB_STATUS["QUEUED"]
+        assert alive.owner == "alive"
+    finally:
+        alive_lock.close()